@@ -0,0 +1,17 @@
+"""
+Gunicorn settings for serving crypto.asgi with uvicorn workers:
+
+    gunicorn crypto.asgi:application -c crypto/gunicorn_asgi.py
+
+The async/ endpoints run on each worker's event loop; sync views are run in
+a thread pool by Django's ASGI handler.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = 'uvicorn_worker.UvicornWorker'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+# Keep-alive connections from the load balancer are cheap on an event loop
+keepalive = 75
+timeout = 60
+graceful_timeout = 30
@@ -11,7 +11,10 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import hashlib
 import os
+import sys
+import tempfile
 print("DJANGO_ALLOWED_HOSTS:", os.getenv("DJANGO_ALLOWED_HOSTS"))
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -80,10 +83,47 @@ WSGI_APPLICATION = 'crypto.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        # A file (rather than shared in-memory) test database so threaded tests get real SQLite locking
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# SQLite production profile. WAL lets readers run alongside the single writer and makes
+# synchronous=NORMAL safe; the busy timeout waits for the write lock instead of failing with
+# "database is locked"; BEGIN IMMEDIATE takes that lock when a transaction starts, so two
+# trades never deadlock trying to upgrade their read locks. SQLITE_TUNING=off restores the defaults.
+SQLITE_TUNING = os.environ.get('SQLITE_TUNING', 'on') == 'on'
+if SQLITE_TUNING:
+    DATABASES['default'].update({
+        'OPTIONS': {
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA cache_size=-65536;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+        },
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+    })
+
+# Read replica for the history and summary GETs (see cryptoApp/replica.py). SQLITE_REPLICA_PATH
+# is a copy of the primary kept current outside Django; without it every read uses the primary.
+SQLITE_REPLICA_PATH = os.environ.get('SQLITE_REPLICA_PATH')
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'NAME': SQLITE_REPLICA_PATH or DATABASES['default']['NAME'],
+    'TEST': {'NAME': BASE_DIR / 'test_replica.sqlite3'},
+}
+DATABASE_ROUTERS = ['cryptoApp.replica.ReplicaRouter']
+DATABASE_READ_REPLICA = 'replica' if SQLITE_REPLICA_PATH else None
+# How long a user's reads stay on the primary after they trade
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -133,6 +173,18 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads always go to a temporary file on disk rather than being held in memory
+FILE_UPLOAD_HANDLERS = ['django.core.files.uploadhandler.TemporaryFileUploadHandler']
+
+# Profile photos (cryptoApp/photos.py)
+PHOTO_MAX_UPLOAD_BYTES = int(os.environ.get('PHOTO_MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+PHOTO_MAX_PIXELS = int(os.environ.get('PHOTO_MAX_PIXELS', 50_000_000))
+PHOTO_VARIANT_SIZES = [64, 256, 512]
+PHOTO_VARIANT_FORMATS = ['webp', 'jpeg']
+PHOTO_WORKERS = int(os.environ.get('PHOTO_WORKERS', 2))
+# Uploads are refused with 503 while this many are still waiting to be processed
+PHOTO_QUEUE_LIMIT = int(os.environ.get('PHOTO_QUEUE_LIMIT', 32))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -141,9 +193,106 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CORS_ALLOW_ALL_ORIGINS = True
 
 # Cache
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake'
+# The shared backend is one mmap'd file every worker process on the host reads and writes,
+# so a quote fetched by one gunicorn worker is a hit for all of them. CACHE_BACKEND=locmem
+# switches back to a private per-process cache, the default under the test runner. The file
+# is named after the database, so two deployments on one host never share entries.
+SHARED_CACHE_PATH = os.environ.get(
+    'SHARED_CACHE_PATH',
+    os.path.join(
+        '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+        'crypto-cache-' + hashlib.sha256(str(Path(DATABASES['default']['NAME']).resolve()).encode()).hexdigest()[:16],
+    ),
+)
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
+if os.environ.get('CACHE_BACKEND', 'locmem' if TESTING else 'shared') == 'shared':
+    CACHES = {
+        'default': {
+            'BACKEND': 'cryptoApp.cache_backends.SharedMemoryCache',
+            'LOCATION': SHARED_CACHE_PATH,
+            'OPTIONS': {'SLOTS': 8192, 'SLOT_SIZE': 512},
+        }
     }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake'
+        }
+    }
+
+# Price oracle
+PRICE_CACHE_TTL = int(os.environ.get('PRICE_CACHE_TTL', 120))
+COINGECKO_API_URL = os.environ.get('COINGECKO_API_URL', 'https://api.coingecko.com/api/v3/simple/price')
+TRACKED_COINS = ['bitcoin', 'ethereum', 'tether', 'dogecoin', 'solana', 'cardano']
+PRICE_POLL_CURRENCIES = ['usd']
+PRICE_POLL_INTERVAL = int(os.environ.get('PRICE_POLL_INTERVAL', 30))
+PRICE_SNAPSHOT_MAX_AGE = int(os.environ.get('PRICE_SNAPSHOT_MAX_AGE', 300))
+# When True, requests only read the poller's snapshot and never call the provider themselves, failing
+# fast with StalePrice once it is older than PRICE_SNAPSHOT_MAX_AGE. Unset (auto), this is on while a
+# poll_prices poller has run within PRICE_SNAPSHOT_MAX_AGE, and requests fall back to the provider
+# when no poller is running. False always lets a cache miss call the provider.
+PRICE_SNAPSHOT_ONLY = {'True': True, 'False': False}.get(os.environ.get('PRICE_SNAPSHOT_ONLY', 'auto'))
+PRICE_STALE_TTL = int(os.environ.get('PRICE_STALE_TTL', 3600))
+# Quotes older than PRICE_CACHE_TTL are served for this long more while a background refresh runs
+PRICE_REVALIDATE_WINDOW = int(os.environ.get('PRICE_REVALIDATE_WINDOW', 60))
+# After a failed fetch, requests for the same quotes fail fast (or serve the last known price) this long
+PRICE_FAILURE_TTL = int(os.environ.get('PRICE_FAILURE_TTL', 10))
+
+# Passwords are hashed with PBKDF2 at PASSWORD_HASH_ITERATIONS; changing it re-hashes at next login
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 600000))
+PASSWORD_HASHERS = [
+    'cryptoApp.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+]
+
+# orjson-backed JSON responses (identical output; DRF's encoder is used if orjson is not installed)
+FAST_JSON_RENDERER = os.environ.get('FAST_JSON_RENDERER', 'True') == 'True'
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': ['cryptoApp.authentication.SignedTokenAuthentication'],
+    'DEFAULT_RENDERER_CLASSES': [
+        'cryptoApp.renderers.FastJSONRenderer' if FAST_JSON_RENDERER else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
+
+# Signed bearer tokens issued at login (cryptoApp/authentication.py)
+AUTH_TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', 86400))
+# When True, user-scoped endpoints refuse requests that only name an email
+AUTH_TOKEN_REQUIRED = os.environ.get('AUTH_TOKEN_REQUIRED', 'False') == 'True'
+
+# Cached email -> user/profile id resolution
+IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 600))
+
+# Trading
+BATCH_ORDER_MAX_LEGS = int(os.environ.get('BATCH_ORDER_MAX_LEGS', 50))
+# How sells consume cost-basis lots: 'fifo' or 'average'. Run rebuild_cost_basis after changing it.
+COST_BASIS_METHOD = os.environ.get('COST_BASIS_METHOD', 'fifo')
+
+# Transaction history pagination
+TRANSACTION_PAGE_SIZE = int(os.environ.get('TRANSACTION_PAGE_SIZE', 50))
+TRANSACTION_MAX_PAGE_SIZE = int(os.environ.get('TRANSACTION_MAX_PAGE_SIZE', 500))
+PORTFOLIO_TRANSACTIONS_LIMIT = int(os.environ.get('PORTFOLIO_TRANSACTIONS_LIMIT', 10))
+
+# Ledger export: rows fetched per database round trip while streaming
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+
+# Portfolio value history: most points one portfolio-history/ response may hold
+PORTFOLIO_HISTORY_MAX_POINTS = int(os.environ.get('PORTFOLIO_HISTORY_MAX_POINTS', 5000))
+
+# Leaderboard: entries returned by default, and the most one request may ask for
+LEADERBOARD_SIZE = int(os.environ.get('LEADERBOARD_SIZE', 10))
+LEADERBOARD_MAX_SIZE = int(os.environ.get('LEADERBOARD_MAX_SIZE', 100))
+
+# Price provider HTTP client
+PRICE_HTTP_POOL_SIZE = int(os.environ.get('PRICE_HTTP_POOL_SIZE', 10))
+# Connections the async client (ASGI views) may hold open to the provider per process
+PRICE_ASYNC_POOL_SIZE = int(os.environ.get('PRICE_ASYNC_POOL_SIZE', 200))
+PRICE_HTTP_CONNECT_TIMEOUT = float(os.environ.get('PRICE_HTTP_CONNECT_TIMEOUT', 3.05))
+PRICE_HTTP_READ_TIMEOUT = float(os.environ.get('PRICE_HTTP_READ_TIMEOUT', 5))
+PRICE_HTTP_RETRIES = int(os.environ.get('PRICE_HTTP_RETRIES', 2))
+PRICE_HTTP_BACKOFF = float(os.environ.get('PRICE_HTTP_BACKOFF', 0.3))
+PRICE_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('PRICE_BREAKER_FAILURE_THRESHOLD', 5))
+PRICE_BREAKER_RESET_TIMEOUT = int(os.environ.get('PRICE_BREAKER_RESET_TIMEOUT', 30))
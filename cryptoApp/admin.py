@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Register, Profile, Transaction, TokenBalance, ProfitLossSummary
+from .models import Register, Profile, Transaction, TokenBalance, ProfitLossSummary, PriceSnapshot
 
 admin.site.register(Register)
 admin.site.register(Profile)
@@ -25,9 +25,15 @@ class ProfitLossSummaryAdmin(admin.ModelAdmin):
     list_display = (
         'user', 'coin', 'total_purchased_quantity', 'total_invested',
         'total_sold_quantity', 'total_earned', 'holding_quantity',
-        'current_price', 'holding_amount', 'net_profit_loss', 'last_updated'
+        'cost_basis', 'realized_gain', 'last_updated'
     )
     search_fields = ('user__username', 'coin')
     list_filter = ('user__username', 'coin', 'last_updated')
     ordering = ('-last_updated',)
     date_hierarchy = 'last_updated'
+
+@admin.register(PriceSnapshot)
+class PriceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('coin', 'vs_currency', 'price', 'fetched_at')
+    search_fields = ('coin',)
+    ordering = ('coin',)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CryptoappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cryptoApp'
+
+    def ready(self):
+        from . import identity  # noqa: F401 (connects the identity cache invalidation signals)
+        from . import state  # noqa: F401 (connects the state version signals)
@@ -0,0 +1,124 @@
+"""
+Async (ASGI) versions of the price-bound endpoints, mounted under async/.
+
+Under an ASGI server these run on the event loop: a request waiting on the
+price provider costs a coroutine rather than a worker thread, so one process
+can keep hundreds of provider round trips in flight. Responses match the sync
+views in views.py. Trades still run in a single database transaction, on a
+worker thread, because the async ORM has no transaction support.
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import APIException
+from rest_framework.utils.encoders import JSONEncoder
+from .models import Register, Profile
+from .authentication import arequest_identity
+from .portfolio import aprofit_loss_section
+from .replica import reads_from_replica
+from .prices import price_oracle, PriceUnavailable, StalePrice, CircuitOpen
+from .trading import execute_buy, execute_sell, TradeError
+import json
+
+
+def _response(data, status=200):
+    # DRF's encoder, so Decimals render exactly as they do from the sync views
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def _request_data(request):
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+    return request.POST
+
+
+@require_GET
+async def get_live_prices(request):
+    ids = request.GET.get('ids', 'bitcoin,ethereum,tether,dogecoin,solana,cardano')
+    vs_currencies = request.GET.get('vs_currencies', 'usd')
+
+    try:
+        data = await price_oracle.aget_quotes(ids, vs_currencies)
+    except (StalePrice, CircuitOpen) as exc:
+        return _response({'error': str(exc)}, status=503)
+    except PriceUnavailable:
+        data = {}
+
+    if data:
+        return _response(data)
+    else:
+        return _response({'error': 'Failed to fetch prices.'}, status=500)
+
+
+async def _trade(request, execute, verb):
+    data = _request_data(request)
+    email = data.get('email')
+    coin = data.get('coin')
+    try:
+        quantity = int(data.get('quantity'))
+    except (TypeError, ValueError):
+        quantity = 0
+
+    if not (email or request.headers.get('Authorization')) or not coin or quantity < 1:
+        return _response({'error': 'Invalid request.'}, status=400)
+
+    try:
+        user_id = (await arequest_identity(request, email)).id
+    except (Register.DoesNotExist, Profile.DoesNotExist):
+        return _response({'error': 'User or profile not found.'}, status=404)
+    except APIException as exc:
+        return _response({'detail': exc.detail}, status=exc.status_code)
+
+    try:
+        price_per_token = await price_oracle.aget_price(coin, 'usd')
+    except (StalePrice, CircuitOpen) as exc:
+        return _response({'error': str(exc)}, status=503)
+    except PriceUnavailable:
+        return _response({'error': 'Failed to fetch coin price.'}, status=500)
+
+    if price_per_token is None:
+        return _response({'error': 'Invalid coin selected.'}, status=400)
+
+    try:
+        total, wallet = await sync_to_async(execute)(user_id, coin, quantity, price_per_token)
+    except TradeError as exc:
+        return _response({'error': str(exc)}, status=exc.status)
+
+    return _response({
+        'message': f'{verb} {quantity} {coin} token(s) for ${total:.2f}',
+        'wallet_amount': wallet
+    })
+
+
+@csrf_exempt
+@require_POST
+async def purchase_tokens(request):
+    return await _trade(request, execute_buy, 'Purchased')
+
+
+@csrf_exempt
+@require_POST
+async def sell_tokens(request):
+    return await _trade(request, execute_sell, 'Sold')
+
+
+@require_GET
+async def profit_loss_summary(request, email):
+    try:
+        user_id = (await arequest_identity(request, email)).id
+    except (Register.DoesNotExist, Profile.DoesNotExist):
+        return _response({'error': 'User not found.'}, status=404)
+    except APIException as exc:
+        return _response({'detail': exc.detail}, status=exc.status_code)
+
+    try:
+        with reads_from_replica(user_id):
+            summary = await aprofit_loss_section(user_id)
+    except (StalePrice, CircuitOpen) as exc:
+        return _response({'error': str(exc)}, status=503)
+
+    return _response(summary)
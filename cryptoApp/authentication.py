@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, PermissionDenied
+from .identity import ResolvedUser, aresolve_user, resolve_user
+import base64
+import binascii
+import json
+import time
+
+TOKEN_SALT = 'cryptoApp.authentication.token'
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _signature(payload):
+    return _b64encode(salted_hmac(TOKEN_SALT, payload, algorithm='sha256').digest())
+
+
+# Compact signed token: base64(JSON [id, email, username, profile_id, expiry]) + '.' + HMAC-SHA256.
+# Everything a user-scoped endpoint needs is in the token, so checking it touches neither the DB nor the cache.
+def issue_token(identity, ttl=None):
+    expires_at = int(time.time()) + (settings.AUTH_TOKEN_TTL if ttl is None else ttl)
+    payload = _b64encode(json.dumps([*identity, expires_at], separators=(',', ':')).encode())
+    return f"{payload}.{_signature(payload)}", expires_at
+
+
+def verify_token(token):
+    payload, _, signature = token.partition('.')
+    if not signature or not constant_time_compare(signature, _signature(payload)):
+        raise AuthenticationFailed('Invalid token.')
+    try:
+        *fields, expires_at = json.loads(_b64decode(payload))
+        identity = ResolvedUser(*fields)
+    except (ValueError, TypeError, binascii.Error):
+        raise AuthenticationFailed('Invalid token.')
+    if expires_at <= time.time():
+        raise AuthenticationFailed('Token has expired.')
+    return identity
+
+
+class TokenUser:
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, identity):
+        self.identity = identity
+        self.id = self.pk = identity.id
+        self.email = identity.email
+        self.username = identity.username
+
+    def __str__(self):
+        return self.username
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        parts = get_authorization_header(request).split()
+        if not parts or parts[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(parts) != 2:
+            raise AuthenticationFailed('Invalid token header.')
+        identity = verify_token(parts[1].decode('latin-1'))
+        return TokenUser(identity), parts[1]
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+# The caller's identity for a user-scoped endpoint: straight from the token when one
+# was sent, otherwise resolved from the email (refused when AUTH_TOKEN_REQUIRED).
+# A token may only act on its own account.
+def request_identity(request, email):
+    identity = _token_identity(getattr(request, 'user', None), email)
+    return identity if identity is not None else resolve_user(email)
+
+
+# The same, for code that runs before DRF's authentication step (conditional GET checks)
+def header_identity(request, email):
+    authenticated = SignedTokenAuthentication().authenticate(request)
+    identity = _token_identity(authenticated[0] if authenticated else None, email)
+    return identity if identity is not None else resolve_user(email)
+
+
+# Plain Django async views have no DRF authentication step, so the token is checked here
+async def arequest_identity(request, email):
+    authenticated = SignedTokenAuthentication().authenticate(request)
+    identity = _token_identity(authenticated[0] if authenticated else None, email)
+    return identity if identity is not None else await aresolve_user(email)
+
+
+def _token_identity(user, email):
+    if isinstance(user, TokenUser):
+        if email and email != user.email:
+            raise PermissionDenied('Token does not belong to this user.')
+        return user.identity
+    if settings.AUTH_TOKEN_REQUIRED:
+        raise NotAuthenticated()
+    return None
@@ -0,0 +1,203 @@
+"""
+Host-local cache shared by every worker process, for small hot values such as
+per-coin price quotes and resolved identities.
+
+The cache lives in one mmap'd file (ideally on /dev/shm) laid out as a header
+followed by a fixed number of equally sized slots. A key hashes to a slot and
+may be stored in any of the next ``PROBE`` slots; when they are all live the
+entry closest to expiry is evicted. Values that do not fit in one slot are not
+cached. Writers take an exclusive ``flock`` on the file and readers a shared
+one, so all processes on the host see the same entries.
+"""
+from contextlib import contextmanager
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+
+MAGIC = b'CRYPTOC1'
+HEADER = struct.Struct('<8sII')
+HEADER_SIZE = 64
+SLOT = struct.Struct('<QdIHxx')  # key hash, expiry (0 = never), value length, key length
+PROBE = 8
+
+
+class SharedMemoryCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.slots = int(options.get('SLOTS', 4096))
+        self.slot_size = int(options.get('SLOT_SIZE', 512))
+        self.size = HEADER_SIZE + self.slots * self.slot_size
+        self._lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._map = None
+
+    # File handles are reopened after a fork: flock does not exclude processes sharing one open file
+    def _ensure_open(self):
+        if self._pid == os.getpid():
+            return
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size < self.size:
+                os.ftruncate(fd, self.size)
+            mapped = mmap.mmap(fd, self.size)
+            if HEADER.unpack_from(mapped, 0) != (MAGIC, self.slots, self.slot_size):
+                mapped[:self.size] = bytes(self.size)
+                HEADER.pack_into(mapped, 0, MAGIC, self.slots, self.slot_size)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd, self._map, self._pid = fd, mapped, os.getpid()
+
+    @contextmanager
+    def _locked(self, exclusive):
+        with self._lock:
+            self._ensure_open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _hash(self, key):
+        digest = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+        return digest or 1
+
+    def _offsets(self, key_hash):
+        start = key_hash % self.slots
+        return [HEADER_SIZE + ((start + step) % self.slots) * self.slot_size for step in range(PROBE)]
+
+    def _find(self, key, key_hash):
+        for offset in self._offsets(key_hash):
+            slot_hash, expiry, value_len, key_len = SLOT.unpack_from(self._map, offset)
+            if slot_hash == key_hash:
+                start = offset + SLOT.size
+                if self._map[start:start + key_len] == key:
+                    return offset, expiry, start + key_len, value_len
+        return None
+
+    def _live(self, expiry, now):
+        return expiry == 0 or expiry > now
+
+    def _read(self, key):
+        key_hash = self._hash(key)
+        with self._locked(exclusive=False):
+            found = self._find(key, key_hash)
+            if found is None:
+                return None
+            offset, expiry, value_at, value_len = found
+            if not self._live(expiry, time.time()):
+                return None
+            return self._map[value_at:value_at + value_len]
+
+    def _write(self, key, value, timeout, only_if_missing=False):
+        expiry = self.get_backend_timeout(timeout)
+        expiry = 0.0 if expiry is None else expiry
+        now = time.time()
+        if expiry and expiry <= now:
+            self._remove(key)
+            return False
+
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if SLOT.size + len(key) + len(payload) > self.slot_size:
+            self._remove(key)
+            return False
+
+        key_hash = self._hash(key)
+        with self._locked(exclusive=True):
+            found = self._find(key, key_hash)
+            if found is not None:
+                if only_if_missing and self._live(found[1], now):
+                    return False
+                target = found[0]
+            else:
+                target = self._victim(key_hash, now)
+            SLOT.pack_into(self._map, target, key_hash, expiry, len(payload), len(key))
+            start = target + SLOT.size
+            self._map[start:start + len(key) + len(payload)] = key + payload
+        return True
+
+    def _victim(self, key_hash, now):
+        # First empty or expired slot, otherwise the live entry closest to expiry
+        best, best_expiry = None, None
+        for offset in self._offsets(key_hash):
+            slot_hash, expiry, _, _ = SLOT.unpack_from(self._map, offset)
+            if slot_hash == 0 or not self._live(expiry, now):
+                return offset
+            expiry = expiry or float('inf')
+            if best is None or expiry < best_expiry:
+                best, best_expiry = offset, expiry
+        return best
+
+    def _remove(self, key):
+        key_hash = self._hash(key)
+        with self._locked(exclusive=True):
+            found = self._find(key, key_hash)
+            if found is None:
+                return False
+            self._map[found[0]:found[0] + SLOT.size] = bytes(SLOT.size)
+            return True
+
+    def _key(self, key, version):
+        return self.make_and_validate_key(key, version=version).encode()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._write(self._key(key, version), value, timeout, only_if_missing=True)
+
+    # Read, add and write back under one exclusive lock, so concurrent increments from any
+    # process are never lost. The entry keeps its expiry.
+    def incr(self, key, delta=1, version=None):
+        raw_key = self._key(key, version)
+        key_hash = self._hash(raw_key)
+        with self._locked(exclusive=True):
+            found = self._find(raw_key, key_hash)
+            if found is None or not self._live(found[1], time.time()):
+                raise ValueError("Key '%s' not found" % key)
+            offset, expiry, value_at, value_len = found
+            value = pickle.loads(self._map[value_at:value_at + value_len]) + delta
+            payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            if SLOT.size + len(raw_key) + len(payload) > self.slot_size:
+                self._map[offset:offset + SLOT.size] = bytes(SLOT.size)
+                raise ValueError("Value of '%s' no longer fits in a slot" % key)
+            SLOT.pack_into(self._map, offset, key_hash, expiry, len(payload), len(raw_key))
+            self._map[value_at:value_at + len(payload)] = payload
+        return value
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version=version)
+
+    def get(self, key, default=None, version=None):
+        raw = self._read(self._key(key, version))
+        return default if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write(self._key(key, version), value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        raw = self._read(key)
+        if raw is None:
+            return False
+        return self._write(key, pickle.loads(raw), timeout)
+
+    def delete(self, key, version=None):
+        return self._remove(self._key(key, version))
+
+    def has_key(self, key, version=None):
+        return self._read(self._key(key, version)) is not None
+
+    def clear(self):
+        with self._locked(exclusive=True):
+            self._map[HEADER_SIZE:self.size] = bytes(self.size - HEADER_SIZE)
+
+    def close(self, **kwargs):
+        # Called at the end of every request; the mapping is kept for the life of the process
+        pass
@@ -0,0 +1,76 @@
+"""
+Streaming export of a user's full trade ledger, as CSV or NDJSON.
+
+Rows are read with a server-side iterator in EXPORT_CHUNK_SIZE batches and
+written out batch by batch, so memory use is the same for a hundred rows or
+ten million. The response is a plain Django StreamingHttpResponse: DRF would
+read ?format= as content negotiation and refuse csv/ndjson before the view ran.
+"""
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import APIException
+from .authentication import header_identity
+from .models import Register, Profile, Transaction
+from .pagination import filter_transactions, InvalidPageRequest
+from .serializers import TRANSACTION_FIELDS, transaction_rows
+from itertools import islice
+import csv
+import io
+import json
+
+EXPORT_COLUMNS = ('id', 'purchased_at', 'type', 'coin', 'quantity', 'total_price', 'cost_basis', 'realized_gain')
+CONTENT_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def _batches(queryset):
+    rows = queryset.order_by('purchased_at', 'id').values(*TRANSACTION_FIELDS).iterator(
+        chunk_size=settings.EXPORT_CHUNK_SIZE
+    )
+    while batch := list(islice(rows, settings.EXPORT_CHUNK_SIZE)):
+        yield transaction_rows(batch)
+
+
+def csv_lines(queryset):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in _batches(queryset):
+        writer.writerows([row[column] for column in EXPORT_COLUMNS] for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # The header alone, for an empty ledger
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def ndjson_lines(queryset):
+    for batch in _batches(queryset):
+        yield ''.join(
+            json.dumps({column: row[column] for column in EXPORT_COLUMNS}, separators=(',', ':')) + '\n' for row in batch
+        )
+
+
+@require_GET
+def export_transactions(request, email):
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in CONTENT_TYPES:
+        return JsonResponse({'error': "Format must be 'csv' or 'ndjson'."}, status=400)
+
+    try:
+        identity = header_identity(request, email)
+    except (Register.DoesNotExist, Profile.DoesNotExist):
+        return JsonResponse({'error': 'User not found.'}, status=404)
+    except APIException as exc:
+        return JsonResponse({'detail': exc.detail}, status=exc.status_code)
+
+    try:
+        transactions = filter_transactions(Transaction.objects.filter(user_id=identity.id), request.GET)
+    except InvalidPageRequest as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    lines = csv_lines(transactions) if export_format == 'csv' else ndjson_lines(transactions)
+    response = StreamingHttpResponse(lines, content_type=CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="transactions-{identity.id}.{export_format}"'
+    return response
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password, identify_hasher, make_password
+from django.utils.crypto import constant_time_compare
+
+
+# PBKDF2 with the iteration count taken from PASSWORD_HASH_ITERATIONS. Hashes made
+# with a different count still verify and are re-hashed at the next login.
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+
+# Verify a login against the stored hash, re-hashing it when the work factor has changed.
+# Passwords stored in plain text before hashing was introduced are accepted once and hashed.
+def check_user_password(user, raw_password):
+    def setter(raw):
+        user.password = make_password(raw)
+        user.save(update_fields=['password'])
+
+    try:
+        identify_hasher(user.password)
+    except ValueError:
+        if not constant_time_compare(user.password, raw_password):
+            return False
+        setter(raw_password)
+        return True
+    return check_password(raw_password, user.password, setter)
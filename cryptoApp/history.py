@@ -0,0 +1,105 @@
+"""
+Portfolio value over time, for portfolio-history/<email>/.
+
+The user's ledger is read once and turned into per-coin cumulative holdings and
+a cumulative cash flow. Each held coin's price history is read once as well.
+Each point of the series is then an array lookup (np.searchsorted) into those
+step series, so a year of hourly points costs the same three queries as a
+single point.
+"""
+from django.conf import settings
+from django.utils import timezone
+from datetime import datetime, timezone as dt_timezone
+from .models import Profile, Transaction, PriceHistory
+import numpy as np
+
+BUCKETS = {'hour': 3600, 'day': 86400, 'week': 7 * 86400}
+
+
+class InvalidHistoryRequest(ValueError):
+    pass
+
+
+# Value of the step series (times, values) just before each moment in at; `missing`
+# before its first step. A trade or price stamped exactly on a close opens the next bucket.
+def _as_of(times, values, at, missing=0.0):
+    if not len(times):
+        return np.full(len(at), missing)
+    index = np.searchsorted(times, at, side='left') - 1
+    return np.where(index >= 0, values[np.maximum(index, 0)], missing)
+
+
+def _price_series(coins, vs_currency, end):
+    rows = PriceHistory.objects.filter(coin__in=coins, vs_currency=vs_currency, recorded_at__lte=end).order_by(
+        'coin', 'recorded_at'
+    ).values_list('coin', 'recorded_at', 'price')
+    series = {coin: ([], []) for coin in coins}
+    for coin, recorded_at, price in rows.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        series[coin][0].append(recorded_at.timestamp())
+        series[coin][1].append(float(price))
+    return {coin: (np.array(times), np.array(prices)) for coin, (times, prices) in series.items()}
+
+
+def _timestamp(seconds):
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+# One point per bucket from start (default: the first trade) to end (default: now),
+# labelled by the bucket's start and valued at its close. A point is None when
+# the user held a coin that had no recorded price yet.
+def value_history(user_id, bucket='day', start=None, end=None, vs_currency='usd'):
+    if bucket not in BUCKETS:
+        raise InvalidHistoryRequest(f"Bucket must be one of: {', '.join(BUCKETS)}.")
+    step = BUCKETS[bucket]
+
+    ledger = list(
+        Transaction.objects.filter(user_id=user_id).order_by('purchased_at', 'id').values_list(
+            'purchased_at', 'coin', 'type', 'quantity', 'total_price'
+        )
+    )
+    wallet_now = float(Profile.objects.values_list('wallet_amount', flat=True).get(user_id=user_id))
+
+    end = end or timezone.now()
+    start = start or (ledger[0][0] if ledger else end)
+    if start > end:
+        raise InvalidHistoryRequest("'from' must not be after 'to'.")
+    first = start.timestamp() // step * step
+    points = int((end.timestamp() - first) // step) + 1
+    if points > settings.PORTFOLIO_HISTORY_MAX_POINTS:
+        raise InvalidHistoryRequest(
+            f"Range covers {points} {bucket} buckets; at most {settings.PORTFOLIO_HISTORY_MAX_POINTS} are allowed."
+        )
+    labels = first + step * np.arange(points)
+    at = np.minimum(labels + step, end.timestamp())
+
+    times = np.array([row[0].timestamp() for row in ledger])
+    coins = np.array([row[1].lower() for row in ledger])
+    buys = np.array([row[2] == 'buy' for row in ledger], dtype=bool)
+    quantities = np.array([row[3] for row in ledger], dtype=float)
+    totals = np.array([float(row[4]) for row in ledger])
+
+    # Wallet as of t: today's wallet minus every trade's cash flow after t
+    cash_flow = np.where(buys, -totals, totals)
+    wallet = wallet_now - cash_flow.sum() + _as_of(times, np.cumsum(cash_flow), at)
+
+    holdings_value = np.zeros(points)
+    unpriced = np.zeros(points, dtype=bool)
+    held_coins = sorted(set(coins.tolist()))
+    for coin, (price_times, prices) in _price_series(held_coins, vs_currency, end).items():
+        mask = coins == coin
+        held = _as_of(times[mask], np.cumsum(np.where(buys[mask], quantities[mask], -quantities[mask])), at)
+        price = _as_of(price_times, prices, at, missing=np.nan)
+        unpriced |= (held != 0) & np.isnan(price)
+        holdings_value += np.where(held != 0, held * np.nan_to_num(price), 0.0)
+
+    holdings_value = np.round(holdings_value, 2)
+    wallet = np.round(wallet, 2)
+    total_value = np.round(holdings_value + wallet, 2)
+    return {
+        'bucket': bucket,
+        'vs_currency': vs_currency,
+        'timestamps': [_timestamp(label) for label in labels.tolist()],
+        'holdings_value': [None if gap else value for gap, value in zip(unpriced.tolist(), holdings_value.tolist())],
+        'wallet_amount': wallet.tolist(),
+        'total_value': [None if gap else value for gap, value in zip(unpriced.tolist(), total_value.tolist())],
+    }
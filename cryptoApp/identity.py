@@ -0,0 +1,81 @@
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Register, Profile
+import threading
+
+ResolvedUser = namedtuple('ResolvedUser', ['id', 'email', 'username', 'profile_id'])
+
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+# Keyed on the exact email: lookups are case-sensitive, so Kim@x and kim@x can be two accounts
+def identity_key(email):
+    return f"identity_{email}"
+
+
+# Resolve an email to the user's ids with one select_related query, then serve it from the cache.
+# Raises Register.DoesNotExist / Profile.DoesNotExist like the ORM lookups it replaces.
+def resolve_user(email):
+    cached = cache.get(identity_key(email))
+    if cached is not None:
+        _count('hits')
+        return ResolvedUser(*cached)
+
+    _count('misses')
+    user = Register.objects.select_related('profile').only('id', 'email', 'username', 'profile__id').get(email=email)
+    identity = ResolvedUser(user.id, user.email, user.username, user.profile.id)
+    cache.set(identity_key(email), tuple(identity), timeout=settings.IDENTITY_CACHE_TTL)
+    return identity
+
+
+async def aresolve_user(email):
+    cached = await cache.aget(identity_key(email))
+    if cached is not None:
+        _count('hits')
+        return ResolvedUser(*cached)
+
+    _count('misses')
+    user = await Register.objects.select_related('profile').only('id', 'email', 'username', 'profile__id').aget(email=email)
+    identity = ResolvedUser(user.id, user.email, user.username, user.profile.id)
+    await cache.aset(identity_key(email), tuple(identity), timeout=settings.IDENTITY_CACHE_TTL)
+    return identity
+
+
+def invalidate_user(email):
+    _count('invalidations')
+    cache.delete(identity_key(email))
+
+
+def identity_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+    return stats
+
+
+# Drop the cached identity whenever the account, its password or its profile/photo changes
+@receiver(post_save, sender=Register)
+@receiver(post_delete, sender=Register)
+def invalidate_register(sender, instance, **kwargs):
+    invalidate_user(instance.email)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_profile(sender, instance, **kwargs):
+    if Profile.user.is_cached(instance):
+        email = instance.user.email
+    else:
+        email = Register.objects.filter(id=instance.user_id).values_list('email', flat=True).first()
+    if email:
+        invalidate_user(email)
@@ -0,0 +1,117 @@
+"""
+Global net profit/loss leaderboard.
+
+Each user's net profit/loss over every coin is kept in one LeaderboardEntry row,
+split into the part trades move (cash_flow: earned on sells minus invested on
+buys) and the part prices move (holdings_value). A trade shifts cash between
+the two with one UPDATE. When the poller stores a new price snapshot,
+mark_leaderboard revalues every holding in one vectorized pass per coin and
+writes the entries back in bulk.
+
+Top-K and a user's rank are read from the (-net_profit_loss, user) index, so
+neither sorts the table.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from decimal import Decimal
+from .models import LeaderboardEntry, PriceSnapshot, ProfitLossSummary
+import numpy as np
+
+
+# Fold trades, a list of (coin, type, quantity, amount), into the user's entry. At the trade's
+# own price the net is unchanged: the amount only moves between cash and holdings until the
+# next mark. Must run inside the trade's transaction.
+def apply_trades_to_leaderboard(user_id, trades):
+    cash = sum((amount if trade_type == 'sell' else -amount for _, trade_type, _, amount in trades), Decimal('0.00'))
+    rows = LeaderboardEntry.objects.filter(user_id=user_id)
+    changes = {'cash_flow': F('cash_flow') + cash, 'holdings_value': F('holdings_value') - cash}
+    if rows.update(**changes):
+        return
+
+    try:
+        with transaction.atomic():
+            LeaderboardEntry.objects.create(user_id=user_id, cash_flow=cash, holdings_value=-cash)
+    except IntegrityError:
+        # Another trade created the entry first; fold into it instead
+        rows.update(**changes)
+
+
+def snapshot_prices(vs_currency='usd'):
+    rows = PriceSnapshot.objects.filter(vs_currency=vs_currency).values_list('coin', 'price')
+    return {coin.lower(): price for coin, price in rows}
+
+
+def _cents(values):
+    return [Decimal(f'{value:.2f}') for value in values.tolist()]
+
+
+# Revalue every user's holdings at prices ({coin: price}, default: the usd snapshot) and
+# recompute net_profit_loss. Cash flow is left to the trades that move it, except for users
+# new to the leaderboard, or for every user when rebuild is set. Returns the entries marked.
+def mark_leaderboard(prices=None, rebuild=False):
+    # trading imports this module for apply_trades_to_leaderboard
+    from .trading import write_transaction
+
+    prices = snapshot_prices() if prices is None else prices
+    # Holdings are read in the write transaction too: a trade committing between the read and
+    # the upsert would otherwise have its holdings_value overwritten with the pre-trade quantity
+    with write_transaction():
+        return _mark(prices, rebuild)
+
+
+def _mark(prices, rebuild):
+    rows = list(ProfitLossSummary.objects.values_list('user_id', 'coin', 'holding_quantity', 'total_earned',
+                                                      'total_invested'))
+    if not rows:
+        return 0
+
+    users, coins, quantities, earned, invested = zip(*rows)
+    ids, index = np.unique(np.array(users), return_inverse=True)
+    coins = np.array([coin.lower() for coin in coins])
+    quantities = np.array(quantities, dtype=float)
+    cash = np.bincount(index, weights=np.array(earned, dtype=float) - np.array(invested, dtype=float),
+                       minlength=len(ids))
+
+    holdings = np.zeros(len(ids))
+    for coin, price in prices.items():
+        held = (coins == coin) & (quantities > 0)
+        if held.any():
+            holdings += np.bincount(index[held], weights=quantities[held] * float(price), minlength=len(ids))
+
+    now = timezone.now()
+    entries = [
+        LeaderboardEntry(user_id=user_id, cash_flow=cash_flow, holdings_value=value, marked_at=now)
+        for user_id, cash_flow, value in zip(ids.tolist(), _cents(cash), _cents(holdings))
+    ]
+    LeaderboardEntry.objects.bulk_create(
+        entries,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['holdings_value', 'marked_at'] + (['cash_flow'] if rebuild else []),
+    )
+    LeaderboardEntry.objects.update(net_profit_loss=F('cash_flow') + F('holdings_value'))
+    return len(entries)
+
+
+def top_entries(limit):
+    rows = LeaderboardEntry.objects.order_by('-net_profit_loss', 'user_id').values_list(
+        'user__username', 'net_profit_loss'
+    )[:limit]
+    return [
+        {'rank': rank, 'username': username, 'net_profit_loss': net_profit_loss}
+        for rank, (username, net_profit_loss) in enumerate(rows, start=1)
+    ]
+
+
+# 1 + the users ahead in (-net_profit_loss, user) order; None for a user who never traded
+def user_rank(user_id):
+    entry = LeaderboardEntry.objects.filter(user_id=user_id).values('net_profit_loss', 'marked_at').first()
+    if entry is None:
+        return None
+    net_profit_loss = entry['net_profit_loss']
+    ahead = LeaderboardEntry.objects.filter(
+        Q(net_profit_loss__gt=net_profit_loss) | Q(net_profit_loss=net_profit_loss, user_id__lt=user_id)
+    ).count()
+    return {'rank': ahead + 1, **entry}
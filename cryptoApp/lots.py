@@ -0,0 +1,165 @@
+"""
+Lot-level cost basis.
+
+Every buy opens a lot. Every sell consumes open lots and realizes a gain: the
+proceeds minus the cost of the quantity consumed. COST_BASIS_METHOD picks how
+lots are consumed:
+
+- fifo: oldest lot first.
+- average: all buys of a coin are pooled into one lot, and sells release cost
+  at the pool's average.
+
+Only open lots are stored. A sell reads just the lots it will consume, then
+updates the one it splits and deletes the ones it empties. Changing the method
+needs `manage.py rebuild_cost_basis`.
+"""
+from collections import defaultdict, deque
+from django.conf import settings
+from django.db.models import Q
+from decimal import Decimal
+from .models import CostLot, Transaction
+from .summaries import CENT
+
+COST_BASIS_METHODS = ('fifo', 'average')
+LOT_PAGE_SIZE = 50
+
+
+class LotBook:
+    def __init__(self, user_id, lots=(), method=None):
+        self.user_id = user_id
+        self.method = method or settings.COST_BASIS_METHOD
+        self.open = defaultdict(deque)
+        for lot in lots:
+            self.open[lot.coin].append(lot)
+        self.created, self.changed, self.closed = [], {}, []
+
+    def buy(self, coin, quantity, cost, acquired_at):
+        lots = self.open[coin]
+        if self.method == 'average' and lots:
+            pool = lots[0]
+            pool.quantity += quantity
+            pool.cost += cost
+            self._touch(pool)
+            return
+        lot = CostLot(user_id=self.user_id, coin=coin, quantity=quantity, cost=cost, acquired_at=acquired_at)
+        lots.append(lot)
+        self.created.append(lot)
+
+    # Consume quantity from the coin's open lots and return the cost released. Quantity
+    # with no open lot behind it (a ledger older than the lots) is released at zero cost.
+    def sell(self, coin, quantity):
+        lots = self.open[coin]
+        released = Decimal('0.00')
+        while quantity and lots:
+            lot = lots[0]
+            taken = min(quantity, lot.quantity)
+            cost = lot.cost if taken == lot.quantity else (lot.cost * taken / lot.quantity).quantize(CENT)
+            lot.quantity -= taken
+            lot.cost -= cost
+            released += cost
+            quantity -= taken
+            if lot.quantity:
+                self._touch(lot)
+            else:
+                lots.popleft()
+                self._close(lot)
+        return released
+
+    def _touch(self, lot):
+        if lot.pk is not None:
+            self.changed[lot.pk] = lot
+
+    def _close(self, lot):
+        if lot.pk is None:
+            self.created.remove(lot)
+        else:
+            self.changed.pop(lot.pk, None)
+            self.closed.append(lot.pk)
+
+    def save(self):
+        if self.closed:
+            CostLot.objects.filter(id__in=self.closed).delete()
+        if self.changed:
+            CostLot.objects.bulk_update(self.changed.values(), ['quantity', 'cost'])
+        if self.created:
+            CostLot.objects.bulk_create(self.created, batch_size=500)
+
+
+# Oldest open lots of a coin until they cover quantity. Every lot holds at least one token, so
+# pages of at most the quantity still needed never read past the lots the sell will consume.
+def _open_lots(user_id, coin, quantity):
+    lots, covered = [], 0
+    queryset = CostLot.objects.filter(user_id=user_id, coin=coin).order_by('acquired_at', 'id')
+    while covered < quantity:
+        size = min(quantity - covered, LOT_PAGE_SIZE)
+        page = queryset
+        if lots:
+            last = lots[-1]
+            page = page.filter(Q(acquired_at__gt=last.acquired_at) | Q(acquired_at=last.acquired_at, id__gt=last.id))
+        page = list(page[:size])
+        lots.extend(page)
+        covered += sum(lot.quantity for lot in page)
+        if len(page) < size:
+            break
+    return lots
+
+
+# The open lots a set of trades can touch: enough of each sold coin's lots to cover its
+# total sell quantity, and under average cost the pool of every coin traded.
+def _lots_for(user_id, trades, method):
+    needed = defaultdict(int)
+    for coin, trade_type, quantity, _ in trades:
+        if trade_type == 'sell':
+            needed[coin] += quantity
+        elif method == 'average':
+            needed[coin] = max(needed[coin], 1)
+    return [lot for coin, quantity in needed.items() for lot in _open_lots(user_id, coin, quantity)]
+
+
+# Apply trades, a list of (coin, type, quantity, amount), to the user's lots in order and
+# return each trade's cost basis: the amount for a buy, the cost released for a sell.
+# Must run inside the trade's transaction.
+def apply_trades_to_lots(user_id, trades, acquired_at):
+    method = settings.COST_BASIS_METHOD
+    book = LotBook(user_id, _lots_for(user_id, trades, method), method)
+    bases = []
+    for coin, trade_type, quantity, amount in trades:
+        if trade_type == 'buy':
+            book.buy(coin, quantity, amount, acquired_at)
+            bases.append(amount)
+        else:
+            bases.append(book.sell(coin, quantity))
+    book.save()
+    return bases
+
+
+# Replay the ledger into fresh lots and per-sell cost basis / realized gain, user by user.
+# The summaries' cost_basis and realized_gain are derived from these; rebuild them afterwards.
+def rebuild_cost_basis(user=None):
+    transactions = Transaction.objects.all() if user is None else Transaction.objects.filter(user=user)
+    CostLot.objects.filter(**({} if user is None else {'user': user})).delete()
+
+    books, sells = {}, []
+    rows = transactions.order_by('user_id', 'purchased_at', 'id').only(
+        'id', 'user_id', 'coin', 'type', 'quantity', 'total_price', 'purchased_at'
+    )
+    for row in rows.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        book = books.get(row.user_id)
+        if book is None:
+            # Lots of the previous user are final once the ledger moves on
+            for finished in books.values():
+                finished.save()
+            books = {row.user_id: LotBook(row.user_id)}
+            book = books[row.user_id]
+        if row.type == 'buy':
+            book.buy(row.coin, row.quantity, row.total_price, row.purchased_at)
+        else:
+            row.cost_basis = book.sell(row.coin, row.quantity)
+            row.realized_gain = row.total_price - row.cost_basis
+            sells.append(row)
+            if len(sells) >= 500:
+                Transaction.objects.bulk_update(sells, ['cost_basis', 'realized_gain'])
+                sells = []
+    for book in books.values():
+        book.save()
+    Transaction.objects.bulk_update(sells, ['cost_basis', 'realized_gain'], batch_size=500)
@@ -0,0 +1,143 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from cryptoApp.stub_server import CoinGeckoStub
+import asyncio
+import httpx
+import json
+import os
+import random
+import socket
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def _drive(base_url, path, coins, requests, concurrency):
+    latencies, errors = [], 0
+    queue = iter(range(requests))
+
+    async def user(client):
+        nonlocal errors
+        for _ in queue:
+            started = time.perf_counter()
+            try:
+                response = await client.get(path, params={'ids': random.choice(coins)})
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*[user(client) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+class Command(BaseCommand):
+    help = ("Load test /live-prices/ under gunicorn sync workers (WSGI) against /async/live-prices/ "
+            "under uvicorn workers (ASGI), both backed by a local CoinGecko stub.")
+
+    SERVERS = {
+        'wsgi': (['gunicorn', 'crypto.wsgi', '--worker-class', 'sync'], '/live-prices/'),
+        'asgi': (['gunicorn', 'crypto.asgi:application', '-c', 'crypto/gunicorn_asgi.py'], '/async/live-prices/'),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Server processes for each setup.')
+        parser.add_argument('--concurrency', type=int, default=200, help='Requests kept in flight.')
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--latency', type=float, default=0.1, help='Stub provider latency in seconds.')
+        parser.add_argument('--coins', type=int, default=1000,
+                            help='Distinct coins requested, so requests rarely share a provider call.')
+        parser.add_argument('--only', choices=sorted(self.SERVERS), help='Benchmark one setup only.')
+
+    def handle(self, *args, **options):
+        coins = [f'coin{index}' for index in range(options['coins'])]
+        stub = CoinGeckoStub({coin: 1.0 for coin in coins}, latency=options['latency']).start()
+
+        # Servers run against a migrated scratch copy of the database
+        scratch = tempfile.mkdtemp()
+        self.database = os.path.join(scratch, 'bench.sqlite3')
+        shutil.copy(settings.DATABASES['default']['NAME'], self.database)
+        subprocess.run([sys.executable, 'manage.py', 'migrate', '--verbosity', '0'], cwd=settings.BASE_DIR,
+                       env=dict(os.environ, SQLITE_PATH=self.database), check=True)
+
+        report = {key: options[key] for key in ('workers', 'concurrency', 'requests', 'latency')}
+        try:
+            for name, (command, path) in self.SERVERS.items():
+                if options['only'] and name != options['only']:
+                    continue
+                report[name] = self._run(command, path, stub, coins, options)
+        finally:
+            stub.stop()
+            shutil.rmtree(scratch)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def _run(self, command, path, stub, coins, options):
+        port = _free_port()
+        env = dict(
+            os.environ,
+            COINGECKO_API_URL=stub.url,
+            PORT=str(port),
+            WEB_CONCURRENCY=str(options['workers']),
+            # Every request goes to the provider: nothing is cached or served stale
+            PRICE_CACHE_TTL='0',
+            PRICE_REVALIDATE_WINDOW='0',
+            PRICE_HTTP_POOL_SIZE=str(options['concurrency']),
+            PRICE_ASYNC_POOL_SIZE=str(options['concurrency']),
+            PRICE_BREAKER_FAILURE_THRESHOLD=str(options['requests']),
+            CACHE_BACKEND='locmem',
+            SQLITE_PATH=self.database,
+        )
+        argv = [sys.executable, '-m', *command, '--bind', f'127.0.0.1:{port}', '--workers', str(options['workers']),
+                '--log-level', 'warning']
+        server = subprocess.Popen(argv, cwd=settings.BASE_DIR, env=env)
+        try:
+            self._wait_for(port, server)
+            stub.requests.clear()
+            latencies, errors, elapsed = asyncio.run(
+                _drive(f'http://127.0.0.1:{port}', path, coins, options['requests'], options['concurrency'])
+            )
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+        return {
+            'path': path,
+            'throughput_rps': round(len(latencies) / elapsed, 1),
+            'latency_ms': {
+                'p50': round(_percentile(latencies, 0.50) * 1000, 1),
+                'p95': round(_percentile(latencies, 0.95) * 1000, 1),
+                'p99': round(_percentile(latencies, 0.99) * 1000, 1),
+            },
+            'errors': errors,
+            'provider_calls': len(stub.requests),
+        }
+
+    def _wait_for(self, port, server, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with status {server.returncode}.")
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError("Server did not start in time.")
@@ -0,0 +1,90 @@
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from cryptoApp.cache_backends import SharedMemoryCache
+from decimal import Decimal
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+
+COINS = ['bitcoin', 'ethereum', 'tether', 'dogecoin', 'solana', 'cardano', 'ripple', 'polkadot']
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+# One simulated gunicorn worker: look up random coin quotes, "fetching" from upstream on a miss
+def _worker(make_cache, options, seed, results):
+    cache = make_cache()
+    rng = random.Random(seed)
+    hits = misses = 0
+    latencies = []
+    for _ in range(options['requests']):
+        key = f"price_quote_{rng.choice(COINS)}_usd"
+        started = time.perf_counter()
+        value = cache.get(key)
+        latencies.append(time.perf_counter() - started)
+        if value is None:
+            misses += 1
+            time.sleep(options['upstream_latency'])
+            cache.set(key, Decimal('123.45'), timeout=options['ttl'])
+        else:
+            hits += 1
+        time.sleep(options['think_time'])
+    results.put((hits, misses, latencies))
+
+
+class Command(BaseCommand):
+    help = "Compare hit rate and lookup latency of LocMemCache and SharedMemoryCache across N worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=2000, help='Lookups per worker.')
+        parser.add_argument('--ttl', type=float, default=2.0, help='Quote freshness in seconds.')
+        parser.add_argument('--upstream-latency', type=float, default=0.005, help='Simulated fetch time on a miss.')
+        parser.add_argument('--think-time', type=float, default=0.0005, help='Pause between lookups.')
+
+    def handle(self, *args, **options):
+        path = os.path.join(tempfile.mkdtemp(), 'bench-cache')
+        backends = {
+            'locmem': lambda: LocMemCache('bench', {}),
+            'shared': lambda: SharedMemoryCache(path, {'OPTIONS': {'SLOTS': 1024}}),
+        }
+
+        report = {'workers': options['workers'], 'requests_per_worker': options['requests'], 'backends': {}}
+        context = multiprocessing.get_context('fork')
+        for name, make_cache in backends.items():
+            results = context.Queue()
+            started = time.perf_counter()
+            workers = [
+                context.Process(target=_worker, args=(make_cache, options, seed, results))
+                for seed in range(options['workers'])
+            ]
+            for worker in workers:
+                worker.start()
+            collected = [results.get() for _ in workers]
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+
+            hits = sum(result[0] for result in collected)
+            misses = sum(result[1] for result in collected)
+            latencies = [latency for result in collected for latency in result[2]]
+            report['backends'][name] = {
+                'hit_rate': round(hits / (hits + misses), 4),
+                'upstream_fetches': misses,
+                'get_latency_us': {
+                    'mean': round(statistics.fmean(latencies) * 1e6, 2),
+                    'p50': round(_percentile(latencies, 0.50) * 1e6, 2),
+                    'p99': round(_percentile(latencies, 0.99) * 1e6, 2),
+                },
+                'wall_seconds': round(elapsed, 3),
+            }
+
+        os.remove(path)
+        self.stdout.write(json.dumps(report, indent=2))
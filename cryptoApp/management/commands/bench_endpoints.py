@@ -0,0 +1,282 @@
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from cryptoApp import urls
+from cryptoApp.leaderboard import mark_leaderboard
+from cryptoApp.lots import rebuild_cost_basis
+from cryptoApp.models import Register, Profile, Transaction, TokenBalance, PriceSnapshot, PriceHistory
+from cryptoApp.stub_server import CoinGeckoStub
+from cryptoApp.summaries import rebuild_profit_loss_summaries
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+from PIL import Image
+from urllib.parse import unquote
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PRICES = {'bitcoin': 50000, 'ethereum': 3000, 'solana': 150, 'tether': 1, 'dogecoin': 0.1, 'cardano': 0.5}
+TRADED_COINS = ('bitcoin', 'ethereum', 'solana')
+PASSWORD = 'Bench@123'
+ANSWER = 'blue'
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _photo():
+    buffer = BytesIO()
+    Image.new('RGB', (256, 256), (40, 120, 200)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+PHOTO = _photo()
+_signups = itertools.count()
+
+
+def _upload():
+    return SimpleUploadedFile('bench.png', PHOTO, content_type='image/png')
+
+
+def _trade(email):
+    return {'data': {'email': email, 'coin': 'bitcoin', 'quantity': 1}}
+
+
+# How to call each named route in cryptoApp/urls.py for a seeded user: (method, URL kwargs, request kwargs)
+ROUTES = {
+    'register': ('post', False, lambda email: {'data': {
+        'username': 'load', 'email': f'load{next(_signups)}-{time.time_ns()}@example.com', 'password': PASSWORD,
+        'security_question': ANSWER,
+    }}),
+    'login': ('post', False, lambda email: {'data': {'email': email, 'password': PASSWORD}}),
+    'reset_password': ('post', False, lambda email: {'data': {
+        'email': email, 'question': ANSWER, 'new_password': PASSWORD, 'confirm_password': PASSWORD,
+    }}),
+    'profile': ('get', True, lambda email: {}),
+    'full_profile_view': ('get', True, lambda email: {}),
+    'photo_upload': ('post', True, lambda email: {'data': {'photo': _upload()}}),
+    'photo_delete': ('delete', True, lambda email: {}),
+    'wallet_amount': ('get', True, lambda email: {}),
+    'get_live_prices': ('get', False, lambda email: {'data': {'ids': 'bitcoin,ethereum'}}),
+    'price_provider_status': ('get', False, lambda email: {}),
+    'identity_cache_status': ('get', False, lambda email: {}),
+    'purchase_tokens': ('post', False, _trade),
+    'sell_tokens': ('post', False, _trade),
+    'batch_orders': ('post', False, lambda email: {'data': json.dumps({'email': email, 'orders': [
+        {'type': 'buy', 'coin': 'bitcoin', 'quantity': 1}, {'type': 'sell', 'coin': 'ethereum', 'quantity': 1},
+    ]}), 'content_type': 'application/json'}),
+    'user_transactions': ('get', True, lambda email: {}),
+    'purchased_token_summary': ('get', True, lambda email: {}),
+    'token_balances': ('get', True, lambda email: {}),
+    'sell_transactions': ('get', True, lambda email: {}),
+    'profit_loss_summary': ('get', True, lambda email: {}),
+    'portfolio': ('get', True, lambda email: {}),
+    'portfolio_history': ('get', True, lambda email: {'data': {'bucket': 'day'}}),
+    'export_transactions': ('get', True, lambda email: {'data': {'format': 'csv'}}),
+    'leaderboard': ('get', False, lambda email: {}),
+    'leaderboard_rank': ('get', True, lambda email: {}),
+    'async_get_live_prices': ('get', False, lambda email: {'data': {'ids': 'bitcoin,ethereum'}}),
+    'async_purchase_tokens': ('post', False, _trade),
+    'async_sell_tokens': ('post', False, _trade),
+    'async_profit_loss_summary': ('get', True, lambda email: {}),
+}
+
+
+def route_names():
+    return [pattern.name for pattern in urls.urlpatterns]
+
+
+class Command(BaseCommand):
+    help = ("Load test every route in cryptoApp/urls.py against a seeded scratch database and a local "
+            "CoinGecko stub, reporting throughput, p50/p95/p99 latency and queries per request as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--transactions', type=int, default=200, help='Ledger rows seeded per user.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per route.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Requests kept in flight.')
+        parser.add_argument('--latency', type=float, default=0.05, help='Stub provider latency in seconds.')
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help='Fraction of provider calls the stub fails with 503.')
+        parser.add_argument('--price-cache-ttl', type=int, default=0,
+                            help='Seconds a quote is cached; 0 sends every price lookup to the stub.')
+        parser.add_argument('--only', nargs='+', metavar='ROUTE', help='Drive only these route names.')
+        parser.add_argument('--output', help='Write the JSON report here instead of stdout.')
+        parser.add_argument('--in-process', action='store_true',
+                            help='Seed and drive the configured database and print this run only.')
+
+    def handle(self, *args, **options):
+        unknown = sorted(set(options['only'] or ()) - set(ROUTES))
+        if unknown:
+            raise CommandError(f"Unknown route(s): {', '.join(unknown)}.")
+
+        if options['in_process']:
+            self.stdout.write(json.dumps(self._run(options)))
+            return
+
+        stub = CoinGeckoStub(dict(PRICES), latency=options['latency'], error_rate=options['error_rate']).start()
+        scratch = tempfile.mkdtemp()
+        env = dict(
+            os.environ,
+            COINGECKO_API_URL=stub.url,
+            # Quotes come from the stub, not the seeded snapshot, so its latency and errors are felt
+            PRICE_CACHE_TTL=str(options['price_cache_ttl']),
+            PRICE_REVALIDATE_WINDOW='0',
+            PRICE_SNAPSHOT_MAX_AGE='0',
+            CACHE_BACKEND='locmem',
+            SQLITE_PATH=os.path.join(scratch, 'bench.sqlite3'),
+        )
+        argv = [sys.executable, 'manage.py', 'bench_endpoints', '--in-process']
+        for option in ('users', 'transactions', 'requests', 'concurrency'):
+            argv += [f'--{option}', str(options[option])]
+        if options['only']:
+            argv += ['--only', *options['only']]
+        try:
+            subprocess.run([sys.executable, 'manage.py', 'migrate', '--verbosity', '0'],
+                           cwd=settings.BASE_DIR, env=env, check=True)
+            result = subprocess.run(argv, cwd=settings.BASE_DIR, env=env, check=True, capture_output=True, text=True)
+        finally:
+            stub.stop()
+            shutil.rmtree(scratch)
+
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        report['config'].update({key: options[key] for key in ('latency', 'error_rate', 'price_cache_ttl')})
+        report['provider_calls'] = len(stub.requests)
+        body = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(body + '\n')
+        else:
+            self.stdout.write(body)
+
+    def _run(self, options):
+        emails = self._seed(options['users'], options['transactions'])
+        names = options['only'] or route_names()
+
+        endpoints = {}
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            for name in names:
+                if name in ROUTES:
+                    endpoints[name] = self._drive(name, emails, options['requests'], options['concurrency'])
+
+        return {
+            'config': {key: options[key] for key in ('users', 'transactions', 'requests', 'concurrency')},
+            'endpoints': endpoints,
+            # Routes added to urls.py without a ROUTES entry, so nobody forgets to benchmark them
+            'not_driven': sorted(set(route_names()) - set(ROUTES)),
+        }
+
+    def _seed(self, users, transactions):
+        password = make_password(PASSWORD)
+        registers = Register.objects.bulk_create(
+            Register(username=f'bench{index}', email=f'bench{index}@example.com', password=password,
+                     security_question=ANSWER)
+            for index in range(users)
+        )
+        Profile.objects.bulk_create(Profile(user=user) for user in registers)
+
+        # Buys of 2 and sells of 1 keep every holding positive, so sells always fill
+        start = timezone.now() - timedelta(hours=transactions)
+
+        def trade(user, index):
+            coin = TRADED_COINS[index % len(TRADED_COINS)]
+            kind, quantity = ('sell', 1) if index % 4 == 3 else ('buy', 2)
+            return Transaction(user=user, coin=coin, quantity=quantity, total_price=Decimal(PRICES[coin]) * quantity,
+                               type=kind, purchased_at=start + timedelta(hours=index))
+
+        Transaction.objects.bulk_create(
+            (trade(user, index) for user in registers for index in range(transactions)),
+            batch_size=2000,
+        )
+        held = {}
+        for user_id, coin, kind, quantity in Transaction.objects.values_list('user_id', 'coin', 'type', 'quantity'):
+            held[(user_id, coin)] = held.get((user_id, coin), 0) + (quantity if kind == 'buy' else -quantity)
+        TokenBalance.objects.bulk_create(
+            TokenBalance(user_id=user_id, coin=coin, quantity=quantity) for (user_id, coin), quantity in held.items()
+        )
+
+        now = timezone.now()
+        PriceSnapshot.objects.bulk_create(
+            PriceSnapshot(coin=coin, price=Decimal(str(price)), fetched_at=now) for coin, price in PRICES.items()
+        )
+        PriceHistory.objects.bulk_create(
+            (
+                PriceHistory(coin=coin, price=Decimal(str(price)), recorded_at=start + timedelta(days=day))
+                for coin, price in PRICES.items()
+                for day in range(transactions // 24 + 1)
+            ),
+            batch_size=2000,
+        )
+        rebuild_cost_basis()
+        rebuild_profit_loss_summaries()
+        mark_leaderboard(rebuild=True)
+        return [user.email for user in registers]
+
+    def _drive(self, name, emails, requests, concurrency):
+        method, per_user, build = ROUTES[name]
+        latencies, queries, statuses = [], [], {}
+        lock = threading.Lock()
+        queue = iter(range(requests))
+
+        def worker():
+            # A host the configured ALLOWED_HOSTS accepts
+            client = Client(raise_request_exception=False,
+                            HTTP_HOST=settings.ALLOWED_HOSTS[0].lstrip('.').replace('*', 'localhost'))
+            try:
+                for index in queue:
+                    email = emails[index % len(emails)]
+                    path = reverse(name, kwargs={'email': email} if per_user else None)
+                    started = time.perf_counter()
+                    with CaptureQueriesContext(connection) as captured:
+                        response = getattr(client, method)(path, **build(email))
+                        if response.streaming:
+                            b''.join(response.streaming_content)
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+                        queries.append(len(captured.captured_queries))
+                        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        errors = sum(count for status, count in statuses.items() if status >= 400)
+        return {
+            'method': method.upper(),
+            'path': unquote(reverse(name, kwargs={'email': '{email}'} if per_user else None)),
+            'requests': len(latencies),
+            'throughput_rps': round(len(latencies) / elapsed, 1),
+            'latency_ms': {
+                'p50': round(_percentile(latencies, 0.50) * 1000, 2),
+                'p95': round(_percentile(latencies, 0.95) * 1000, 2),
+                'p99': round(_percentile(latencies, 0.99) * 1000, 2),
+            },
+            'queries_per_request': {
+                'mean': round(sum(queries) / len(queries), 1),
+                'max': max(queries),
+            },
+            'statuses': {str(status): count for status, count in sorted(statuses.items())},
+            'error_rate': round(errors / len(latencies), 3),
+        }
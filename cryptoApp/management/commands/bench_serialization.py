@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from cryptoApp.models import Register, Transaction
+from cryptoApp.renderers import FastJSONRenderer
+from cryptoApp.serializers import TRANSACTION_FIELDS, TransactionSerializer, transaction_rows
+from datetime import timedelta
+from decimal import Decimal
+import json
+import time
+
+
+def _best_of(repeat, run):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = run()
+        timings.append(time.perf_counter() - started)
+    return round(min(timings) * 1000, 1), body
+
+
+class Command(BaseCommand):
+    help = ("Compare serializing a transaction list through TransactionSerializer + JSONRenderer with the "
+            "values() path + FastJSONRenderer. Rows are created inside a transaction that is rolled back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        report = {}
+        with transaction.atomic():
+            user = Register.objects.create(username='bench-serialization', email='bench-serialization@example.com',
+                                           password='Bench@123')
+            for size in options['sizes']:
+                Transaction.objects.filter(user=user).delete()
+                self._seed(user, size)
+                report[size] = self._measure(user, options['repeat'])
+            transaction.set_rollback(True)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def _seed(self, user, size):
+        now = timezone.now()
+        Transaction.objects.bulk_create(
+            (
+                Transaction(user=user, coin=('bitcoin', 'ethereum', 'solana')[index % 3], quantity=index % 7 + 1,
+                            total_price=Decimal(index % 10000) / 4, type='buy' if index % 2 else 'sell',
+                            purchased_at=now - timedelta(seconds=index))
+                for index in range(size)
+            ),
+            batch_size=2000,
+        )
+
+    def _measure(self, user, repeat):
+        queryset = Transaction.objects.filter(user=user).order_by('-purchased_at', '-id')
+
+        model_ms, model_body = _best_of(repeat, lambda: JSONRenderer().render(
+            TransactionSerializer(list(queryset), many=True).data))
+        values_ms, _ = _best_of(repeat, lambda: JSONRenderer().render(
+            transaction_rows(list(queryset.values(*TRANSACTION_FIELDS)))))
+        lean_ms, lean_body = _best_of(repeat, lambda: FastJSONRenderer().render(
+            transaction_rows(list(queryset.values(*TRANSACTION_FIELDS)))))
+
+        return {
+            'model_serializer_ms': model_ms,
+            'values_rows_ms': values_ms,
+            'values_rows_orjson_ms': lean_ms,
+            'speedup': round(model_ms / lean_ms, 1),
+            'identical_output': json.loads(model_body) == json.loads(lean_body),
+        }
@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from cryptoApp.models import Register, Transaction
+from cryptoApp.trading import execute_buy, execute_sell, TradeError
+from decimal import Decimal
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else None
+
+
+class Command(BaseCommand):
+    help = ("Measure trades per second with concurrent writers (and readers), with the SQLite "
+            "production profile off and on, each against a fresh scratch database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--trades', type=int, default=200, help='Trades per writer.')
+        parser.add_argument('--readers', type=int, default=2, help='Threads reading history while trades run.')
+        parser.add_argument('--in-process', action='store_true',
+                            help='Run against the configured database and print this run only.')
+
+    def handle(self, *args, **options):
+        if options['in_process']:
+            self.stdout.write(json.dumps(self._run(options)))
+            return
+
+        report = {key: options[key] for key in ('writers', 'trades', 'readers')}
+        for profile in ('off', 'on'):
+            scratch = tempfile.mkdtemp()
+            env = dict(os.environ, SQLITE_TUNING=profile, SQLITE_PATH=os.path.join(scratch, 'bench.sqlite3'))
+            try:
+                subprocess.run([sys.executable, 'manage.py', 'migrate', '--verbosity', '0'],
+                               cwd=settings.BASE_DIR, env=env, check=True)
+                result = subprocess.run(
+                    [sys.executable, 'manage.py', 'bench_trades', '--in-process', '--writers', str(options['writers']),
+                     '--trades', str(options['trades']), '--readers', str(options['readers'])],
+                    cwd=settings.BASE_DIR, env=env, check=True, capture_output=True, text=True,
+                )
+            finally:
+                shutil.rmtree(scratch)
+            report[f'profile_{profile}'] = json.loads(result.stdout.strip().splitlines()[-1])
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def _run(self, options):
+        users = [
+            Register.objects.create(username=f'bench{index}', email=f'bench{index}@example.com', password='Bench@123')
+            for index in range(options['writers'])
+        ]
+        price = Decimal('10')
+        latencies, errors, reads = [], [], [0]
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def writer(user_id):
+            try:
+                for index in range(options['trades']):
+                    execute = execute_buy if index % 2 == 0 else execute_sell
+                    started = time.perf_counter()
+                    try:
+                        execute(user_id, 'bitcoin', 1, price)
+                    except (OperationalError, TradeError) as exc:
+                        with lock:
+                            errors.append(str(exc))
+                        continue
+                    with lock:
+                        latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+
+        def reader():
+            try:
+                while not done.is_set():
+                    list(Transaction.objects.filter(user_id=users[0].id).order_by('-purchased_at', '-id')[:50])
+                    with lock:
+                        reads[0] += 1
+            finally:
+                connection.close()
+
+        readers = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        writers = [threading.Thread(target=writer, args=(user.id,)) for user in users]
+        for thread in readers:
+            thread.start()
+        started = time.perf_counter()
+        for thread in writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        done.set()
+        for thread in readers:
+            thread.join()
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        return {
+            'journal_mode': journal_mode,
+            'trades_per_second': round(len(latencies) / elapsed, 1),
+            'trade_latency_ms': {
+                'p50': round(_percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+                'p99': round(_percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+            },
+            'failed_trades': len(errors),
+            'errors': sorted(set(errors))[:5],
+            'reads_per_second': round(reads[0] / elapsed, 1),
+        }
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from cryptoApp.models import PriceHistory
+from cryptoApp.state import bump_price_version
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+import csv
+
+
+def _recorded_at(value):
+    try:
+        return datetime.fromtimestamp(float(value), tz=dt_timezone.utc)
+    except ValueError:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(f"Invalid timestamp: {value}")
+        return timezone.make_aware(moment, dt_timezone.utc) if timezone.is_naive(moment) else moment
+
+
+class Command(BaseCommand):
+    help = ("Import historical prices from a CSV file with columns coin, timestamp, price and optionally "
+            "vs_currency. Timestamps are ISO 8601 (UTC when naive) or Unix seconds. Existing points are overwritten.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--vs-currency', default='usd', help='Currency for rows without a vs_currency column.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        imported = 0
+        batch = []
+        with open(options['path'], newline='') as handle:
+            for line, row in enumerate(csv.DictReader(handle), start=2):
+                try:
+                    batch.append(PriceHistory(
+                        coin=row['coin'].strip().lower(),
+                        vs_currency=(row.get('vs_currency') or options['vs_currency']).strip().lower(),
+                        price=Decimal(row['price']),
+                        recorded_at=_recorded_at(row['timestamp'].strip()),
+                    ))
+                except (KeyError, AttributeError, ValueError, InvalidOperation) as exc:
+                    raise CommandError(f"Line {line}: {exc}")
+                if len(batch) >= options['batch_size']:
+                    imported += self._store(batch)
+                    batch = []
+        imported += self._store(batch)
+
+        bump_price_version()
+        self.stdout.write(f"Imported {imported} price point(s).")
+
+    def _store(self, batch):
+        PriceHistory.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=['coin', 'vs_currency', 'recorded_at'],
+            update_fields=['price'],
+        )
+        return len(batch)
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from cryptoApp.prices import poll_prices, poller_heartbeat, PriceUnavailable
+import time
+import traceback
+
+
+class Command(BaseCommand):
+    help = "Poll the price provider for every tracked coin and keep the local price snapshot fresh."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=settings.PRICE_POLL_INTERVAL,
+                            help='Seconds between polls.')
+        parser.add_argument('--once', action='store_true', help='Poll a single time and exit.')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            # While the poller runs, requests serve the snapshot instead of calling the provider
+            poller_heartbeat()
+            try:
+                snapshots = poll_prices()
+                self.stdout.write(f"Stored {len(snapshots)} price quote(s).")
+            except PriceUnavailable as exc:
+                self.stderr.write(f"Price poll failed: {exc}")
+            except Exception:
+                # A locked database or a malformed response must not stop the poller for good
+                self.stderr.write(f"Price poll failed:\n{traceback.format_exc()}")
+
+            if options['once']:
+                return
+            time.sleep(max(0, options['interval'] - (time.monotonic() - started)))
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from cryptoApp.lots import COST_BASIS_METHODS, rebuild_cost_basis
+from cryptoApp.models import CostLot, Register
+from cryptoApp.summaries import rebuild_profit_loss_summaries
+
+
+class Command(BaseCommand):
+    help = ("Replay the Transaction ledger into cost-basis lots with COST_BASIS_METHOD, recording each sell's "
+            "cost basis and realized gain, then recompute ProfitLossSummary rows.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help='Only rebuild this user\'s lots.')
+
+    def handle(self, *args, **options):
+        if settings.COST_BASIS_METHOD not in COST_BASIS_METHODS:
+            raise CommandError(f"COST_BASIS_METHOD must be one of: {', '.join(COST_BASIS_METHODS)}.")
+
+        user = None
+        if options['email']:
+            try:
+                user = Register.objects.get(email=options['email'])
+            except Register.DoesNotExist:
+                raise CommandError(f"No user registered with {options['email']}.")
+
+        with transaction.atomic():
+            rebuild_cost_basis(user)
+            rows = rebuild_profit_loss_summaries(user)
+        lots = CostLot.objects.filter(**({} if user is None else {'user': user})).count()
+        self.stdout.write(f"Rebuilt {lots} open lot(s) ({settings.COST_BASIS_METHOD}) and {len(rows)} summary row(s).")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from cryptoApp.leaderboard import mark_leaderboard
+
+
+class Command(BaseCommand):
+    help = ("Recompute every LeaderboardEntry from ProfitLossSummary rows, cash flow included, "
+            "valued at the current usd price snapshot.")
+
+    def handle(self, *args, **options):
+        entries = mark_leaderboard(rebuild=True)
+        self.stdout.write(f"Rebuilt {entries} leaderboard entr{'y' if entries == 1 else 'ies'}.")
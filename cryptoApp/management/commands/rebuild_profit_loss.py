@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from cryptoApp.models import Register
+from cryptoApp.summaries import rebuild_profit_loss_summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute ProfitLossSummary rows from the Transaction ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help='Only rebuild this user\'s summaries.')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['email']:
+            try:
+                user = Register.objects.get(email=options['email'])
+            except Register.DoesNotExist:
+                raise CommandError(f"No user registered with {options['email']}.")
+
+        rows = rebuild_profit_loss_summaries(user)
+        self.stdout.write(f"Rebuilt {len(rows)} summary row(s).")
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:55
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cryptoApp', '0002_alter_profitlosssummary_holding_quantity_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('coin', models.CharField(max_length=100)),
+                ('vs_currency', models.CharField(default='usd', max_length=10)),
+                ('price', models.DecimalField(decimal_places=10, max_digits=30)),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'unique_together': {('coin', 'vs_currency')},
+            },
+        ),
+    ]
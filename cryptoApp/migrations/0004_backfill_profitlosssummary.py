@@ -0,0 +1,44 @@
+from decimal import Decimal
+from django.db import migrations
+from django.db.models import Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+# Summaries used to be rebuilt on every read; seed them once from the ledger so
+# the incremental updates applied on each trade start from the right totals.
+def backfill_summaries(apps, schema_editor):
+    Transaction = apps.get_model('cryptoApp', 'Transaction')
+    ProfitLossSummary = apps.get_model('cryptoApp', 'ProfitLossSummary')
+    db = schema_editor.connection.alias
+
+    zero = Value(Decimal('0.00'))
+    totals = Transaction.objects.using(db).values('user_id', 'coin').annotate(
+        total_purchased_quantity=Coalesce(Sum('quantity', filter=Q(type='buy')), 0),
+        total_invested=Coalesce(Sum('total_price', filter=Q(type='buy')), zero),
+        total_sold_quantity=Coalesce(Sum('quantity', filter=Q(type='sell')), 0),
+        total_earned=Coalesce(Sum('total_price', filter=Q(type='sell')), zero),
+    )
+
+    for row in totals:
+        ProfitLossSummary.objects.using(db).update_or_create(
+            user_id=row['user_id'],
+            coin=row['coin'],
+            defaults={
+                'total_purchased_quantity': row['total_purchased_quantity'],
+                'total_invested': row['total_invested'],
+                'total_sold_quantity': row['total_sold_quantity'],
+                'total_earned': row['total_earned'],
+                'holding_quantity': row['total_purchased_quantity'] - row['total_sold_quantity'],
+            },
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cryptoApp', '0003_pricesnapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cryptoApp', '0004_backfill_profitlosssummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'type', 'purchased_at', 'id'], name='txn_user_type_time_idx'),
+        ),
+    ]
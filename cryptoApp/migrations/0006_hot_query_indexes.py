@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cryptoApp', '0005_transaction_history_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'purchased_at', 'id'], name='txn_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'coin', 'purchased_at', 'id'], name='txn_user_coin_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'type', 'coin', 'quantity', 'total_price'], name='txn_user_type_coin_idx'),
+        ),
+    ]
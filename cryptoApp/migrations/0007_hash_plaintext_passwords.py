@@ -0,0 +1,25 @@
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.db import migrations
+
+
+# Passwords used to be stored as typed; hash every one that is not already a hash
+def hash_passwords(apps, schema_editor):
+    Register = apps.get_model('cryptoApp', 'Register')
+    db = schema_editor.connection.alias
+
+    for user in Register.objects.using(db).only('id', 'password').iterator():
+        try:
+            identify_hasher(user.password)
+        except ValueError:
+            Register.objects.using(db).filter(id=user.id).update(password=make_password(user.password))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cryptoApp', '0006_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(hash_passwords, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cryptoApp', '0008_profile_photo_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('coin', models.CharField(max_length=100)),
+                ('vs_currency', models.CharField(default='usd', max_length=10)),
+                ('price', models.DecimalField(decimal_places=10, max_digits=30)),
+                ('recorded_at', models.DateTimeField()),
+            ],
+            options={
+                'unique_together': {('coin', 'vs_currency', 'recorded_at')},
+            },
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:41
+
+import django.db.models.deletion
+from collections import defaultdict, deque
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+CENT = Decimal('0.01')
+
+
+# Replay the existing ledger into open lots, each sell's cost basis and realized gain,
+# and the summaries' running totals, so trades after the upgrade start from the right lots.
+def backfill_cost_basis(apps, schema_editor):
+    Transaction = apps.get_model('cryptoApp', 'Transaction')
+    CostLot = apps.get_model('cryptoApp', 'CostLot')
+    ProfitLossSummary = apps.get_model('cryptoApp', 'ProfitLossSummary')
+    db = schema_editor.connection.alias
+    average = getattr(settings, 'COST_BASIS_METHOD', 'fifo') == 'average'
+
+    lots = defaultdict(deque)
+    sells = []
+    totals = defaultdict(lambda: [Decimal('0.00'), Decimal('0.00')])
+    for row in Transaction.objects.using(db).order_by('purchased_at', 'id').iterator(chunk_size=2000):
+        key = (row.user_id, row.coin)
+        if row.type == 'buy':
+            if average and lots[key]:
+                lots[key][0].quantity += row.quantity
+                lots[key][0].cost += row.total_price
+            else:
+                lots[key].append(CostLot(user_id=row.user_id, coin=row.coin, quantity=row.quantity,
+                                         cost=row.total_price, acquired_at=row.purchased_at))
+            totals[key][0] += row.total_price
+            continue
+
+        quantity, released = row.quantity, Decimal('0.00')
+        while quantity and lots[key]:
+            lot = lots[key][0]
+            taken = min(quantity, lot.quantity)
+            cost = lot.cost if taken == lot.quantity else (lot.cost * taken / lot.quantity).quantize(CENT)
+            lot.quantity -= taken
+            lot.cost -= cost
+            released += cost
+            quantity -= taken
+            if not lot.quantity:
+                lots[key].popleft()
+        row.cost_basis, row.realized_gain = released, row.total_price - released
+        sells.append(row)
+        totals[key][0] -= released
+        totals[key][1] += row.realized_gain
+
+    CostLot.objects.using(db).bulk_create([lot for queue in lots.values() for lot in queue], batch_size=500)
+    Transaction.objects.using(db).bulk_update(sells, ['cost_basis', 'realized_gain'], batch_size=500)
+    for (user_id, coin), (cost_basis, realized_gain) in totals.items():
+        ProfitLossSummary.objects.using(db).filter(user_id=user_id, coin=coin).update(cost_basis=cost_basis,
+                                                                            realized_gain=realized_gain)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cryptoApp', '0009_price_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profitlosssummary',
+            name='cost_basis',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20),
+        ),
+        migrations.AddField(
+            model_name='profitlosssummary',
+            name='realized_gain',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='cost_basis',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='realized_gain',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=20, null=True),
+        ),
+        migrations.CreateModel(
+            name='CostLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('coin', models.CharField(max_length=100)),
+                ('quantity', models.PositiveIntegerField()),
+                ('cost', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('acquired_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_lots', to='cryptoApp.register')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'coin', 'acquired_at', 'id'], name='lot_user_coin_fifo_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_cost_basis, migrations.RunPython.noop),
+    ]
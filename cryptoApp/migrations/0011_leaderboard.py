@@ -0,0 +1,51 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:47
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# One entry per user who has traded, valued at the current usd snapshot
+def backfill_leaderboard(apps, schema_editor):
+    ProfitLossSummary = apps.get_model('cryptoApp', 'ProfitLossSummary')
+    PriceSnapshot = apps.get_model('cryptoApp', 'PriceSnapshot')
+    LeaderboardEntry = apps.get_model('cryptoApp', 'LeaderboardEntry')
+    db = schema_editor.connection.alias
+    prices = {coin.lower(): price for coin, price in PriceSnapshot.objects.using(db).filter(vs_currency='usd').values_list('coin', 'price')}
+
+    now = timezone.now()
+    entries = {}
+    for row in ProfitLossSummary.objects.using(db).iterator(chunk_size=2000):
+        entry = entries.setdefault(row.user_id, LeaderboardEntry(user_id=row.user_id, marked_at=now))
+        entry.cash_flow += row.total_earned - row.total_invested
+        entry.holdings_value += row.holding_quantity * prices.get(row.coin.lower(), Decimal('0'))
+    for entry in entries.values():
+        entry.holdings_value = entry.holdings_value.quantize(Decimal('0.01'))
+        entry.net_profit_loss = entry.cash_flow + entry.holdings_value
+    LeaderboardEntry.objects.using(db).bulk_create(entries.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cryptoApp', '0010_cost_basis_lots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cash_flow', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20)),
+                ('holdings_value', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20)),
+                ('net_profit_loss', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20)),
+                ('marked_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entry', to='cryptoApp.register')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-net_profit_loss', 'user'], name='leaderboard_rank_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_leaderboard, migrations.RunPython.noop),
+    ]
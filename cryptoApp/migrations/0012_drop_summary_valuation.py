@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-18 04:08
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cryptoApp', '0011_leaderboard'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='profitlosssummary',
+            name='current_price',
+        ),
+        migrations.RemoveField(
+            model_name='profitlosssummary',
+            name='holding_amount',
+        ),
+        migrations.RemoveField(
+            model_name='profitlosssummary',
+            name='net_profit_loss',
+        ),
+    ]
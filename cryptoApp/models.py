@@ -21,6 +21,8 @@ class Profile(models.Model):
     user = models.OneToOneField(Register, on_delete=models.CASCADE, related_name='profile')
     wallet_amount = models.DecimalField(max_digits=12, decimal_places=2, default=10000000.00)
     photo_url = models.ImageField(upload_to='profile_photos/', blank=True, null=True)
+    # {size: {format: storage name}} for the resized copies made by cryptoApp.photos
+    photo_variants = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
         return self.user.username
@@ -44,6 +46,19 @@ class Transaction(models.Model):
     total_price = models.DecimalField(max_digits=20, decimal_places=2)
     type = models.CharField(max_length=4, choices=TRANSACTION_TYPES, default='buy')
     purchased_at = models.DateTimeField(default=timezone.now)
+    # Sells only: cost of the lots the sale consumed, and total_price minus that cost
+    cost_basis = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True)
+    realized_gain = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of a user's history, optionally narrowed to buys or sells
+            models.Index(fields=['user', 'type', 'purchased_at', 'id'], name='txn_user_type_time_idx'),
+            models.Index(fields=['user', 'purchased_at', 'id'], name='txn_user_time_idx'),
+            models.Index(fields=['user', 'coin', 'purchased_at', 'id'], name='txn_user_coin_time_idx'),
+            # Covers the per-coin buy totals grouped by purchased_token_summary
+            models.Index(fields=['user', 'type', 'coin', 'quantity', 'total_price'], name='txn_user_type_coin_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.type}:: {self.coin}: {self.quantity}"
@@ -71,9 +86,9 @@ class ProfitLossSummary(models.Model):
     total_sold_quantity = models.PositiveIntegerField(default=0)
     total_earned = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
     holding_quantity = models.PositiveIntegerField(default=0)
-    current_price = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
-    holding_amount = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
-    net_profit_loss = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
+    # Cost of the open lots, and the running total of realized gains on sells
+    cost_basis = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
+    realized_gain = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
 
     last_updated = models.DateTimeField(auto_now=True)
 
@@ -83,3 +98,68 @@ class ProfitLossSummary(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.coin}"
+
+# Cost-Basis Lot (open quantity and remaining cost of one buy, or of the whole pooled
+# position under average cost). Fully consumed lots are deleted, so only open ones are kept.
+class CostLot(models.Model):
+    user = models.ForeignKey(Register, on_delete=models.CASCADE, related_name='cost_lots')
+    coin = models.CharField(max_length=100)
+    quantity = models.PositiveIntegerField()
+    cost = models.DecimalField(max_digits=20, decimal_places=2)
+    acquired_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # Open lots of one coin in consumption order
+            models.Index(fields=['user', 'coin', 'acquired_at', 'id'], name='lot_user_coin_fifo_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.coin}: {self.quantity} @ {self.cost}"
+
+# Leaderboard Entry (a user's net profit/loss over every coin, kept by cryptoApp.leaderboard)
+class LeaderboardEntry(models.Model):
+    user = models.OneToOneField(Register, on_delete=models.CASCADE, related_name='leaderboard_entry')
+    # Earned on sells minus invested on buys; moved by every trade
+    cash_flow = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
+    # Holdings valued at the last marked price snapshot
+    holdings_value = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
+    net_profit_loss = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
+    marked_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Top-K in rank order, and the count of users ahead of one
+            models.Index(fields=['-net_profit_loss', 'user'], name='leaderboard_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.net_profit_loss}"
+
+# Price Snapshot Model (latest polled quote per coin and currency)
+class PriceSnapshot(models.Model):
+    coin = models.CharField(max_length=100)
+    vs_currency = models.CharField(max_length=10, default='usd')
+    price = models.DecimalField(max_digits=30, decimal_places=10)
+    fetched_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('coin', 'vs_currency')
+
+    def __str__(self):
+        return f"{self.coin}/{self.vs_currency}: {self.price}"
+
+
+# Price History (one row per coin/currency per point in time; feeds portfolio-history/)
+class PriceHistory(models.Model):
+    coin = models.CharField(max_length=100)
+    vs_currency = models.CharField(max_length=10, default='usd')
+    price = models.DecimalField(max_digits=30, decimal_places=10)
+    recorded_at = models.DateTimeField()
+
+    class Meta:
+        # Also the index for reading one coin's series in time order
+        unique_together = ('coin', 'vs_currency', 'recorded_at')
+
+    def __str__(self):
+        return f"{self.coin}/{self.vs_currency} @ {self.recorded_at}: {self.price}"
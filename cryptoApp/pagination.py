@@ -0,0 +1,100 @@
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time
+import base64
+import json
+
+
+class InvalidPageRequest(ValueError):
+    pass
+
+
+# A bare date covers the whole day. It is checked first: parse_datetime also accepts dates, as midnight.
+def parse_bound(value, end_of_day=False):
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.combine(day, time.max if end_of_day else time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise InvalidPageRequest(f"Invalid date: {value}.")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def encode_cursor(purchased_at, pk):
+    raw = json.dumps([purchased_at.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        purchased_at, pk = json.loads(raw)
+        moment = datetime.fromisoformat(purchased_at)
+        return moment, int(pk)
+    except (ValueError, TypeError):
+        raise InvalidPageRequest("Invalid cursor.")
+
+
+# Apply the coin / type / date-range filters shared by the transaction history endpoints
+def filter_transactions(queryset, params, allow_type=True):
+    if params.get('coin'):
+        queryset = queryset.filter(coin=params['coin'])
+    if allow_type and params.get('type'):
+        if params['type'] not in ('buy', 'sell'):
+            raise InvalidPageRequest("Type must be 'buy' or 'sell'.")
+        queryset = queryset.filter(type=params['type'])
+    if params.get('from'):
+        queryset = queryset.filter(purchased_at__gte=parse_bound(params['from']))
+    if params.get('to'):
+        queryset = queryset.filter(purchased_at__lte=parse_bound(params['to'], end_of_day=True))
+    return queryset
+
+
+def page_size(params):
+    try:
+        size = int(params.get('page_size', settings.TRANSACTION_PAGE_SIZE))
+    except ValueError:
+        raise InvalidPageRequest("Invalid page size.")
+    return max(1, min(size, settings.TRANSACTION_MAX_PAGE_SIZE))
+
+
+# Keyset pagination, newest first, keyed on (purchased_at, id). Every page is a
+# bounded index range scan however deep the cursor is, unlike OFFSET paging. The
+# redundant purchased_at <= bound is what SQLite uses to seek: it cannot turn the
+# OR of the exact keyset condition into an index range on its own.
+def keyset_page(queryset, params):
+    size = page_size(params)
+    if params.get('cursor'):
+        purchased_at, pk = decode_cursor(params['cursor'])
+        queryset = queryset.filter(
+            Q(purchased_at__lt=purchased_at) | Q(purchased_at=purchased_at, id__lt=pk),
+            purchased_at__lte=purchased_at,
+        )
+
+    rows = list(queryset.order_by('-purchased_at', '-id')[:size + 1])
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(*_position(rows[-1]))
+    return rows, next_cursor
+
+
+# Rows are model instances or, for the lean serialization path, values() dicts
+def _position(row):
+    if isinstance(row, dict):
+        return row['purchased_at'], row['id']
+    return row.purchased_at, row.pk
+
+
+def paginated_data(request, results, next_cursor):
+    next_url = None
+    if next_cursor:
+        query = request.GET.copy()
+        query['cursor'] = next_cursor
+        next_url = request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+    return {'results': results, 'next_cursor': next_cursor, 'next': next_url}
@@ -0,0 +1,160 @@
+"""
+Profile photo pipeline.
+
+Uploads are validated without decoding the whole image and kept as the
+original. A bounded thread pool then renders square variants at each
+PHOTO_VARIANT_SIZES size in every PHOTO_VARIANT_FORMATS format, off the request
+path. The names of the finished variants are recorded on
+``Profile.photo_variants``. Until they exist, clients fall back to the original.
+"""
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+from .models import Profile
+from .state import bump_state
+import io
+import os
+import posixpath
+import threading
+
+ACCEPTED_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+SAVE_OPTIONS = {
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+}
+
+
+class InvalidPhoto(ValueError):
+    pass
+
+
+class PhotoQueueFull(Exception):
+    pass
+
+
+# Check size, format and pixel count from the header alone; decompression bombs never get decoded
+def validate_photo(upload):
+    if upload.size > settings.PHOTO_MAX_UPLOAD_BYTES:
+        raise InvalidPhoto(f"Photo must be at most {settings.PHOTO_MAX_UPLOAD_BYTES // (1024 * 1024)}MB.")
+    try:
+        with Image.open(upload) as image:
+            if image.format not in ACCEPTED_FORMATS:
+                raise InvalidPhoto("Photo must be a JPEG, PNG, WebP or GIF image.")
+            if image.width * image.height > settings.PHOTO_MAX_PIXELS:
+                raise InvalidPhoto("Photo dimensions are too large.")
+            image.verify()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError):
+        raise InvalidPhoto("Uploaded file is not a valid image.")
+    finally:
+        upload.seek(0)
+
+
+# Under the profile's own directory and named after the whole original name, so two users'
+# photo.jpg and photo.png never share variants. Storage still suffixes a name already taken.
+def variant_name(profile_id, original, size, extension):
+    stem, original_extension = posixpath.splitext(posixpath.basename(original))
+    return f"profile_photos/variants/{profile_id}/{stem}_{original_extension.lstrip('.')}_{size}.{extension}"
+
+
+def variant_urls(request, profile):
+    return {
+        size: {extension: request.build_absolute_uri(default_storage.url(name)) for extension, name in formats.items()}
+        for size, formats in (profile.photo_variants or {}).items()
+    }
+
+
+def delete_photo_files(original, variants):
+    names = [name for formats in (variants or {}).values() for name in formats.values()]
+    if original:
+        names.append(original)
+    for name in names:
+        default_storage.delete(name)
+
+
+def render_variants(profile_id, original):
+    sizes = sorted(settings.PHOTO_VARIANT_SIZES, reverse=True)
+    with default_storage.open(original) as handle, Image.open(handle) as image:
+        # JPEG can decode straight at a reduced scale, much cheaper than decoding a 12MP photo in full
+        image.draft('RGB', (sizes[0] * 2, sizes[0] * 2))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+        variants = {}
+        for size in sizes:
+            # Each size is cut from the previous one rather than the full original
+            image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+            variants[str(size)] = {}
+            for extension in settings.PHOTO_VARIANT_FORMATS:
+                variant = image.convert('RGB') if extension == 'jpeg' else image
+                buffer = io.BytesIO()
+                variant.save(buffer, **SAVE_OPTIONS[extension])
+                name = variant_name(profile_id, original, size, extension)
+                variants[str(size)][extension] = default_storage.save(name, ContentFile(buffer.getvalue()))
+    return variants
+
+
+class PhotoPipeline:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+        self._pending = set()
+
+    def check_capacity(self):
+        with self._lock:
+            if self._pid == os.getpid() and len(self._pending) >= settings.PHOTO_QUEUE_LIMIT:
+                raise PhotoQueueFull("Photo processing is busy, please try again shortly.")
+
+    def submit(self, profile_id, user_id, original):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=settings.PHOTO_WORKERS, thread_name_prefix='photo')
+                self._pending = set()
+                self._pid = os.getpid()
+            future = self._executor.submit(self._process, profile_id, user_id, original)
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _process(self, profile_id, user_id, original):
+        try:
+            variants = render_variants(profile_id, original)
+            # Only record them if this is still the profile's photo; otherwise they are already orphans
+            if Profile.objects.filter(id=profile_id, photo_url=original).update(photo_variants=variants):
+                bump_state(user_id)
+            else:
+                delete_photo_files(None, variants)
+            return variants
+        finally:
+            connection.close()
+
+    def _done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def wait(self, timeout=None):
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending, timeout=timeout)
+
+
+photo_pipeline = PhotoPipeline()
+
+
+# Replace the profile's photo: store the original, drop the old files, render variants after commit
+def replace_photo(profile, upload):
+    validate_photo(upload)
+    photo_pipeline.check_capacity()
+    old_original, old_variants = profile.photo_url.name if profile.photo_url else None, profile.photo_variants
+
+    profile.photo_url = upload
+    profile.photo_variants = {}
+    profile.save(update_fields=['photo_url', 'photo_variants'])
+    delete_photo_files(old_original, old_variants)
+
+    original = profile.photo_url.name
+    transaction.on_commit(lambda: photo_pipeline.submit(profile.id, profile.user_id, original))
+    return original
@@ -0,0 +1,101 @@
+from decimal import Decimal
+from .models import Profile, Transaction, TokenBalance, ProfitLossSummary
+from .prices import price_oracle, PriceUnavailable, StalePrice, CircuitOpen
+from .serializers import TRANSACTION_FIELDS, transaction_rows
+from .summaries import ledger_totals, mark_to_market
+
+COIN_GECKO_IDS = {
+    'bitcoin': 'bitcoin',
+    'ethereum': 'ethereum',
+    'tether': 'tether',
+    'dogecoin': 'dogecoin',
+    'solana': 'solana',
+    'cardano': 'cardano',
+}
+
+# Sections of a user's portfolio, shared by the single-purpose endpoints and portfolio/<email>/.
+# Each one costs a single query; profit_loss_section also does one price lookup.
+
+
+def wallet_section(profile_id):
+    return Profile.objects.values_list('wallet_amount', flat=True).get(id=profile_id)
+
+
+def balances_section(user_id):
+    data = list(TokenBalance.objects.filter(user_id=user_id).order_by('coin').values('coin', 'quantity'))
+    return {
+        'balances': data,
+        'total_quantity': sum(item['quantity'] for item in data),
+    }
+
+
+def purchase_summary_section(user_id):
+    totals = ledger_totals(Transaction.objects.filter(user_id=user_id, type='buy'))
+    return [
+        {
+            'coin': item['coin'],
+            'total_tokens': item['total_purchased_quantity'],
+            'total_value': round(item['total_invested'], 2),
+        }
+        for item in totals.filter(total_purchased_quantity__gt=0)
+    ]
+
+
+def _gecko_ids(rows):
+    return ','.join(
+        COIN_GECKO_IDS.get(row.coin.lower())
+        for row in rows
+        if COIN_GECKO_IDS.get(row.coin.lower())
+    )
+
+
+def _marked_to_market(rows, price_data):
+    summary = []
+    for row in rows:
+        coin_id = COIN_GECKO_IDS.get(row.coin.lower())
+        current_price = price_data.get(coin_id, {}).get('usd', Decimal('0')) if coin_id else Decimal('0')
+        summary.append(mark_to_market(row, current_price))
+
+    summary.sort(key=lambda x: x['coin'].lower())
+    return summary
+
+
+# Raises StalePrice / CircuitOpen when prices cannot be trusted; other provider
+# failures value holdings at zero, as profit_loss_summary always has.
+def profit_loss_section(user_id):
+    rows = list(ProfitLossSummary.objects.filter(user_id=user_id))
+    if not rows:
+        return []
+
+    price_data = {}
+    coin_ids = _gecko_ids(rows)
+    if coin_ids:
+        try:
+            price_data = price_oracle.get_quotes(coin_ids, 'usd')
+        except (StalePrice, CircuitOpen):
+            raise
+        except PriceUnavailable:
+            price_data = {}
+    return _marked_to_market(rows, price_data)
+
+
+async def aprofit_loss_section(user_id):
+    rows = [row async for row in ProfitLossSummary.objects.filter(user_id=user_id)]
+    if not rows:
+        return []
+
+    price_data = {}
+    coin_ids = _gecko_ids(rows)
+    if coin_ids:
+        try:
+            price_data = await price_oracle.aget_quotes(coin_ids, 'usd')
+        except (StalePrice, CircuitOpen):
+            raise
+        except PriceUnavailable:
+            price_data = {}
+    return _marked_to_market(rows, price_data)
+
+
+def latest_transactions_section(user_id, limit):
+    transactions = Transaction.objects.filter(user_id=user_id).order_by('-purchased_at', '-id')[:limit]
+    return transaction_rows(list(transactions.values(*TRANSACTION_FIELDS)))
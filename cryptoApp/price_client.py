@@ -0,0 +1,254 @@
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import asyncio
+import httpx
+import os
+import random
+import threading
+import time
+import requests
+
+
+class PriceUnavailable(Exception):
+    pass
+
+
+class CircuitOpen(PriceUnavailable):
+    pass
+
+
+# Circuit Breaker
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Let exactly one probe through; everyone else keeps failing fast
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = max(0.0, round(self.reset_timeout - (time.monotonic() - self.opened_at), 2))
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'trips': self.trips,
+                'retry_in': retry_in,
+            }
+
+
+# Pooled keep-alive client for the price provider
+class PriceClient:
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self):
+        self.breaker = CircuitBreaker(
+            settings.PRICE_BREAKER_FAILURE_THRESHOLD,
+            settings.PRICE_BREAKER_RESET_TIMEOUT,
+        )
+        self.requests = 0
+        self.failures = 0
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        # Sessions must not be shared across a fork, so each worker process builds its own
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                self._session = self._build_session()
+                self._pid = os.getpid()
+            return self._session
+
+    def _build_session(self):
+        retry = Retry(
+            total=settings.PRICE_HTTP_RETRIES,
+            backoff_factor=settings.PRICE_HTTP_BACKOFF,
+            backoff_jitter=settings.PRICE_HTTP_BACKOFF,
+            backoff_max=5,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=['GET'],
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.PRICE_HTTP_POOL_SIZE,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers['Accept'] = 'application/json'
+        return session
+
+    def get_prices(self, ids, vs_currencies='usd'):
+        if not self.breaker.allow_request():
+            raise CircuitOpen("Price provider circuit is open.")
+
+        self.requests += 1
+        try:
+            response = self.session.get(
+                settings.COINGECKO_API_URL,
+                params={'ids': ids, 'vs_currencies': vs_currencies},
+                timeout=(settings.PRICE_HTTP_CONNECT_TIMEOUT, settings.PRICE_HTTP_READ_TIMEOUT),
+            )
+            if response.status_code != 200:
+                self._failed()
+                raise PriceUnavailable(f"Price provider returned {response.status_code}.")
+            # An HTML error page served with a 200 is a failed call too
+            data = response.json()
+        except (requests.RequestException, ValueError) as exc:
+            self._failed()
+            raise PriceUnavailable(str(exc)) from exc
+
+        self.breaker.record_success()
+        return data
+
+    def _failed(self):
+        self.failures += 1
+        self.breaker.record_failure()
+
+    def pool_stats(self):
+        adapter = self.session.get_adapter(settings.COINGECKO_API_URL)
+        pools = adapter.poolmanager.pools
+        stats = []
+        for key in pools.keys():
+            pool = pools[key]
+            stats.append({
+                'host': f"{pool.scheme}://{pool.host}:{pool.port}",
+                'max_size': pool.pool.maxsize if pool.pool else 0,
+                'idle_connections': pool.pool.qsize() if pool.pool else 0,
+                'connections_opened': pool.num_connections,
+                'requests_sent': pool.num_requests,
+            })
+        return stats
+
+    def stats(self):
+        return {
+            'breaker': self.breaker.stats(),
+            'requests': self.requests,
+            'failures': self.failures,
+            'pools': self.pool_stats(),
+        }
+
+
+price_client = PriceClient()
+
+
+# Async counterpart for the ASGI views: one pooled httpx client per event loop, so
+# a single process can keep hundreds of provider requests in flight at once.
+# It shares the sync client's circuit breaker, so both paths trip and recover together.
+class AsyncPriceClient:
+    def __init__(self, breaker):
+        self.breaker = breaker
+        self.requests = 0
+        self.failures = 0
+        self._clients = {}
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            # Clients are bound to the loop (and process) that created them
+            self._clients = {key: value for key, value in self._clients.items() if not key.is_closed()}
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.PRICE_ASYNC_POOL_SIZE,
+                    max_keepalive_connections=settings.PRICE_ASYNC_POOL_SIZE,
+                ),
+                timeout=httpx.Timeout(
+                    settings.PRICE_HTTP_READ_TIMEOUT,
+                    connect=settings.PRICE_HTTP_CONNECT_TIMEOUT,
+                    pool=settings.PRICE_HTTP_READ_TIMEOUT,
+                ),
+                headers={'Accept': 'application/json'},
+            )
+            self._clients[loop] = client
+        return client
+
+    async def get_prices(self, ids, vs_currencies='usd'):
+        if not self.breaker.allow_request():
+            raise CircuitOpen("Price provider circuit is open.")
+
+        self.requests += 1
+        params = {'ids': ids, 'vs_currencies': vs_currencies}
+        # Same policy as the sync client's urllib3 Retry: retry 429/5xx, timeouts and transport errors with jittered backoff
+        for attempt in range(settings.PRICE_HTTP_RETRIES + 1):
+            if attempt:
+                delay = settings.PRICE_HTTP_BACKOFF * (2 ** (attempt - 1))
+                await asyncio.sleep(min(5, delay + random.uniform(0, settings.PRICE_HTTP_BACKOFF)))
+            try:
+                response = await self._client().get(settings.COINGECKO_API_URL, params=params)
+            except httpx.TimeoutException as exc:
+                error = PriceUnavailable(f"Price provider timed out: {exc!r}")
+                continue
+            except httpx.TransportError as exc:
+                error = PriceUnavailable(str(exc))
+                continue
+            if response.status_code not in PriceClient.RETRY_STATUSES:
+                break
+            error = PriceUnavailable(f"Price provider returned {response.status_code}.")
+        else:
+            self._failed()
+            raise error
+
+        if response.status_code != 200:
+            self._failed()
+            raise PriceUnavailable(f"Price provider returned {response.status_code}.")
+        try:
+            data = response.json()
+        except ValueError as exc:
+            self._failed()
+            raise PriceUnavailable(f"Price provider returned a non-JSON body: {exc}") from exc
+
+        self.breaker.record_success()
+        return data
+
+    def _failed(self):
+        self.failures += 1
+        self.breaker.record_failure()
+
+    async def aclose(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+
+async_price_client = AsyncPriceClient(price_client.breaker)
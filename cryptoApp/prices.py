@@ -0,0 +1,417 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from .leaderboard import mark_leaderboard
+from .models import PriceHistory, PriceSnapshot, TokenBalance
+from .price_client import price_client, async_price_client, PriceUnavailable, CircuitOpen
+from .state import bump_price_version
+from asgiref.sync import sync_to_async
+from concurrent.futures import ThreadPoolExecutor, wait
+import asyncio
+import os
+import threading
+import time
+import weakref
+
+
+class StalePrice(PriceUnavailable):
+    pass
+
+
+POLLER_HEARTBEAT_KEY = 'price_poller_heartbeat'
+
+
+# Serve quotes only from the poller's snapshot? See PRICE_SNAPSHOT_ONLY.
+def snapshot_only():
+    if settings.PRICE_SNAPSHOT_ONLY is not None:
+        return settings.PRICE_SNAPSHOT_ONLY
+    return cache.get(POLLER_HEARTBEAT_KEY) is not None
+
+
+# Called by the poll_prices loop every cycle, whether or not the poll succeeds
+def poller_heartbeat():
+    cache.set(POLLER_HEARTBEAT_KEY, True, timeout=max(settings.PRICE_SNAPSHOT_MAX_AGE, 2 * settings.PRICE_POLL_INTERVAL))
+
+
+# Utility function for fetching live prices
+def fetch_live_prices(ids, vs_currencies='usd'):
+    return price_client.get_prices(ids, vs_currencies)
+
+
+async def afetch_live_prices(ids, vs_currencies='usd'):
+    return await async_price_client.get_prices(ids, vs_currencies)
+
+
+def _split(value):
+    if isinstance(value, str):
+        value = value.split(',')
+    return sorted({item.strip().lower() for item in value if item and item.strip()})
+
+
+def _pairs(coins, vs_currencies):
+    return [(coin, vs) for coin in _split(coins) for vs in _split(vs_currencies)]
+
+
+def _request_params(pairs):
+    return ','.join(sorted({coin for coin, _ in pairs})), ','.join(sorted({vs for _, vs in pairs}))
+
+
+# One upstream fetch shared by every caller waiting on the same quotes.
+# Async callers wait on an asyncio.Event instead of a threading.Event.
+class _Flight:
+    def __init__(self, done=None):
+        self.done = threading.Event() if done is None else done
+        self.quotes = {}
+        self.error = None
+
+
+# Price Oracle
+class PriceOracle:
+    def __init__(self, fetcher=fetch_live_prices, async_fetcher=afetch_live_prices):
+        self.fetcher = fetcher
+        self.async_fetcher = async_fetcher
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        # Per event loop: an asyncio.Event can only be awaited on the loop that owns it
+        self._async_in_flight = weakref.WeakKeyDictionary()
+        self._pid = None
+        self._executor = None
+        self._refreshes = set()
+
+    @property
+    def ttl(self):
+        return settings.PRICE_CACHE_TTL
+
+    @staticmethod
+    def cache_key(coin, vs_currency):
+        return f"price_entry_{coin}_{vs_currency}"
+
+    @staticmethod
+    def stale_key(coin, vs_currency):
+        return f"price_quote_stale_{coin}_{vs_currency}"
+
+    @staticmethod
+    def failure_key(coin, vs_currency):
+        return f"price_failure_{coin}_{vs_currency}"
+
+    @staticmethod
+    def refresh_key(coin, vs_currency):
+        return f"price_refresh_{coin}_{vs_currency}"
+
+    # Quote cache entries are (price, fresh_until). Entries outlive fresh_until by
+    # PRICE_REVALIDATE_WINDOW, during which they are still served while a refresh runs.
+    # A price of None records a coin the provider does not know.
+    @staticmethod
+    def entry(price, fresh_for):
+        return (price, time.time() + fresh_for)
+
+    def get_quotes(self, coins, vs_currencies='usd'):
+        """
+        Return ``{coin: {currency: Decimal}}`` for the requested coins, the
+        same shape CoinGecko's ``simple/price`` returns. Coins the provider
+        does not know are left out.
+        """
+        found, expired, missing = self._lookup(_pairs(coins, vs_currencies))
+        if snapshot_only():
+            if missing:
+                self._check_untracked(missing)
+        else:
+            if expired:
+                self._revalidate(expired)
+            if missing:
+                found.update(self._fetch_coalesced(missing))
+        return self._assemble(found)
+
+    async def aget_quotes(self, coins, vs_currencies='usd'):
+        """
+        Async ``get_quotes`` for ASGI views: provider calls go through the
+        async client, so waiting on the provider does not hold a thread.
+        """
+        found, expired, missing = await sync_to_async(self._lookup)(_pairs(coins, vs_currencies))
+        if await sync_to_async(snapshot_only)():
+            if missing:
+                await sync_to_async(self._check_untracked)(missing)
+        else:
+            if expired:
+                await sync_to_async(self._revalidate)(expired)
+            if missing:
+                found.update(await self._afetch_coalesced(missing))
+        return self._assemble(found)
+
+    def get_price(self, coin, vs_currency='usd'):
+        coin, vs_currency = coin.lower(), vs_currency.lower()
+        return self.get_quotes([coin], [vs_currency]).get(coin, {}).get(vs_currency)
+
+    async def aget_price(self, coin, vs_currency='usd'):
+        coin, vs_currency = coin.lower(), vs_currency.lower()
+        return (await self.aget_quotes([coin], [vs_currency])).get(coin, {}).get(vs_currency)
+
+    # Split pairs into cached quotes (some possibly past their soft expiry) and ones still missing
+    def _lookup(self, pairs):
+        keys = {self.cache_key(coin, vs): (coin, vs) for coin, vs in pairs}
+        found, expired = {}, []
+        now = time.time()
+        for key, (price, fresh_until) in cache.get_many(keys).items():
+            found[keys[key]] = price
+            if fresh_until <= now:
+                expired.append(keys[key])
+
+        missing = [pair for pair in pairs if pair not in found]
+        if missing:
+            found.update(self._from_snapshot(missing))
+            missing = [pair for pair in missing if pair not in found]
+        return found, expired, missing
+
+    @staticmethod
+    def _assemble(found):
+        quotes = {}
+        for (coin, vs), price in found.items():
+            if price is not None:
+                quotes.setdefault(coin, {})[vs] = price
+        return quotes
+
+    def _from_snapshot(self, pairs):
+        now = timezone.now()
+        max_age = timedelta(seconds=settings.PRICE_SNAPSHOT_MAX_AGE)
+        rows = [
+            row for row in PriceSnapshot.objects.filter(
+                coin__in={coin for coin, _ in pairs},
+                vs_currency__in={vs for _, vs in pairs},
+                fetched_at__gte=now - max_age,
+            ).values_list('coin', 'vs_currency', 'price', 'fetched_at')
+            if row[:2] in pairs
+        ]
+        if not rows:
+            return {}
+
+        # Never let the cache outlive the snapshot it was copied from
+        remaining = min((fetched_at + max_age - now).total_seconds() for *_, fetched_at in rows)
+        found = {(coin, vs): price for coin, vs, price, _ in rows}
+        timeout = max(1, min(self.ttl, int(remaining)))
+        cache.set_many(
+            {self.cache_key(coin, vs): self.entry(price, timeout) for (coin, vs), price in found.items()},
+            timeout=timeout,
+        )
+        return found
+
+    def _check_untracked(self, pairs):
+        # Tracked coins without a fresh quote are an error; anything else is unknown to the provider
+        tracked = set(settings.TRACKED_COINS) | set(
+            PriceSnapshot.objects.filter(coin__in={coin for coin, _ in pairs}).values_list('coin', flat=True)
+        )
+        stale = sorted({coin for coin, _ in pairs if coin in tracked})
+        if stale:
+            raise StalePrice(f"Price snapshot for {', '.join(stale)} is older than {settings.PRICE_SNAPSHOT_MAX_AGE}s.")
+
+    def _fetch_coalesced(self, pairs):
+        stale = self._fail_fast(pairs)
+        if stale is not None:
+            return stale
+
+        with self._lock:
+            lead = [pair for pair in pairs if pair not in self._in_flight]
+            waiting = {self._in_flight[pair] for pair in pairs if pair not in lead}
+            flight = None
+            if lead:
+                flight = _Flight()
+                for pair in lead:
+                    self._in_flight[pair] = flight
+
+        results = {}
+        if flight:
+            try:
+                flight.quotes = self._fetch(lead)
+            except PriceUnavailable as exc:
+                flight.quotes = self._fallback(lead, exc)
+                if flight.quotes is None:
+                    flight.error = exc
+            except Exception as exc:
+                # Waiters get the same error as the leader, not an empty result
+                flight.error = exc
+            finally:
+                with self._lock:
+                    for pair in lead:
+                        self._in_flight.pop(pair, None)
+                flight.done.set()
+            waiting.add(flight)
+
+        for other in waiting:
+            other.done.wait()
+            if other.error is not None:
+                raise other.error
+            results.update({pair: other.quotes.get(pair) for pair in pairs if pair in other.quotes})
+        return results
+
+    async def _afetch_coalesced(self, pairs):
+        stale = await sync_to_async(self._fail_fast)(pairs)
+        if stale is not None:
+            return stale
+
+        # No lock needed: each loop's in-flight map is only touched from that loop
+        in_flight = self._async_in_flight.setdefault(asyncio.get_running_loop(), {})
+        lead = [pair for pair in pairs if pair not in in_flight]
+        waiting = {in_flight[pair] for pair in pairs if pair not in lead}
+        if lead:
+            flight = _Flight(asyncio.Event())
+            for pair in lead:
+                in_flight[pair] = flight
+            try:
+                data = await self.async_fetcher(*_request_params(lead))
+                flight.quotes = await sync_to_async(self._store)(lead, data)
+            except PriceUnavailable as exc:
+                flight.quotes = await sync_to_async(self._fallback)(lead, exc)
+                if flight.quotes is None:
+                    flight.error = exc
+            except Exception as exc:
+                flight.error = exc
+            finally:
+                for pair in lead:
+                    in_flight.pop(pair, None)
+                flight.done.set()
+            waiting.add(flight)
+
+        results = {}
+        for other in waiting:
+            await other.done.wait()
+            if other.error is not None:
+                raise other.error
+            results.update({pair: other.quotes.get(pair) for pair in pairs if pair in other.quotes})
+        return results
+
+    # Pairs that failed within PRICE_FAILURE_TTL are not retried: serve the last known quote or the cached error
+    def _fail_fast(self, pairs):
+        failures = self._recent_failures(pairs)
+        if not failures:
+            return None
+        stale = self._last_known(pairs)
+        if stale is not None:
+            return stale
+        name, message = next(iter(failures.values()))
+        raise (CircuitOpen if name == 'CircuitOpen' else PriceUnavailable)(message)
+
+    def _fallback(self, pairs, exc):
+        self._record_failure(pairs, exc)
+        return self._last_known(pairs)
+
+    def _recent_failures(self, pairs):
+        keys = {self.failure_key(*pair): pair for pair in pairs}
+        return {keys[key]: failure for key, failure in cache.get_many(keys).items()}
+
+    def _record_failure(self, pairs, exc):
+        failure = (type(exc).__name__, str(exc))
+        cache.set_many({self.failure_key(*pair): failure for pair in pairs}, timeout=settings.PRICE_FAILURE_TTL)
+
+    # Refresh expired-but-servable quotes off the request path. The refresh_key claim
+    # keeps all worker processes sharing the cache down to one refresh per quote.
+    def _revalidate(self, pairs):
+        pairs = [pair for pair in pairs if pair not in self._recent_failures(pairs)]
+        pairs = [pair for pair in pairs if cache.add(self.refresh_key(*pair), True, timeout=settings.PRICE_REVALIDATE_WINDOW)]
+        if not pairs:
+            return None
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='price-refresh')
+                self._refreshes = set()
+                self._pid = os.getpid()
+            future = self._executor.submit(self._refresh, pairs)
+            self._refreshes.add(future)
+        future.add_done_callback(self._refresh_done)
+        return future
+
+    def _refresh(self, pairs):
+        try:
+            self._fetch_coalesced(pairs)
+        except PriceUnavailable:
+            pass  # recorded as a failure; the stale quotes keep being served
+        finally:
+            cache.delete_many([self.refresh_key(*pair) for pair in pairs])
+
+    def _refresh_done(self, future):
+        with self._lock:
+            self._refreshes.discard(future)
+
+    def wait_for_refreshes(self, timeout=None):
+        with self._lock:
+            pending = list(self._refreshes)
+        wait(pending, timeout=timeout)
+
+    def _fetch(self, pairs):
+        return self._store(pairs, self.fetcher(*_request_params(pairs)))
+
+    # Cache a provider response for every requested pair, including coins it did not know
+    def _store(self, pairs, data):
+        coins = sorted({coin for coin, _ in pairs})
+        vs_currencies = sorted({vs for _, vs in pairs})
+        quotes = {}
+        for coin in coins:
+            for vs in vs_currencies:
+                price = data.get(coin, {}).get(vs)
+                quotes[(coin, vs)] = Decimal(str(price)) if price is not None else None
+
+        known = {pair: price for pair, price in quotes.items() if price is not None}
+        cache.set_many(
+            {self.cache_key(*pair): self.entry(price, self.ttl) for pair, price in quotes.items()},
+            timeout=self.ttl + settings.PRICE_REVALIDATE_WINDOW,
+        )
+        cache.delete_many([self.failure_key(*pair) for pair in quotes])
+        cache.set_many({self.stale_key(*pair): price for pair, price in known.items()}, timeout=settings.PRICE_STALE_TTL)
+        bump_price_version()
+        return quotes
+
+    def _last_known(self, pairs):
+        # While the provider is down, serve the last good quote rather than failing the request
+        keys = {self.stale_key(*pair): pair for pair in pairs}
+        stale = {keys[key]: price for key, price in cache.get_many(keys).items()}
+        if len(stale) < len(pairs):
+            return None
+        return stale
+
+
+price_oracle = PriceOracle()
+
+
+def tracked_coins():
+    held = TokenBalance.objects.filter(quantity__gt=0).values_list('coin', flat=True).distinct()
+    return sorted(set(settings.TRACKED_COINS) | {coin.lower() for coin in held})
+
+
+# Fetch every tracked coin in one batched call and store it as the local snapshot
+def poll_prices(fetcher=fetch_live_prices):
+    coins = tracked_coins()
+    vs_currencies = [vs.lower() for vs in settings.PRICE_POLL_CURRENCIES]
+    data = fetcher(','.join(coins), ','.join(vs_currencies))
+
+    now = timezone.now()
+    snapshots = [
+        PriceSnapshot(coin=coin, vs_currency=vs, price=Decimal(str(data[coin][vs])), fetched_at=now)
+        for coin in coins
+        for vs in vs_currencies
+        if data.get(coin, {}).get(vs) is not None
+    ]
+    PriceSnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=['coin', 'vs_currency'],
+        update_fields=['price', 'fetched_at'],
+    )
+    PriceHistory.objects.bulk_create(
+        [PriceHistory(coin=row.coin, vs_currency=row.vs_currency, price=row.price, recorded_at=now) for row in snapshots],
+        ignore_conflicts=True,
+    )
+    # A new snapshot re-marks every user's holdings for the leaderboard
+    mark_leaderboard()
+    cache.set_many(
+        {
+            PriceOracle.cache_key(row.coin, row.vs_currency): PriceOracle.entry(row.price, settings.PRICE_SNAPSHOT_MAX_AGE)
+            for row in snapshots
+        },
+        timeout=settings.PRICE_SNAPSHOT_MAX_AGE,
+    )
+    cache.set_many(
+        {PriceOracle.stale_key(row.coin, row.vs_currency): row.price for row in snapshots},
+        timeout=settings.PRICE_STALE_TTL,
+    )
+    bump_price_version()
+    return snapshots
@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+
+# Set while a read-only endpoint is building its response
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def pin_key(user_id):
+    return f"replica_pin_{user_id}"
+
+
+# Keep a user's reads on the primary for REPLICA_STICKY_SECONDS after they write,
+# so the replica's lag never shows them balances from before their own trade.
+def pin_to_primary(user_id):
+    if settings.DATABASE_READ_REPLICA:
+        cache.set(pin_key(user_id), True, timeout=settings.REPLICA_STICKY_SECONDS)
+
+
+@contextmanager
+def reads_from_replica(user_id):
+    if not settings.DATABASE_READ_REPLICA or cache.get(pin_key(user_id)):
+        yield
+        return
+
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+# Reads inside reads_from_replica() go to DATABASE_READ_REPLICA; everything else,
+# including every write and every read made while trading, stays on the primary.
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get():
+            return settings.DATABASE_READ_REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
@@ -1,6 +1,11 @@
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
+from .hashers import check_user_password
 from .models import Register, Transaction, Profile
+from .photos import variant_urls
+from .summaries import CENT
 
 # Register Serializer
 class RegisterSerializer(serializers.ModelSerializer):
@@ -12,8 +17,10 @@ class RegisterSerializer(serializers.ModelSerializer):
         model = Register
         fields = ['username', 'email', 'password', 'dob', 'security_question', 'created_at']
         read_only_fields = ['created_at']
+        extra_kwargs = {'password': {'write_only': True}}
 
     def create(self, validated_data):
+        validated_data['password'] = make_password(validated_data['password'])
         return Register.objects.create(**validated_data)
 
 
@@ -27,8 +34,12 @@ class LoginSerializer(serializers.Serializer):
         password = data.get('password')
 
         try:
-            user = Register.objects.get(email=email, password=password)
+            user = Register.objects.select_related('profile').get(email=email)
         except Register.DoesNotExist:
+            make_password(password)  # spend the same time as a wrong password, so emails can't be probed
+            raise serializers.ValidationError("Invalid email or password.")
+
+        if not check_user_password(user, password):
             raise serializers.ValidationError("Invalid email or password.")
 
         data['user'] = user
@@ -45,6 +56,11 @@ class ProfileSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.photo_url.url)
         return None
 
+    photo_variants = serializers.SerializerMethodField()
+
+    def get_photo_variants(self, obj):
+        return variant_urls(self.context.get('request'), obj)
+
     class Meta:
         model = Profile
         fields = '__all__'
@@ -55,3 +71,20 @@ class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transaction
         fields = '__all__'
+
+
+# Lean path for transaction lists: the same output as TransactionSerializer, built
+# from values() rows in one pass, without model instances or per-field serializers.
+TRANSACTION_FIELDS = ('id', 'coin', 'quantity', 'total_price', 'type', 'purchased_at', 'cost_basis', 'realized_gain', 'user')
+
+
+def transaction_rows(rows):
+    current = timezone.get_current_timezone()
+    for row in rows:
+        row['total_price'] = format(row['total_price'].quantize(CENT), 'f')
+        if row['cost_basis'] is not None:
+            row['cost_basis'] = format(row['cost_basis'].quantize(CENT), 'f')
+            row['realized_gain'] = format(row['realized_gain'].quantize(CENT), 'f')
+        moment = row['purchased_at'].astimezone(current).isoformat()
+        row['purchased_at'] = moment[:-6] + 'Z' if moment.endswith('+00:00') else moment
+    return rows
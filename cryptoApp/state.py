@@ -0,0 +1,105 @@
+"""
+State versions for conditional GETs.
+
+Each user has a version in the cache that changes after every committed trade,
+profile change and photo change. The price quotes have one too, which changes
+whenever new quotes are stored. The polled read endpoints derive their ETag
+from these versions, so a matching If-None-Match is answered with a 304 from
+the cache alone, without running the endpoint's queries.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.views.decorators.http import condition
+from functools import wraps
+from rest_framework.exceptions import APIException
+from .authentication import header_identity
+from .models import Register, Profile
+import hashlib
+import time
+
+PRICE_VERSION_KEY = 'price_state_version'
+
+
+def state_key(user_id):
+    return f"state_version_{user_id}"
+
+
+# Versions are timestamps rather than counters, so one that was evicted from the
+# cache comes back as a value no client can already hold in an ETag.
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def state_version(user_id):
+    return _version(state_key(user_id))
+
+
+def price_version():
+    return _version(PRICE_VERSION_KEY)
+
+
+# Bumped after commit: bumping earlier would let a reader pair the new version with the old rows
+def bump_state(user_id):
+    transaction.on_commit(lambda: cache.set(state_key(user_id), time.time_ns(), timeout=None))
+
+
+def bump_price_version():
+    cache.set(PRICE_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def _user_state_etag(request, email, prices):
+    # Uncached quotes can change on every request, so there is nothing to revalidate
+    if prices and settings.PRICE_CACHE_TTL <= 0:
+        return None
+
+    try:
+        user_id = header_identity(request, email).id
+    except (Register.DoesNotExist, Profile.DoesNotExist, APIException):
+        # No ETag; the view itself answers with the 404/401/403
+        return None
+
+    parts = [request.get_full_path(), user_id, state_version(user_id)]
+    if prices:
+        # Quotes also go stale without being replaced, so the ETag rolls over at least once per PRICE_CACHE_TTL
+        parts += [price_version(), int(time.time() // settings.PRICE_CACHE_TTL)]
+    return hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+
+# Conditional GET for a user-scoped read endpoint taking an email; prices=True
+# for endpoints whose response depends on the current quotes. Only a 200 carries the
+# ETag: condition() would tag the endpoint's 400s and 503s too, and a client echoing
+# that ETag would then be answered 304 for an error body.
+def conditional_on_user_state(prices=False):
+    conditional = condition(etag_func=lambda request, email, **kwargs: _user_state_etag(request, email, prices))
+
+    def decorator(view):
+        view = conditional(view)
+
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if response.status_code not in (200, 304):
+                del response.headers['ETag']
+            return response
+        return inner
+    return decorator
+
+
+@receiver(post_save, sender=Register)
+@receiver(post_delete, sender=Register)
+def bump_register_state(sender, instance, **kwargs):
+    bump_state(instance.id)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def bump_profile_state(sender, instance, **kwargs):
+    bump_state(instance.user_id)
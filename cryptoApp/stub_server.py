@@ -0,0 +1,90 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import json
+import random
+import sys
+import threading
+import time
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512
+
+    def handle_error(self, request, client_address):
+        # Clients that give up on a slow response are expected, not worth a traceback
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+# Local stand-in for CoinGecko's simple/price endpoint, used by tests and benchmarks
+class CoinGeckoStub:
+    def __init__(self, prices=None, latency=0.0, error_rate=0.0):
+        self.prices = prices or {}
+        self.latency = latency
+        self.error_rate = error_rate
+        # Raw bytes served with a 200 instead of the quote, e.g. an HTML error page
+        self.body = None
+        self.requests = []
+        self._server = _Server(('127.0.0.1', 0), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/api/v3/simple/price"
+
+    def quote(self, ids, vs_currencies):
+        return {
+            coin: {vs: self.prices[coin] for vs in vs_currencies}
+            for coin in ids
+            if coin in self.prices
+        }
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path != '/api/v3/simple/price':
+                    self.send_error(404)
+                    return
+
+                query = parse_qs(parsed.query)
+                ids = [coin for coin in query.get('ids', [''])[0].split(',') if coin]
+                vs_currencies = [vs for vs in query.get('vs_currencies', ['usd'])[0].split(',') if vs]
+                stub.requests.append((ids, vs_currencies))
+
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if stub.error_rate and random.random() < stub.error_rate:
+                    self.send_error(503)
+                    return
+
+                body = stub.body if stub.body is not None else json.dumps(stub.quote(ids, vs_currencies)).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
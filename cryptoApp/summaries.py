@@ -0,0 +1,147 @@
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from decimal import Decimal
+from .models import ProfitLossSummary, Transaction
+
+CENT = Decimal('0.01')
+SUMMARY_TOTALS = ['total_purchased_quantity', 'total_invested', 'total_sold_quantity', 'total_earned']
+COST_TOTALS = ['cost_basis', 'realized_gain']
+
+
+# Buy and sell totals per coin (plus any extra group_by fields) in a single grouped query
+def ledger_totals(transactions, *group_by):
+    zero = Value(Decimal('0.00'), output_field=DecimalField(max_digits=20, decimal_places=2))
+    return transactions.values(*group_by, 'coin').annotate(
+        total_purchased_quantity=Coalesce(Sum('quantity', filter=Q(type='buy')), 0),
+        total_invested=Coalesce(Sum('total_price', filter=Q(type='buy')), zero),
+        total_sold_quantity=Coalesce(Sum('quantity', filter=Q(type='sell')), 0),
+        total_earned=Coalesce(Sum('total_price', filter=Q(type='sell')), zero),
+    ).order_by(*group_by, 'coin')
+
+
+# Recompute ProfitLossSummary rows from the ledger with one aggregate query and one upsert.
+# Cost basis and realized gains come from the sells' recorded cost basis (see lots.py).
+def rebuild_profit_loss_summaries(user=None):
+    transactions = Transaction.objects.all() if user is None else Transaction.objects.filter(user=user)
+    zero = Value(Decimal('0.00'), output_field=DecimalField(max_digits=20, decimal_places=2))
+    now = timezone.now()
+    rows = [
+        ProfitLossSummary(
+            user_id=totals['user_id'],
+            coin=totals['coin'],
+            holding_quantity=totals['total_purchased_quantity'] - totals['total_sold_quantity'],
+            cost_basis=totals['total_invested'] - totals['sold_cost_basis'],
+            realized_gain=totals['realized_gain'],
+            last_updated=now,
+            **{field: totals[field] for field in SUMMARY_TOTALS},
+        )
+        for totals in ledger_totals(transactions, 'user_id').annotate(
+            sold_cost_basis=Coalesce(Sum('cost_basis', filter=Q(type='sell')), zero),
+            realized_gain=Coalesce(Sum('realized_gain', filter=Q(type='sell')), zero),
+        )
+    ]
+    ProfitLossSummary.objects.bulk_create(
+        rows,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['user', 'coin'],
+        update_fields=SUMMARY_TOTALS + COST_TOTALS + ['holding_quantity', 'last_updated'],
+    )
+    return rows
+
+
+# Fold one trade into the user's running ProfitLossSummary for that coin. cost_basis is
+# the trade's cost basis from apply_trades_to_lots (a sell's released lot cost).
+# Must be called inside the same transaction.atomic() block as the trade itself.
+def apply_trade_to_summary(user_id, coin, trade_type, quantity, amount, cost_basis):
+    amount = Decimal(amount).quantize(CENT)
+    if trade_type == 'buy':
+        changes = {
+            'total_invested': F('total_invested') + amount,
+            'total_purchased_quantity': F('total_purchased_quantity') + quantity,
+            'holding_quantity': F('holding_quantity') + quantity,
+            'cost_basis': F('cost_basis') + amount,
+        }
+        initial = {'total_invested': amount, 'total_purchased_quantity': quantity, 'holding_quantity': quantity,
+                   'cost_basis': amount}
+    else:
+        changes = {
+            'total_earned': F('total_earned') + amount,
+            'total_sold_quantity': F('total_sold_quantity') + quantity,
+            'holding_quantity': F('holding_quantity') - quantity,
+            'cost_basis': F('cost_basis') - cost_basis,
+            'realized_gain': F('realized_gain') + (amount - cost_basis),
+        }
+        initial = {'total_earned': amount, 'total_sold_quantity': quantity, 'realized_gain': amount - cost_basis}
+
+    rows = ProfitLossSummary.objects.filter(user_id=user_id, coin=coin)
+    if rows.update(last_updated=timezone.now(), **changes):
+        return
+
+    try:
+        with transaction.atomic():
+            ProfitLossSummary.objects.create(user_id=user_id, coin=coin, **initial)
+    except IntegrityError:
+        # Another trade created the row first; fold into it instead
+        rows.update(last_updated=timezone.now(), **changes)
+
+
+# Value a summary row at the given price, matching the fields profit_loss_summary returns
+def mark_to_market(row, current_price):
+    holding_amount = row.holding_quantity * current_price
+
+    profit_loss = (row.total_earned + holding_amount) - row.total_invested
+    profit_loss = profit_loss.quantize(CENT)
+    if abs(profit_loss) < CENT:
+        profit_loss = Decimal('0.00')
+    unrealized_gain = (holding_amount - row.cost_basis).quantize(CENT)
+
+    return {
+        'coin': row.coin,
+        'total_purchased_quantity': row.total_purchased_quantity,
+        'total_invested': round(row.total_invested, 2),
+        'total_sold_quantity': row.total_sold_quantity,
+        'total_earned': round(row.total_earned, 2),
+        'holding_quantity': row.holding_quantity,
+        'current_price': round(current_price, 2),
+        'holding_amount': round(holding_amount, 2),
+        'net_profit_loss': profit_loss,
+        'cost_basis': round(row.cost_basis, 2),
+        'realized_gain': round(row.realized_gain, 2),
+        'unrealized_gain': unrealized_gain,
+    }
+
+
+# Batch form of apply_trade_to_summary: trades is a list of (coin, type, quantity, amount, cost_basis).
+# Reads the affected rows under lock and writes them back with one upsert.
+def apply_trades_to_summaries(user_id, trades):
+    coins = {coin for coin, *_ in trades}
+    current = ProfitLossSummary.objects.select_for_update().filter(user_id=user_id, coin__in=coins).values(
+        'coin', 'holding_quantity', *SUMMARY_TOTALS, *COST_TOTALS
+    )
+    # Fresh, unsaved instances so the upsert conflicts on (user, coin) rather than the primary key
+    rows = {values['coin']: ProfitLossSummary(user_id=user_id, **values) for values in current}
+
+    for coin, trade_type, quantity, amount, cost_basis in trades:
+        row = rows.setdefault(coin, ProfitLossSummary(user_id=user_id, coin=coin))
+        amount = Decimal(amount).quantize(CENT)
+        if trade_type == 'buy':
+            row.total_invested += amount
+            row.total_purchased_quantity += quantity
+            row.holding_quantity += quantity
+            row.cost_basis += amount
+        else:
+            row.total_earned += amount
+            row.total_sold_quantity += quantity
+            row.holding_quantity -= quantity
+            row.cost_basis -= cost_basis
+            row.realized_gain += amount - cost_basis
+
+    ProfitLossSummary.objects.bulk_create(
+        rows.values(),
+        update_conflicts=True,
+        unique_fields=['user', 'coin'],
+        update_fields=SUMMARY_TOTALS + COST_TOTALS + ['holding_quantity', 'last_updated'],
+    )
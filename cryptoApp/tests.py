@@ -1,3 +1,1482 @@
-from django.test import TestCase
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.db.models import F
+from django.utils import timezone
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from PIL import Image
+from unittest import mock
+from rest_framework.renderers import JSONRenderer
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from .cache_backends import SharedMemoryCache
+from .pagination import encode_cursor
+from .photos import photo_pipeline
+from .models import (
+    Register, Profile, Transaction, TokenBalance, ProfitLossSummary, PriceSnapshot, PriceHistory, CostLot, LeaderboardEntry
+)
+from .price_client import AsyncPriceClient, PriceClient, CircuitBreaker, CircuitOpen, PriceUnavailable
+from .identity import identity_key, resolve_user
+from .leaderboard import _cents, mark_leaderboard
+from .prices import PriceOracle, StalePrice, poll_prices
+from .renderers import FastJSONRenderer
+from .serializers import TRANSACTION_FIELDS, TransactionSerializer, transaction_rows
+from .summaries import rebuild_profit_loss_summaries
+from .trading import TradeError, execute_buy, execute_sell
+from .stub_server import CoinGeckoStub
+from .management.commands.bench_endpoints import ROUTES, route_names
 
-# Create your tests here.
+
+class PricePollerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.stub = CoinGeckoStub({'bitcoin': 50000.5, 'ethereum': 3000, 'solana': 150}).start()
+        self.addCleanup(self.stub.stop)
+        self.override = override_settings(COINGECKO_API_URL=self.stub.url, TRACKED_COINS=['bitcoin', 'ethereum'])
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        self.user = Register.objects.create(username='alice', email='alice@example.com', password='Secret@1')
+
+    def test_poll_stores_all_tracked_coins_in_one_request(self):
+        TokenBalance.objects.create(user=self.user, coin='solana', quantity=2)
+
+        call_command('poll_prices', '--once', stdout=StringIO())
+
+        self.assertEqual(len(self.stub.requests), 1)
+        self.assertEqual(sorted(self.stub.requests[0][0]), ['bitcoin', 'ethereum', 'solana'])
+        prices = dict(PriceSnapshot.objects.values_list('coin', 'price'))
+        self.assertEqual(prices['bitcoin'], Decimal('50000.5'))
+        self.assertEqual(prices['solana'], Decimal('150'))
+
+    @override_settings(PRICE_SNAPSHOT_ONLY=True)
+    def test_trade_reads_snapshot_without_calling_provider(self):
+        call_command('poll_prices', '--once', stdout=StringIO())
+        cache.clear()
+
+        response = self.client.post('/purchase-tokens/', {'email': self.user.email, 'coin': 'bitcoin', 'quantity': 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.stub.requests), 1)
+        self.assertEqual(Transaction.objects.get().total_price, Decimal('100001.00'))
+
+    @override_settings(PRICE_SNAPSHOT_ONLY=True)
+    def test_stale_snapshot_fails_fast(self):
+        call_command('poll_prices', '--once', stdout=StringIO())
+        PriceSnapshot.objects.update(fetched_at=timezone.now() - timedelta(hours=1))
+        cache.clear()
+
+        response = self.client.post('/purchase-tokens/', {'email': self.user.email, 'coin': 'bitcoin', 'quantity': 1})
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(Transaction.objects.exists())
+
+        response = self.client.get('/live-prices/', {'ids': 'bitcoin'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.stub.requests), 1)
+
+    @override_settings(PRICE_SNAPSHOT_ONLY=None)
+    def test_running_poller_turns_on_snapshot_only(self):
+        call_command('poll_prices', '--once', stdout=StringIO())
+        PriceSnapshot.objects.update(fetched_at=timezone.now() - timedelta(hours=1))
+        cache.delete_many([PriceOracle.cache_key('bitcoin', 'usd'), PriceOracle.stale_key('bitcoin', 'usd')])
+
+        response = self.client.post('/purchase-tokens/', {'email': self.user.email, 'coin': 'bitcoin', 'quantity': 1})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.stub.requests), 1)
+
+        # With no poller running, a miss goes to the provider
+        cache.clear()
+        response = self.client.post('/purchase-tokens/', {'email': self.user.email, 'coin': 'bitcoin', 'quantity': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.stub.requests), 2)
+
+    def test_unexpected_poll_errors_are_logged_not_fatal(self):
+        stderr = StringIO()
+        with mock.patch('cryptoApp.management.commands.poll_prices.poll_prices',
+                        side_effect=OperationalError('database is locked')):
+            call_command('poll_prices', '--once', stdout=StringIO(), stderr=stderr)
+        self.assertIn('database is locked', stderr.getvalue())
+
+    @override_settings(PRICE_SNAPSHOT_ONLY=True)
+    def test_unknown_coin_is_rejected_not_stale(self):
+        call_command('poll_prices', '--once', stdout=StringIO())
+
+        response = self.client.post('/purchase-tokens/', {'email': self.user.email, 'coin': 'notacoin', 'quantity': 1})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(PRICE_HTTP_RETRIES=2, PRICE_HTTP_BACKOFF=0, PRICE_BREAKER_FAILURE_THRESHOLD=2,
+                   PRICE_BREAKER_RESET_TIMEOUT=60, PRICE_HTTP_READ_TIMEOUT=0.2)
+class PriceClientTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.stub = CoinGeckoStub({'bitcoin': 100}).start()
+        self.addCleanup(self.stub.stop)
+        self.override = override_settings(COINGECKO_API_URL=self.stub.url)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        self.client_ = PriceClient()
+
+    def test_connections_are_reused(self):
+        for _ in range(3):
+            self.assertEqual(self.client_.get_prices('bitcoin'), {'bitcoin': {'usd': 100}})
+
+        pool, = self.client_.pool_stats()
+        self.assertEqual(pool['connections_opened'], 1)
+        self.assertEqual(pool['requests_sent'], 3)
+
+    def test_retries_then_trips_breaker(self):
+        self.stub.error_rate = 1.0
+
+        with self.assertRaises(PriceUnavailable):
+            self.client_.get_prices('bitcoin')
+        self.assertEqual(len(self.stub.requests), 3)
+
+        with self.assertRaises(PriceUnavailable):
+            self.client_.get_prices('bitcoin')
+        self.assertEqual(self.client_.breaker.state, CircuitBreaker.OPEN)
+
+        with self.assertRaises(CircuitOpen):
+            self.client_.get_prices('bitcoin')
+        self.assertEqual(len(self.stub.requests), 6)
+
+    def test_read_timeout(self):
+        self.stub.latency = 0.5
+
+        with self.assertRaises(PriceUnavailable):
+            self.client_.get_prices('bitcoin')
+
+    def test_non_json_body_counts_as_failure(self):
+        self.stub.body = b'<html>maintenance</html>'
+
+        for _ in range(2):
+            with self.assertRaises(PriceUnavailable):
+                self.client_.get_prices('bitcoin')
+        self.assertEqual(self.client_.breaker.state, CircuitBreaker.OPEN)
+
+    def test_async_client_retries_timeouts_and_rejects_non_json(self):
+        client = AsyncPriceClient(self.client_.breaker)
+        self.stub.latency = 0.5
+        with self.assertRaises(PriceUnavailable):
+            asyncio.run(client.get_prices('bitcoin'))
+        self.assertEqual(len(self.stub.requests), 3)
+
+        self.stub.latency = 0
+        self.stub.body = b'<html>maintenance</html>'
+        with self.assertRaises(PriceUnavailable):
+            asyncio.run(client.get_prices('bitcoin'))
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+
+    def test_oracle_serves_last_known_quote_while_provider_is_down(self):
+        oracle = PriceOracle(fetcher=self.client_.get_prices)
+        self.assertEqual(oracle.get_price('bitcoin'), Decimal('100'))
+
+        cache.delete(PriceOracle.cache_key('bitcoin', 'usd'))
+        self.stub.error_rate = 1.0
+        self.assertEqual(oracle.get_price('bitcoin'), Decimal('100'))
+
+        with self.assertRaises(PriceUnavailable):
+            oracle.get_price('ethereum')
+
+    def test_status_endpoint(self):
+        response = self.client.get('/price-provider/status/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('breaker', response.json())
+
+
+class PriceOracleCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.prices = {'bitcoin': 100, 'ethereum': 10, 'solana': 1}
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+        self.oracle = PriceOracle(fetcher=self.fetch)
+
+    def fetch(self, ids, vs_currencies):
+        self.calls.append(ids)
+        self.release.wait(5)
+        if self.prices is None:
+            raise PriceUnavailable("Provider down.")
+        return {coin: {'usd': self.prices[coin]} for coin in ids.split(',') if coin in self.prices}
+
+    def test_quotes_are_cached_per_coin(self):
+        self.oracle.get_quotes('bitcoin,ethereum')
+        quotes = self.oracle.get_quotes('ethereum, BITCOIN,solana,notacoin')
+        self.oracle.get_quotes('notacoin,solana')
+
+        self.assertEqual(self.calls, ['bitcoin,ethereum', 'notacoin,solana'])
+        self.assertEqual(quotes, {'bitcoin': {'usd': Decimal('100')}, 'ethereum': {'usd': Decimal('10')},
+                                  'solana': {'usd': Decimal('1')}})
+
+    @override_settings(PRICE_CACHE_TTL=0)
+    def test_expired_quote_is_served_while_refreshing(self):
+        self.assertEqual(self.oracle.get_price('bitcoin'), Decimal('100'))
+
+        self.prices = {'bitcoin': 200}
+        self.release.clear()
+        self.assertEqual(self.oracle.get_price('bitcoin'), Decimal('100'))
+        self.assertEqual(self.oracle.get_price('bitcoin'), Decimal('100'))
+        self.release.set()
+        self.oracle.wait_for_refreshes(timeout=5)
+
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.oracle.get_price('bitcoin'), Decimal('200'))
+        self.oracle.wait_for_refreshes(timeout=5)
+
+    def concurrently(self, count, call):
+        results = [None] * count
+
+        def run(index):
+            try:
+                results[index] = call()
+            except Exception as exc:
+                results[index] = exc
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+        for thread in threads:
+            thread.start()
+        # Every caller misses the cache before the first fetch returns
+        time.sleep(0.2)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_misses_share_one_fetch(self):
+        self.release.clear()
+
+        results = self.concurrently(8, lambda: self.oracle.get_price('bitcoin'))
+
+        self.assertEqual(self.calls, ['bitcoin'])
+        self.assertEqual(results, [Decimal('100')] * 8)
+
+    def test_unexpected_fetch_errors_reach_every_waiter(self):
+        def broken(ids, vs_currencies):
+            self.calls.append(ids)
+            self.release.wait(5)
+            raise ValueError('Not JSON.')
+
+        self.oracle = PriceOracle(fetcher=broken)
+        self.release.clear()
+
+        results = self.concurrently(4, lambda: self.oracle.get_price('bitcoin'))
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results), results)
+
+    def test_failures_are_cached(self):
+        self.prices = None
+
+        for _ in range(3):
+            with self.assertRaises(PriceUnavailable):
+                self.oracle.get_price('bitcoin')
+        self.assertEqual(len(self.calls), 1)
+
+
+class ProfitLossSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.stub = CoinGeckoStub({'bitcoin': 100, 'ethereum': 10}).start()
+        self.addCleanup(self.stub.stop)
+        self.override = override_settings(COINGECKO_API_URL=self.stub.url)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        self.user = Register.objects.create(username='bob', email='bob@example.com', password='Secret@1')
+
+    def trade(self, path, coin, quantity):
+        response = self.client.post(path, {'email': self.user.email, 'coin': coin, 'quantity': quantity})
+        self.assertEqual(response.status_code, 200)
+
+    def test_trades_update_summary_incrementally(self):
+        self.trade('/purchase-tokens/', 'bitcoin', 5)
+        self.trade('/purchase-tokens/', 'bitcoin', 3)
+        self.stub.prices['bitcoin'] = 150
+        cache.clear()
+        self.trade('/sell-tokens/', 'bitcoin', 2)
+
+        row = ProfitLossSummary.objects.get(user=self.user, coin='bitcoin')
+        self.assertEqual(row.total_purchased_quantity, 8)
+        self.assertEqual(row.total_invested, Decimal('800.00'))
+        self.assertEqual(row.total_sold_quantity, 2)
+        self.assertEqual(row.total_earned, Decimal('300.00'))
+        self.assertEqual(row.holding_quantity, 6)
+
+    def test_summary_is_marked_to_market_on_read(self):
+        self.trade('/purchase-tokens/', 'bitcoin', 4)
+        self.trade('/purchase-tokens/', 'ethereum', 10)
+        self.stub.prices['bitcoin'] = 120
+        cache.clear()
+
+        response = self.client.get(f'/profit-loss-summary/{self.user.email}/')
+
+        self.assertEqual(response.status_code, 200)
+        bitcoin, ethereum = response.json()
+        self.assertEqual(bitcoin['coin'], 'bitcoin')
+        self.assertEqual(Decimal(str(bitcoin['holding_amount'])), Decimal('480'))
+        self.assertEqual(Decimal(bitcoin['net_profit_loss']), Decimal('80.00'))
+        self.assertEqual(Decimal(ethereum['net_profit_loss']), Decimal('0.00'))
+
+
+class CostBasisTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.stub = CoinGeckoStub({'bitcoin': 100}).start()
+        self.addCleanup(self.stub.stop)
+        self.override = override_settings(COINGECKO_API_URL=self.stub.url)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        self.user = Register.objects.create(username='lou', email='lou@example.com', password='Secret@1')
+
+    def trade(self, path, quantity, price):
+        self.stub.prices['bitcoin'] = price
+        cache.clear()
+        response = self.client.post(path, {'email': self.user.email, 'coin': 'bitcoin', 'quantity': quantity})
+        self.assertEqual(response.status_code, 200)
+
+    def lots(self):
+        return list(CostLot.objects.filter(user=self.user).order_by('acquired_at', 'id').values_list('quantity', 'cost'))
+
+    def test_fifo_consumes_oldest_lots(self):
+        self.trade('/purchase-tokens/', 2, 100)
+        self.trade('/purchase-tokens/', 3, 200)
+        self.trade('/sell-tokens/', 3, 300)
+
+        sell = Transaction.objects.get(user=self.user, type='sell')
+        self.assertEqual((sell.cost_basis, sell.realized_gain), (Decimal('400.00'), Decimal('500.00')))
+        self.assertEqual(self.lots(), [(2, Decimal('400.00'))])
+
+        self.trade('/sell-tokens/', 2, 300)
+        self.assertEqual(self.lots(), [])
+        row = ProfitLossSummary.objects.get(user=self.user, coin='bitcoin')
+        self.assertEqual((row.cost_basis, row.realized_gain), (Decimal('0.00'), Decimal('700.00')))
+
+    @override_settings(COST_BASIS_METHOD='average')
+    def test_average_cost_pools_buys(self):
+        self.trade('/purchase-tokens/', 2, 100)
+        self.trade('/purchase-tokens/', 2, 200)
+        self.trade('/sell-tokens/', 1, 300)
+
+        sell = Transaction.objects.get(user=self.user, type='sell')
+        self.assertEqual((sell.cost_basis, sell.realized_gain), (Decimal('150.00'), Decimal('150.00')))
+        self.assertEqual(self.lots(), [(3, Decimal('450.00'))])
+
+    def test_profit_loss_reports_realized_and_unrealized_gain(self):
+        self.trade('/purchase-tokens/', 2, 100)
+        self.trade('/purchase-tokens/', 2, 200)
+        self.trade('/sell-tokens/', 1, 250)
+        cache.clear()
+
+        bitcoin, = self.client.get(f'/profit-loss-summary/{self.user.email}/').json()
+        self.assertEqual(Decimal(bitcoin['realized_gain']), Decimal('150.00'))
+        self.assertEqual(Decimal(bitcoin['cost_basis']), Decimal('500.00'))
+        self.assertEqual(Decimal(bitcoin['unrealized_gain']), Decimal('250.00'))
+
+    def test_rebuild_command_replays_the_ledger(self):
+        self.trade('/purchase-tokens/', 2, 100)
+        self.trade('/purchase-tokens/', 3, 200)
+        self.trade('/sell-tokens/', 3, 300)
+        expected = self.lots()
+        Transaction.objects.update(cost_basis=None, realized_gain=None)
+        CostLot.objects.all().delete()
+
+        call_command('rebuild_cost_basis', email=self.user.email, stdout=StringIO())
+
+        self.assertEqual(self.lots(), expected)
+        self.assertEqual(Transaction.objects.get(type='sell').realized_gain, Decimal('500.00'))
+
+        with override_settings(COST_BASIS_METHOD='average'):
+            call_command('rebuild_cost_basis', stdout=StringIO())
+        self.assertEqual(self.lots(), [(2, Decimal('320.00'))])
+        self.assertEqual(Transaction.objects.get(type='sell').realized_gain, Decimal('420.00'))
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.stub = CoinGeckoStub({'bitcoin': 100, 'ethereum': 10}).start()
+        self.addCleanup(self.stub.stop)
+        self.override = override_settings(COINGECKO_API_URL=self.stub.url, TRACKED_COINS=['bitcoin', 'ethereum'])
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        self.users = {
+            name: Register.objects.create(username=name, email=f'{name}@example.com', password='Secret@1')
+            for name in ('ann', 'ben', 'cal')
+        }
+
+    def trade(self, name, path, coin, quantity):
+        response = self.client.post(path, {'email': self.users[name].email, 'coin': coin, 'quantity': quantity})
+        self.assertEqual(response.status_code, 200)
+
+    def seed(self):
+        self.trade('ann', '/purchase-tokens/', 'bitcoin', 2)
+        self.trade('ben', '/purchase-tokens/', 'ethereum', 10)
+        self.trade('cal', '/purchase-tokens/', 'bitcoin', 1)
+        self.stub.prices['bitcoin'] = 150
+        cache.clear()
+        self.trade('cal', '/sell-tokens/', 'bitcoin', 1)
+        poll_prices(fetcher=lambda ids, vs: {'bitcoin': {'usd': 120}, 'ethereum': {'usd': 5}})
+
+    def test_trades_and_snapshot_marks_rank_users(self):
+        self.seed()
+
+        response = self.client.get('/leaderboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['rank'], row['username'], Decimal(row['net_profit_loss'])) for row in response.json()['results']],
+            [(1, 'cal', Decimal('50.00')), (2, 'ann', Decimal('40.00')), (3, 'ben', Decimal('-50.00'))],
+        )
+        self.assertEqual(len(self.client.get('/leaderboard/', {'limit': 1}).json()['results']), 1)
+        self.assertEqual(self.client.get('/leaderboard/', {'limit': 'x'}).status_code, 400)
+
+        body = self.client.get('/leaderboard/ann@example.com/').json()
+        self.assertEqual((body['rank'], Decimal(body['net_profit_loss'])), (2, Decimal('40.00')))
+        Register.objects.create(username='dee', email='dee@example.com', password='Secret@1')
+        self.assertEqual(self.client.get('/leaderboard/dee@example.com/').status_code, 404)
+
+    def test_trade_keeps_net_until_next_mark(self):
+        self.seed()
+        # Priced from the fresh snapshot, at 120
+        self.trade('ann', '/sell-tokens/', 'bitcoin', 1)
+
+        entry = LeaderboardEntry.objects.get(user=self.users['ann'])
+        self.assertEqual((entry.cash_flow, entry.holdings_value), (Decimal('-80.00'), Decimal('120.00')))
+        self.assertEqual(entry.net_profit_loss, Decimal('40.00'))
+
+        poll_prices(fetcher=lambda ids, vs: {'bitcoin': {'usd': 200}, 'ethereum': {'usd': 5}})
+        self.assertEqual(LeaderboardEntry.objects.get(user=self.users['ann']).net_profit_loss, Decimal('120.00'))
+
+    def test_rebuild_command_matches_incremental_entries(self):
+        self.seed()
+        expected = list(LeaderboardEntry.objects.order_by('user_id').values_list('user_id', 'cash_flow', 'net_profit_loss'))
+        LeaderboardEntry.objects.all().delete()
+
+        call_command('rebuild_leaderboard', stdout=StringIO())
+
+        self.assertEqual(
+            list(LeaderboardEntry.objects.order_by('user_id').values_list('user_id', 'cash_flow', 'net_profit_loss')),
+            expected,
+        )
+
+    def test_top_and_rank_read_the_index(self):
+        self.seed()
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get('/leaderboard/')
+            self.client.get('/leaderboard/ben@example.com/')
+
+        for query in captured.captured_queries:
+            if 'leaderboardentry' not in query['sql']:
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                steps = [row[-1] for row in cursor.fetchall()]
+            for step in steps:
+                self.assertNotIn('TEMP B-TREE', step, query['sql'])
+                if step.startswith('SCAN '):
+                    self.assertIn('leaderboard_rank_idx', step, query['sql'])
+
+
+class SummaryQueryCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = Register.objects.create(username='carol', email='carol@example.com', password='Secret@1')
+
+    def seed(self, coins):
+        for index, coin in enumerate(coins):
+            PriceSnapshot.objects.update_or_create(coin=coin, defaults={'price': Decimal(10 + index)})
+            Transaction.objects.create(user=self.user, coin=coin, quantity=5, total_price=Decimal('50.00'), type='buy')
+            Transaction.objects.create(user=self.user, coin=coin, quantity=2, total_price=Decimal('30.00'), type='sell')
+        rebuild_profit_loss_summaries(self.user)
+
+    def test_query_count_does_not_grow_with_coins(self):
+        for coins in (['bitcoin'], ['bitcoin', 'ethereum', 'tether', 'dogecoin', 'solana', 'cardano']):
+            self.seed(coins)
+            self.client.get(f'/profit-loss-summary/{self.user.email}/')
+
+            # The user's identity is cached by the first request, leaving one query each
+            with self.assertNumQueries(1):
+                response = self.client.get(f'/profit-loss-summary/{self.user.email}/')
+            self.assertEqual(len(response.json()), len(coins))
+
+            with self.assertNumQueries(1):
+                response = self.client.get(f'/purchased-token-summary/{self.user.email}/')
+            self.assertEqual(len(response.json()), len(coins))
+
+    def test_rebuild_matches_ledger(self):
+        self.seed(['bitcoin', 'ethereum'])
+        Transaction.objects.create(user=self.user, coin='bitcoin', quantity=1, total_price=Decimal('12.50'), type='buy')
+
+        with self.assertNumQueries(2):
+            rebuild_profit_loss_summaries(self.user)
+
+        row = ProfitLossSummary.objects.get(user=self.user, coin='bitcoin')
+        self.assertEqual(row.total_purchased_quantity, 6)
+        self.assertEqual(row.total_invested, Decimal('62.50'))
+        self.assertEqual(row.total_sold_quantity, 2)
+        self.assertEqual(row.total_earned, Decimal('30.00'))
+        self.assertEqual(row.holding_quantity, 4)
+
+
+class TradeConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        PriceSnapshot.objects.create(coin='bitcoin', price=Decimal('100'))
+        self.user = Register.objects.create(username='dave', email='dave@example.com', password='Secret@1')
+
+    def run_concurrently(self, path, count, threads=8):
+        statuses = []
+
+        def worker():
+            try:
+                for _ in range(count):
+                    response = Client().post(path, {'email': self.user.email, 'coin': 'bitcoin', 'quantity': 1})
+                    statuses.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        return statuses
+
+    def test_concurrent_buys_and_sells_keep_exact_balances(self):
+        statuses = self.run_concurrently('/purchase-tokens/', 10)
+        self.assertEqual(statuses, [200] * 80)
+        statuses = self.run_concurrently('/sell-tokens/', 5)
+        self.assertEqual(statuses, [200] * 40)
+
+        self.assertEqual(Profile.objects.get(user=self.user).wallet_amount, Decimal('9996000.00'))
+        self.assertEqual(TokenBalance.objects.get(user=self.user, coin='bitcoin').quantity, 40)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 120)
+        row = ProfitLossSummary.objects.get(user=self.user, coin='bitcoin')
+        self.assertEqual((row.total_purchased_quantity, row.total_sold_quantity, row.holding_quantity), (80, 40, 40))
+
+    def test_concurrent_buys_never_overdraw_wallet(self):
+        Profile.objects.filter(user=self.user).update(wallet_amount=Decimal('1000.00'))
+
+        statuses = self.run_concurrently('/purchase-tokens/', 3)
+
+        self.assertEqual(statuses.count(200), 10)
+        self.assertEqual(statuses.count(400), 14)
+        self.assertEqual(Profile.objects.get(user=self.user).wallet_amount, Decimal('0.00'))
+        self.assertEqual(TokenBalance.objects.get(user=self.user, coin='bitcoin').quantity, 10)
+
+    def test_trade_query_count(self):
+        self.client.post('/purchase-tokens/', {'email': self.user.email, 'coin': 'bitcoin', 'quantity': 1})
+
+        # Wallet debit (returning the new balance), balance, ledger insert, lot insert, summary,
+        # leaderboard, plus BEGIN/COMMIT
+        with self.assertNumQueries(8):
+            self.client.post('/purchase-tokens/', {'email': self.user.email, 'coin': 'bitcoin', 'quantity': 1})
+        # A sell reads and closes the one lot it consumes instead of inserting one
+        with self.assertNumQueries(9):
+            self.client.post('/sell-tokens/', {'email': self.user.email, 'coin': 'bitcoin', 'quantity': 1})
+
+
+    def test_trades_never_read_the_wallet_back(self):
+        execute_buy(self.user.id, 'bitcoin', 1, Decimal('100'))
+
+        for trade in (execute_buy, execute_sell):
+            with CaptureQueriesContext(connection) as captured:
+                _, wallet_amount = trade(self.user.id, 'bitcoin', 1, Decimal('100'))
+            self.assertLessEqual(len(captured.captured_queries), 9)
+            self.assertFalse([query for query in captured.captured_queries
+                              if query['sql'].startswith('SELECT') and 'cryptoApp_profile' in query['sql']])
+            self.assertEqual(wallet_amount, Profile.objects.get(user=self.user).wallet_amount)
+        self.assertEqual(wallet_amount, Decimal('9999900.00'))
+
+    def test_trade_during_a_mark_is_not_overwritten(self):
+        execute_buy(self.user.id, 'bitcoin', 1, Decimal('100'))
+        trader = threading.Thread(target=lambda: (execute_buy(self.user.id, 'bitcoin', 1, Decimal('120')),
+                                                  connections.close_all()))
+        cents = _cents
+
+        # Let a trade try to commit after the mark has read the holdings but before it writes
+        def trade_then_cents(values):
+            if trader.ident is None:
+                trader.start()
+                trader.join(timeout=0.5)
+            return cents(values)
+
+        with mock.patch('cryptoApp.leaderboard._cents', side_effect=trade_then_cents):
+            mark_leaderboard({'bitcoin': Decimal('120')})
+        trader.join()
+
+        entry = LeaderboardEntry.objects.get(user=self.user)
+        self.assertEqual((entry.cash_flow, entry.holdings_value), (Decimal('-220.00'), Decimal('240.00')))
+        self.assertEqual(entry.net_profit_loss, Decimal('20.00'))
+
+    def test_trades_without_returning_support_read_the_wallet_back(self):
+        with mock.patch.object(connection.features, 'can_return_columns_from_insert', False):
+            with CaptureQueriesContext(connection) as captured:
+                _, wallet_amount = execute_buy(self.user.id, 'bitcoin', 1, Decimal('100'))
+            Profile.objects.filter(user=self.user).update(wallet_amount=Decimal('50.00'))
+            with self.assertRaises(TradeError):
+                execute_buy(self.user.id, 'bitcoin', 1, Decimal('100'))
+
+        self.assertFalse([query for query in captured.captured_queries if 'RETURNING' in query['sql']])
+        self.assertEqual(wallet_amount, Decimal('9999900.00'))
+        self.assertEqual(Profile.objects.get(user=self.user).wallet_amount, Decimal('50.00'))
+
+
+class SQLiteProfileTests(TestCase):
+    def test_connection_pragmas(self):
+        with connection.cursor() as cursor:
+            pragmas = {}
+            for name in ('journal_mode', 'synchronous', 'busy_timeout', 'temp_store'):
+                cursor.execute(f'PRAGMA {name}')
+                pragmas[name] = cursor.fetchone()[0]
+
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 20000, 'temp_store': 2})
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+@override_settings(PRICE_SNAPSHOT_ONLY=True)
+class BatchOrderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for coin, price in (('bitcoin', '100'), ('ethereum', '10'), ('solana', '2.5')):
+            PriceSnapshot.objects.create(coin=coin, price=Decimal(price))
+        self.user = Register.objects.create(username='erin', email='erin@example.com', password='Secret@1')
+        Profile.objects.filter(user=self.user).update(wallet_amount=Decimal('1000.00'))
+
+    def submit(self, orders, **extra):
+        return self.client.post('/orders/batch/', {'email': self.user.email, 'orders': orders, **extra},
+                                content_type='application/json')
+
+    def test_batch_applies_legs_in_order(self):
+        response = self.submit([
+            {'type': 'buy', 'coin': 'bitcoin', 'quantity': 5},
+            {'type': 'buy', 'coin': 'ethereum', 'quantity': 40},
+            {'type': 'sell', 'coin': 'bitcoin', 'quantity': 2},
+            {'type': 'buy', 'coin': 'ethereum', 'quantity': 30},
+            {'type': 'sell', 'coin': 'solana', 'quantity': 1},
+            {'type': 'buy', 'coin': 'dogecoin-not-real', 'quantity': 1},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([leg['status'] for leg in body['results']],
+                         ['filled', 'filled', 'filled', 'filled', 'rejected', 'rejected'])
+        self.assertEqual(Decimal(str(body['wallet_amount'])), Decimal('0.00'))
+        self.assertEqual(dict(TokenBalance.objects.filter(user=self.user).values_list('coin', 'quantity')),
+                         {'bitcoin': 3, 'ethereum': 70})
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 4)
+        row = ProfitLossSummary.objects.get(user=self.user, coin='bitcoin')
+        self.assertEqual((row.total_invested, row.total_earned, row.holding_quantity),
+                         (Decimal('500.00'), Decimal('200.00'), 3))
+
+    def test_all_or_nothing_rejects_whole_batch(self):
+        response = self.submit([
+            {'type': 'buy', 'coin': 'bitcoin', 'quantity': 5},
+            {'type': 'buy', 'coin': 'bitcoin', 'quantity': 6},
+        ], all_or_nothing=True)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['results'][1]['error'], 'Insufficient wallet balance.')
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(Profile.objects.get(user=self.user).wallet_amount, Decimal('1000.00'))
+
+    def test_query_count_is_constant(self):
+        orders = [{'type': 'buy', 'coin': coin, 'quantity': 1} for coin in ('bitcoin', 'ethereum', 'solana')]
+        self.submit(orders)
+
+        # Wallet and balances for planning; then wallet, balances, balance upsert, ledger,
+        # lots, summary read, summary upsert and leaderboard inside the savepoint
+        with self.assertNumQueries(12):
+            response = self.submit(orders * 5)
+        self.assertEqual(response.json()['filled'], 15)
+
+    def test_query_count_is_constant_for_one_leg(self):
+        self.submit([{'type': 'buy', 'coin': 'bitcoin', 'quantity': 1}])
+
+        with self.assertNumQueries(12):
+            response = self.submit([{'type': 'buy', 'coin': 'bitcoin', 'quantity': 1}])
+        self.assertEqual(response.json()['filled'], 1)
+
+
+@override_settings(TRANSACTION_PAGE_SIZE=10)
+class TransactionPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = Register.objects.create(username='fay', email='fay@example.com', password='Secret@1')
+        start = timezone.now() - timedelta(days=30)
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, coin='bitcoin' if index % 3 else 'ethereum', quantity=1,
+                        total_price=Decimal('1.00'), type='sell' if index % 2 else 'buy',
+                        # Pairs of rows share a timestamp so the id tie-breaker is exercised
+                        purchased_at=start + timedelta(days=index // 2))
+            for index in range(45)
+        ])
+
+    def walk(self, path, params=None):
+        params = dict(params or {})
+        seen = []
+        while True:
+            response = self.client.get(path, params)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            seen.extend(row['id'] for row in body['results'])
+            if not body['next_cursor']:
+                return seen
+            params['cursor'] = body['next_cursor']
+
+    def test_walks_full_history_newest_first(self):
+        seen = self.walk(f'/transactions/{self.user.email}/')
+
+        expected = list(Transaction.objects.order_by('-purchased_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_filters(self):
+        seen = self.walk(f'/transactions/{self.user.email}/', {'coin': 'ethereum', 'type': 'buy', 'page_size': 3})
+        self.assertEqual(len(seen), Transaction.objects.filter(coin='ethereum', type='buy').count())
+
+        cutoff = (timezone.now() - timedelta(days=20)).date().isoformat()
+        seen = self.walk(f'/sell-transactions/{self.user.email}/', {'from': cutoff})
+        self.assertEqual(
+            sorted(seen),
+            sorted(Transaction.objects.filter(type='sell', purchased_at__date__gte=cutoff).values_list('id', flat=True)),
+        )
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f'/transactions/{self.user.email}/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class QueryPlanTests(TestCase):
+    ENDPOINTS = [
+        ('get', '/wallet-amount/{email}/', {}),
+        ('get', '/profile/{email}/', {}),
+        ('get', '/token-balances/{email}/', {}),
+        ('get', '/purchased-token-summary/{email}/', {}),
+        ('get', '/profit-loss-summary/{email}/', {}),
+        ('get', '/transactions/{email}/', {}),
+        ('get', '/transactions/{email}/', {'type': 'buy'}),
+        ('get', '/transactions/{email}/', {'coin': 'bitcoin'}),
+        ('get', '/transactions/{email}/', {'coin': 'bitcoin', 'type': 'sell', 'from': '2020-01-01'}),
+        ('get', '/sell-transactions/{email}/', {}),
+        ('get', '/transactions/{email}/', {'cursor': '{cursor}'}),
+        ('get', '/transactions/{email}/', {'coin': 'bitcoin', 'cursor': '{cursor}'}),
+        ('get', '/sell-transactions/{email}/', {'cursor': '{cursor}'}),
+        ('get', '/live-prices/', {'ids': 'bitcoin,ethereum'}),
+        ('post', '/purchase-tokens/', {'email': '{email}', 'coin': 'bitcoin', 'quantity': 1}),
+        ('post', '/sell-tokens/', {'email': '{email}', 'coin': 'bitcoin', 'quantity': 1}),
+    ]
+
+    def setUp(self):
+        cache.clear()
+        PriceSnapshot.objects.create(coin='bitcoin', price=Decimal('100'))
+        PriceSnapshot.objects.create(coin='ethereum', price=Decimal('10'))
+        self.user = Register.objects.create(username='gus', email='gus@example.com', password='Secret@1')
+        other = Register.objects.create(username='hal', email='hal@example.com', password='Secret@1')
+        for user in (self.user, other):
+            Transaction.objects.bulk_create([
+                Transaction(user=user, coin=coin, quantity=2, total_price=Decimal('20.00'), type=kind)
+                for coin in ('bitcoin', 'ethereum') for kind in ('buy', 'sell', 'buy')
+            ])
+            TokenBalance.objects.create(user=user, coin='bitcoin', quantity=10)
+            TokenBalance.objects.create(user=user, coin='ethereum', quantity=10)
+        rebuild_profit_loss_summaries()
+        newest = Transaction.objects.filter(user=self.user).latest('purchased_at', 'id')
+        self.cursor = encode_cursor(newest.purchased_at, newest.id)
+
+    def plan(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    # A full scan, or a temporary b-tree to sort or group, means the query's cost
+    # grows with the size of the table or of the user's history
+    def test_no_endpoint_query_scans_or_sorts(self):
+        for method, path, params in self.ENDPOINTS:
+            path = path.format(email=self.user.email)
+            params = {key: value.format(email=self.user.email, cursor=self.cursor) if isinstance(value, str) else value
+                      for key, value in params.items()}
+            with CaptureQueriesContext(connection) as captured:
+                response = getattr(self.client, method)(path, params)
+            self.assertLess(response.status_code, 400, path)
+
+            for query in captured.captured_queries:
+                sql = query['sql']
+                if not sql.startswith(('SELECT', 'UPDATE', 'DELETE')):
+                    continue
+                for step in self.plan(sql):
+                    with self.subTest(path=path, params=params, step=step):
+                        self.assertFalse(step.startswith('SCAN ') or 'TEMP B-TREE' in step, f'{step}\n{sql}')
+
+    # A cursor page must seek to the cursor, not walk the user's history from the newest row.
+    # Planned with the bound parameters the endpoint sent: with the literals inlined, SQLite
+    # can derive the range from the OR on its own, which hides the difference.
+    def test_cursor_pages_seek_past_the_cursor(self):
+        for path in ('/transactions/{email}/', '/sell-transactions/{email}/'):
+            executed = []
+
+            def record(execute, sql, params, many, context):
+                executed.append((sql, params))
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(record):
+                response = self.client.get(path.format(email=self.user.email), {'cursor': self.cursor})
+            self.assertEqual(response.status_code, 200)
+
+            (sql, params), = [(sql, params) for sql, params in executed
+                              if 'FROM "cryptoApp_transaction"' in sql and 'ORDER BY' in sql]
+            steps = self.plan(sql, params)
+            with self.subTest(path=path):
+                self.assertTrue(any('purchased_at<?' in step for step in steps), steps)
+
+
+class IdentityCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = Register.objects.create(username='ivy', email='ivy@example.com', password='Secret@1',
+                                            security_question='blue')
+
+    def test_resolves_once_then_serves_from_cache(self):
+        with self.assertNumQueries(1):
+            identity = resolve_user(self.user.email)
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_user(self.user.email), identity)
+        self.assertEqual(identity.profile_id, Profile.objects.get(user=self.user).id)
+
+    def test_wallet_amount_is_one_query_when_cached(self):
+        resolve_user(self.user.email)
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/wallet-amount/{self.user.email}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_password_change_and_deletion_invalidate(self):
+        resolve_user(self.user.email)
+        self.client.put(f'/profile/{self.user.email}/', {
+            'current_security_answer': 'blue', 'new_password': 'Newpass@1', 'confirm_password': 'Newpass@1',
+        }, content_type='application/json')
+        self.assertIsNone(cache.get(identity_key(self.user.email)))
+
+        resolve_user(self.user.email)
+        self.client.delete(f'/profile/{self.user.email}/')
+        with self.assertRaises(Register.DoesNotExist):
+            resolve_user(self.user.email)
+
+
+    @override_settings(PRICE_SNAPSHOT_ONLY=True)
+    def test_emails_differing_in_case_stay_separate_accounts(self):
+        PriceSnapshot.objects.create(coin='bitcoin', price=Decimal('100'))
+        shouting = Register.objects.create(username='IVY', email='IVY@example.com', password='Secret@1')
+        resolve_user(self.user.email)
+
+        self.assertEqual(resolve_user(shouting.email).id, shouting.id)
+        response = self.client.post('/purchase-tokens/', {'email': shouting.email, 'coin': 'bitcoin', 'quantity': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Transaction.objects.get().user_id, shouting.id)
+        self.assertEqual(Profile.objects.get(user=self.user).wallet_amount, Decimal('10000000.00'))
+
+
+class PortfolioTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        PriceSnapshot.objects.create(coin='bitcoin', price=Decimal('100'))
+        PriceSnapshot.objects.create(coin='ethereum', price=Decimal('10'))
+        self.user = Register.objects.create(username='jay', email='jay@example.com', password='Secret@1')
+        for coin in ('bitcoin', 'ethereum'):
+            for _ in range(3):
+                self.client.post('/purchase-tokens/', {'email': self.user.email, 'coin': coin, 'quantity': 1})
+
+    def test_matches_individual_endpoints(self):
+        response = self.client.get(f'/portfolio/{self.user.email}/', {'transactions_limit': 4})
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        email = self.user.email
+        self.assertEqual(body['wallet_amount'], self.client.get(f'/wallet-amount/{email}/').json()['wallet_amount'])
+        self.assertEqual(body['balances'], self.client.get(f'/token-balances/{email}/').json())
+        self.assertEqual(body['profit_loss'], self.client.get(f'/profit-loss-summary/{email}/').json())
+        self.assertEqual(body['purchase_summary'], self.client.get(f'/purchased-token-summary/{email}/').json())
+        self.assertEqual(body['transactions'], self.client.get(f'/transactions/{email}/').json()['results'][:4])
+
+    def test_constant_queries_and_section_selection(self):
+        self.client.get(f'/portfolio/{self.user.email}/')
+
+        with self.assertNumQueries(5):
+            self.client.get(f'/portfolio/{self.user.email}/')
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/portfolio/{self.user.email}/', {'include': 'wallet'})
+        self.assertEqual(list(response.json()), ['wallet_amount'])
+
+        response = self.client.get(f'/portfolio/{self.user.email}/', {'include': 'wallet,nope'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SharedMemoryCacheTests(TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'cache')
+        self.cache = SharedMemoryCache(self.path, {'OPTIONS': {'SLOTS': 16, 'SLOT_SIZE': 256}})
+
+    def test_entries_are_visible_across_processes(self):
+        self.cache.set('price_quote_bitcoin_usd', Decimal('100'))
+        pid = os.fork()
+        if pid == 0:
+            child = SharedMemoryCache(self.path, {'OPTIONS': {'SLOTS': 16, 'SLOT_SIZE': 256}})
+            ok = child.get('price_quote_bitcoin_usd') == Decimal('100')
+            child.set('written_by_child', 'yes')
+            os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertEqual(self.cache.get('written_by_child'), 'yes')
+
+    def test_increments_from_many_processes_are_not_lost(self):
+        self.cache.set('counter', 0, timeout=60)
+        children = []
+        for _ in range(4):
+            pid = os.fork()
+            if pid == 0:
+                child = SharedMemoryCache(self.path, {'OPTIONS': {'SLOTS': 16, 'SLOT_SIZE': 256}})
+                for _ in range(200):
+                    child.incr('counter')
+                child.decr('counter', 50)
+                os._exit(0)
+            children.append(pid)
+        for pid in children:
+            os.waitpid(pid, 0)
+
+        self.assertEqual(self.cache.get('counter'), 600)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expiry_eviction_and_oversized_values(self):
+        self.cache.set('short', 1, timeout=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+
+        for index in range(40):
+            self.cache.set(f'key{index}', index)
+        self.assertEqual(self.cache.get('key39'), 39)
+
+        self.assertFalse(self.cache.add('big', 'x' * 1000))
+        self.assertIsNone(self.cache.get('big'))
+        self.assertTrue(self.cache.add('small', 1))
+        self.assertFalse(self.cache.add('small', 2))
+        self.assertEqual(self.cache.incr('small'), 2)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.stub = CoinGeckoStub({'bitcoin': 100, 'ethereum': 10}).start()
+        self.addCleanup(self.stub.stop)
+        self.override = override_settings(COINGECKO_API_URL=self.stub.url)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        self.user = Register.objects.create(username='kim', email='kim@example.com', password='Secret@1')
+
+    async def test_live_prices(self):
+        response = await self.async_client.get('/async/live-prices/', {'ids': 'ethereum,bitcoin,notacoin'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'bitcoin': {'usd': 100.0}, 'ethereum': {'usd': 10.0}})
+
+    async def test_concurrent_requests_share_one_provider_call(self):
+        self.stub.latency = 0.2
+
+        responses = await asyncio.gather(*[
+            self.async_client.get('/async/live-prices/', {'ids': 'bitcoin'}) for _ in range(20)
+        ])
+
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertEqual(len(self.stub.requests), 1)
+
+    async def test_trades_and_profit_loss(self):
+        response = await self.async_client.post(
+            '/async/purchase-tokens/', {'email': self.user.email, 'coin': 'bitcoin', 'quantity': 3},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['message'], 'Purchased 3 bitcoin token(s) for $300.00')
+
+        response = await self.async_client.post('/async/sell-tokens/', {'email': self.user.email, 'coin': 'bitcoin', 'quantity': 5})
+        self.assertEqual(response.status_code, 400)
+        response = await self.async_client.post('/async/sell-tokens/', {'email': self.user.email, 'coin': 'bitcoin', 'quantity': 1})
+        self.assertEqual(response.status_code, 200)
+
+        response = await self.async_client.get(f'/async/profit-loss-summary/{self.user.email}/')
+        self.assertEqual(response.status_code, 200)
+        row, = response.json()
+        self.assertEqual((row['coin'], row['holding_quantity'], row['net_profit_loss']), ('bitcoin', 2, 0.0))
+        self.assertEqual(await TokenBalance.objects.filter(user=self.user).values_list('quantity', flat=True).aget(), 2)
+
+
+@override_settings(DATABASE_READ_REPLICA='replica', PRICE_SNAPSHOT_ONLY=True)
+class ReadReplicaTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        PriceSnapshot.objects.create(coin='bitcoin', price=Decimal('100'))
+        self.user = Register.objects.create(username='lee', email='lee@example.com', password='Secret@1')
+        self.other = Register.objects.create(username='max', email='max@example.com', password='Secret@1')
+        self.replicate()
+
+    # Stands in for replication: copy the primary file over the replica
+    def replicate(self):
+        for alias in ('default', 'replica'):
+            connections[alias].ensure_connection()
+        connections['default'].connection.backup(connections['replica'].connection)
+
+    def balances(self, user):
+        return self.client.get(f'/token-balances/{user.email}/').json()['balances']
+
+    def test_reads_are_served_by_replica(self):
+        TokenBalance.objects.create(user=self.other, coin='bitcoin', quantity=3)
+
+        self.assertEqual(self.balances(self.other), [])
+        self.replicate()
+        self.assertEqual(self.balances(self.other), [{'coin': 'bitcoin', 'quantity': 3}])
+
+    def test_trading_user_reads_their_writes(self):
+        self.client.post('/purchase-tokens/', {'email': self.user.email, 'coin': 'bitcoin', 'quantity': 2})
+        TokenBalance.objects.create(user=self.other, coin='bitcoin', quantity=3)
+
+        self.assertEqual(self.balances(self.user), [{'coin': 'bitcoin', 'quantity': 2}])
+        self.assertEqual(len(self.client.get(f'/transactions/{self.user.email}/').json()['results']), 1)
+        self.assertEqual(self.balances(self.other), [])
+
+        with override_settings(REPLICA_STICKY_SECONDS=0):
+            self.client.post('/purchase-tokens/', {'email': self.user.email, 'coin': 'bitcoin', 'quantity': 1})
+        self.assertEqual(self.balances(self.user), [])
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000, PRICE_SNAPSHOT_ONLY=True)
+class AuthTokenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        PriceSnapshot.objects.create(coin='bitcoin', price=Decimal('100'))
+        self.client.post('/register/', {'username': 'nia', 'email': 'nia@example.com', 'password': 'Secret@1',
+                                        'security_question': 'blue'})
+        self.user = Register.objects.get(email='nia@example.com')
+
+    def login(self, email='nia@example.com', password='Secret@1'):
+        return self.client.post('/login/', {'email': email, 'password': password})
+
+    def auth(self, token):
+        return {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def test_passwords_are_hashed_and_rehashed(self):
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        self.assertEqual(self.login(password='wrong').status_code, 400)
+        self.assertNotIn('password', self.login().json()['register_details'])
+
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+
+        Register.objects.filter(id=self.user.id).update(password='Plain@123')
+        self.assertEqual(self.login(password='Plain@123').status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+
+    def test_token_resolves_user_without_lookups(self):
+        token = self.login().json()['token']
+        cache.clear()
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/wallet-amount/{self.user.email}/', **self.auth(token))
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post('/purchase-tokens/', {'coin': 'bitcoin', 'quantity': 1}, **self.auth(token))
+        self.assertEqual(response.status_code, 200)
+
+    def test_rejected_tokens(self):
+        token = self.login().json()['token']
+        Register.objects.create(username='oz', email='oz@example.com', password='Secret@1')
+
+        response = self.client.get('/wallet-amount/oz@example.com/', **self.auth(token))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(f'/wallet-amount/{self.user.email}/', **self.auth(token[:-2] + 'xx'))
+        self.assertEqual(response.status_code, 401)
+        with override_settings(AUTH_TOKEN_TTL=-1):
+            expired = self.login().json()['token']
+        response = self.client.get(f'/wallet-amount/{self.user.email}/', **self.auth(expired))
+        self.assertEqual(response.status_code, 401)
+
+        with override_settings(AUTH_TOKEN_REQUIRED=True):
+            self.assertEqual(self.client.get(f'/wallet-amount/{self.user.email}/').status_code, 401)
+            self.assertEqual(self.client.get(f'/wallet-amount/{self.user.email}/', **self.auth(token)).status_code, 200)
+
+
+    @override_settings(AUTH_TOKEN_REQUIRED=True)
+    def test_profile_and_photo_endpoints_need_the_owners_token(self):
+        Register.objects.create(username='oz', email='oz@example.com', password='Secret@1')
+        other = self.login('oz@example.com').json()['token']
+        calls = [
+            ('get', f'/profile/{self.user.email}/', {}),
+            ('put', f'/profile/{self.user.email}/', {'current_security_answer': 'blue', 'new_password': 'Newpass@1',
+                                                     'confirm_password': 'Newpass@1'}),
+            ('delete', f'/profile/{self.user.email}/', {}),
+            ('post', f'/photo-upload/{self.user.email}/', {}),
+            ('delete', f'/photo-delete/{self.user.email}/', {}),
+        ]
+
+        for method, path, data in calls:
+            with self.subTest(method=method, path=path):
+                send = getattr(self.client, method)
+                kwargs = {} if method == 'post' else {'content_type': 'application/json'}
+                self.assertEqual(send(path, data, **kwargs).status_code, 401)
+                self.assertEqual(send(path, data, **kwargs, **self.auth(other)).status_code, 403)
+
+        self.assertTrue(Register.objects.filter(id=self.user.id, password=self.user.password).exists())
+        response = self.client.get(f'/profile/{self.user.email}/', **self.auth(self.login().json()['token']))
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(PRICE_SNAPSHOT_ONLY=True)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        PriceSnapshot.objects.create(coin='bitcoin', price=Decimal('100'))
+        self.user = Register.objects.create(username='pia', email='pia@example.com', password='Secret@1')
+        self.buy()
+
+    def buy(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/purchase-tokens/', {'email': self.user.email, 'coin': 'bitcoin', 'quantity': 1})
+        self.assertEqual(response.status_code, 200)
+
+    def revalidate(self, path, etag, **params):
+        return self.client.get(path, params, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_state_is_304_without_queries(self):
+        for path in ('token-balances', 'wallet-amount', 'transactions', 'profit-loss-summary'):
+            response = self.client.get(f'/{path}/{self.user.email}/')
+            self.assertEqual(response.status_code, 200)
+            with self.assertNumQueries(0):
+                response = self.revalidate(f'/{path}/{self.user.email}/', response['ETag'])
+            self.assertEqual(response.status_code, 304, path)
+
+    def test_trades_and_profile_changes_change_the_etag(self):
+        path = f'/token-balances/{self.user.email}/'
+        etag = self.client.get(path)['ETag']
+
+        self.buy()
+        response = self.revalidate(path, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_quantity'], 2)
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Profile.objects.get(user=self.user).save()
+        self.assertEqual(self.revalidate(path, etag).status_code, 200)
+
+    def test_query_string_and_prices_are_part_of_the_etag(self):
+        etag = self.client.get(f'/transactions/{self.user.email}/')['ETag']
+        response = self.revalidate(f'/transactions/{self.user.email}/', etag, type='sell')
+        self.assertEqual(response.status_code, 200)
+
+        path = f'/profit-loss-summary/{self.user.email}/'
+        etag = self.client.get(path)['ETag']
+        wallet_etag = self.client.get(f'/wallet-amount/{self.user.email}/')['ETag']
+        poll_prices(fetcher=lambda ids, vs: {'bitcoin': {'usd': 120}})
+        self.assertEqual(self.revalidate(path, etag).status_code, 200)
+        self.assertEqual(self.revalidate(f'/wallet-amount/{self.user.email}/', wallet_etag).status_code, 304)
+
+    def test_unknown_user_gets_no_etag(self):
+        response = self.client.get('/token-balances/nobody@example.com/')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_error_responses_get_no_etag(self):
+        response = self.client.get(f'/transactions/{self.user.email}/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.has_header('ETag'))
+
+        path = f'/profit-loss-summary/{self.user.email}/'
+        with mock.patch('cryptoApp.views.profit_loss_section', side_effect=StalePrice('Prices are stale.')):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertTrue(self.client.get(path).has_header('ETag'))
+
+    @override_settings(PRICE_CACHE_TTL=0)
+    def test_uncached_prices_give_no_etag(self):
+        response = self.client.get(f'/profit-loss-summary/{self.user.email}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertTrue(self.client.get(f'/wallet-amount/{self.user.email}/').has_header('ETag'))
+
+
+class SerializationTests(TestCase):
+    def setUp(self):
+        self.user = Register.objects.create(username='quin', email='quin@example.com', password='Secret@1')
+        now = timezone.now()
+        for index, price in enumerate(('0.10', '12.50', '99999.99')):
+            Transaction.objects.create(user=self.user, coin='bitcoin', quantity=index + 1, total_price=Decimal(price),
+                                       type='buy', purchased_at=now - timedelta(minutes=index, microseconds=index))
+
+    def test_values_rows_match_model_serializer(self):
+        queryset = Transaction.objects.order_by('-purchased_at', '-id')
+        expected = TransactionSerializer(queryset, many=True).data
+        self.assertEqual(transaction_rows(list(queryset.values(*TRANSACTION_FIELDS))), expected)
+
+        with timezone.override('Asia/Kolkata'):
+            expected = TransactionSerializer(queryset, many=True).data
+            self.assertEqual(transaction_rows(list(queryset.values(*TRANSACTION_FIELDS))), expected)
+
+    def test_fast_renderer_matches_json_renderer(self):
+        data = {
+            'total': Decimal('1.50'), 'at': timezone.now(), 'day': timezone.now().date(), 'text': 'café \u2028',
+            'rows': [{'id': 1}], 'nested': {64: {'webp': 'x.webp'}}, 'none': None,
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_transactions_endpoint_uses_lean_rows(self):
+        response = self.client.get(f'/transactions/{self.user.email}/', {'page_size': 2})
+
+        expected = TransactionSerializer(Transaction.objects.order_by('-purchased_at', '-id')[:2], many=True).data
+        self.assertEqual(response.json()['results'], json.loads(JSONRenderer().render(expected)))
+        following = self.client.get(f'/transactions/{self.user.email}/', {'cursor': response.json()['next_cursor']})
+        self.assertEqual([row['quantity'] for row in following.json()['results']], [3])
+
+
+class LedgerExportTests(TestCase):
+    def setUp(self):
+        self.user = Register.objects.create(username='rae', email='rae@example.com', password='Secret@1')
+
+    def seed(self, user, count):
+        start = timezone.now() - timedelta(days=1)
+        Transaction.objects.bulk_create(
+            (Transaction(user=user, coin=('bitcoin', 'ethereum')[index % 2], quantity=index % 5 + 1,
+                         total_price=Decimal(index) / 4, type='buy', purchased_at=start + timedelta(seconds=index))
+             for index in range(count)),
+            batch_size=1000,
+        )
+
+    def export(self, email, **params):
+        response = self.client.get(f'/export/{email}/', params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_and_ndjson_with_filters(self):
+        self.seed(self.user, 5)
+
+        lines = self.export(self.user.email).splitlines()
+        self.assertEqual(lines[0], 'id,purchased_at,type,coin,quantity,total_price,cost_basis,realized_gain')
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[1].endswith(',buy,bitcoin,1,0.00,,'))
+
+        rows = [json.loads(line) for line in self.export(self.user.email, format='ndjson', coin='ethereum').splitlines()]
+        self.assertEqual([row['total_price'] for row in rows], ['0.25', '0.75'])
+        self.assertEqual(self.export(self.user.email, coin='solana').splitlines(), [lines[0]])
+
+        self.assertEqual(self.client.get(f'/export/{self.user.email}/', {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get('/export/nobody@example.com/').status_code, 404)
+
+    @override_settings(EXPORT_CHUNK_SIZE=500)
+    def test_memory_does_not_grow_with_ledger_size(self):
+        def peak_while_exporting(email):
+            tracemalloc.start()
+            try:
+                size = sum(len(chunk) for chunk in self.client.get(f'/export/{email}/').streaming_content)
+                return size, tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        small = Register.objects.create(username='sam', email='sam@example.com', password='Secret@1')
+        self.seed(small, 1000)
+        self.seed(self.user, 40000)
+
+        peak_while_exporting(small.email)  # warm-up: first-request imports and caches
+        small_size, small_peak = peak_while_exporting(small.email)
+        large_size, large_peak = peak_while_exporting(self.user.email)
+        self.assertGreater(large_size, small_size * 30)
+        self.assertLess(large_peak, small_peak * 1.5)
+
+
+class PortfolioHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = Register.objects.create(username='uma', email='uma@example.com', password='Secret@1')
+        self.day = datetime(2026, 1, 5, tzinfo=dt_timezone.utc)
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write('coin,timestamp,price\n')
+            handle.write(f'bitcoin,{self.day.isoformat()},100\n')
+            handle.write(f'bitcoin,{int((self.day + timedelta(days=1)).timestamp())},120\n')
+            handle.write('bitcoin,2026-01-07T00:00:00,150\n')
+        self.addCleanup(os.remove, handle.name)
+        call_command('import_price_history', handle.name, stdout=StringIO())
+
+        self.trade(timedelta(hours=10), 'bitcoin', 'buy', 2, Decimal('200'))
+        self.trade(timedelta(days=2, hours=1), 'bitcoin', 'sell', 1, Decimal('150'))
+
+    def trade(self, offset, coin, type, quantity, total):
+        Transaction.objects.create(user=self.user, coin=coin, type=type, quantity=quantity, total_price=total,
+                                   purchased_at=self.day + offset)
+        delta = -total if type == 'buy' else total
+        Profile.objects.filter(user=self.user).update(wallet_amount=F('wallet_amount') + delta)
+
+    def history(self, **params):
+        return self.client.get(f'/portfolio-history/{self.user.email}/', params)
+
+    def test_daily_values_from_ledger_and_price_history(self):
+        self.assertEqual(PriceHistory.objects.count(), 3)
+        resolve_user(self.user.email)
+
+        with self.assertNumQueries(3):
+            response = self.history(to='2026-01-07')
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['timestamps'], ['2026-01-05T00:00:00Z', '2026-01-06T00:00:00Z', '2026-01-07T00:00:00Z'])
+        self.assertEqual(body['holdings_value'], [200.0, 240.0, 150.0])
+        self.assertEqual(body['wallet_amount'], [9999800.0, 9999800.0, 9999950.0])
+        self.assertEqual(body['total_value'], [10000000.0, 10000040.0, 10000100.0])
+
+    def test_buckets_and_limits(self):
+        body = self.history(bucket='hour', **{'from': '2026-01-05', 'to': '2026-01-07'}).json()
+        self.assertEqual(len(body['timestamps']), 72)
+        self.assertEqual(body['holdings_value'][9:11], [0.0, 200.0])
+
+        body = self.history(bucket='week', to='2026-01-07').json()
+        self.assertEqual(body['timestamps'], ['2026-01-01T00:00:00Z'])
+
+        self.assertEqual(self.history(bucket='month').status_code, 400)
+        self.assertEqual(self.history(**{'from': '2026-01-07', 'to': '2026-01-05'}).status_code, 400)
+        with override_settings(PORTFOLIO_HISTORY_MAX_POINTS=10):
+            self.assertEqual(self.history(bucket='hour', to='2026-01-07').status_code, 400)
+
+    def test_coin_without_price_history_is_a_gap(self):
+        self.trade(timedelta(days=1, hours=1), 'solana', 'buy', 1, Decimal('10'))
+
+        body = self.history(to='2026-01-07').json()
+        self.assertEqual(body['holdings_value'], [200.0, None, None])
+        self.assertEqual(body['wallet_amount'][1], 9999790.0)
+
+    def test_polling_records_history(self):
+        poll_prices(fetcher=lambda ids, vs: {'bitcoin': {'usd': 130}})
+        self.assertEqual(PriceHistory.objects.filter(coin='bitcoin').latest('recorded_at').price, Decimal('130'))
+
+
+class PhotoPipelineTests(TransactionTestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=media)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        self.user = Register.objects.create(username='pat', email='pat@example.com', password='Secret@1')
+
+    def upload(self, content, name='photo.png', user=None):
+        photo = SimpleUploadedFile(name, content)
+        return self.client.post(f'/photo-upload/{(user or self.user).email}/', {'photo': photo})
+
+    def image(self, size=(1200, 800), image_format='PNG', color=(200, 30, 30)):
+        buffer = BytesIO()
+        Image.new('RGB', size, color).save(buffer, format=image_format)
+        return buffer.getvalue()
+
+    def test_variants_are_rendered_and_deleted(self):
+        self.assertEqual(self.upload(self.image()).status_code, 200)
+        photo_pipeline.wait(timeout=10)
+
+        profile = self.client.get(f'/profile/{self.user.email}/').json()
+        self.assertEqual(sorted(profile['photo_variants'], key=int), ['64', '256', '512'])
+        variants = Profile.objects.get(user=self.user).photo_variants
+        with default_storage.open(variants['512']['webp']) as handle, Image.open(handle) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (512, 512)))
+        with default_storage.open(variants['64']['jpeg']) as handle, Image.open(handle) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (64, 64)))
+
+        names = [name for formats in variants.values() for name in formats.values()]
+        names.append(Profile.objects.get(user=self.user).photo_url.name)
+        self.assertEqual(self.client.delete(f'/photo-delete/{self.user.email}/').status_code, 200)
+        self.assertFalse(any(default_storage.exists(name) for name in names))
+
+    def test_deleting_a_photo_keeps_a_concurrent_wallet_change(self):
+        self.upload(self.image())
+        photo_pipeline.wait(timeout=10)
+
+        # A trade lands while the view holds its copy of the profile
+        def trade(*args):
+            Profile.objects.filter(user=self.user).update(wallet_amount=Decimal('42.00'))
+
+        with mock.patch('cryptoApp.views.delete_photo_files', side_effect=trade):
+            self.assertEqual(self.client.delete(f'/photo-delete/{self.user.email}/').status_code, 200)
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.wallet_amount, profile.photo_variants), (Decimal('42.00'), {}))
+        self.assertFalse(profile.photo_url)
+
+    def test_same_stem_uploads_keep_separate_variants(self):
+        other = Register.objects.create(username='quin', email='quin@example.com', password='Secret@1')
+        self.upload(self.image(image_format='JPEG', color=(200, 30, 30)), name='photo.jpg')
+        self.upload(self.image(image_format='PNG', color=(30, 30, 200)), name='photo.png', user=other)
+        photo_pipeline.wait(timeout=10)
+
+        mine = Profile.objects.get(user=self.user).photo_variants
+        theirs = Profile.objects.get(user=other).photo_variants
+        names = [name for formats in mine.values() for name in formats.values()]
+        self.assertFalse(set(names) & {name for formats in theirs.values() for name in formats.values()})
+        with default_storage.open(mine['64']['webp']) as handle, Image.open(handle) as image:
+            red, _, blue = image.convert('RGB').getpixel((32, 32))
+        self.assertGreater(red, blue)
+
+        self.assertEqual(self.client.delete(f'/photo-delete/{self.user.email}/').status_code, 200)
+        self.assertTrue(all(default_storage.exists(name) for formats in theirs.values() for name in formats.values()))
+
+    def test_replacing_a_photo_removes_the_old_files(self):
+        self.upload(self.image())
+        photo_pipeline.wait(timeout=10)
+        old = Profile.objects.get(user=self.user)
+
+        self.upload(self.image((300, 300), 'JPEG'), name='second.jpg')
+        photo_pipeline.wait(timeout=10)
+
+        self.assertFalse(default_storage.exists(old.photo_url.name))
+        self.assertFalse(default_storage.exists(old.photo_variants['256']['jpeg']))
+        self.assertEqual(len(Profile.objects.get(user=self.user).photo_variants), 3)
+
+    def test_invalid_uploads_are_rejected(self):
+        self.assertEqual(self.upload(b'not an image', name='photo.jpg').status_code, 400)
+        with override_settings(PHOTO_MAX_PIXELS=1000):
+            self.assertEqual(self.upload(self.image()).status_code, 400)
+        self.assertFalse(Profile.objects.get(user=self.user).photo_url)
+
+
+class EndpointBenchmarkTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.stub = CoinGeckoStub({'bitcoin': 100, 'ethereum': 10}).start()
+        self.addCleanup(self.stub.stop)
+        self.override = override_settings(COINGECKO_API_URL=self.stub.url)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+
+    def test_every_route_has_a_request_spec(self):
+        self.assertEqual(sorted(route_names()), sorted(ROUTES))
+
+    def test_in_process_run_reports_each_route(self):
+        out = StringIO()
+        call_command('bench_endpoints', '--in-process', users=2, transactions=8, requests=4, concurrency=2,
+                     only=['wallet_amount', 'sell_tokens', 'leaderboard'], stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(sorted(report['endpoints']), ['leaderboard', 'sell_tokens', 'wallet_amount'])
+        self.assertEqual(report['not_driven'], [])
+        for name, endpoint in report['endpoints'].items():
+            self.assertEqual((endpoint['requests'], endpoint['error_rate']), (4, 0.0), name)
+            self.assertGreater(endpoint['throughput_rps'], 0)
+            self.assertLessEqual(endpoint['latency_ms']['p50'], endpoint['latency_ms']['p99'])
+        self.assertEqual(report['endpoints']['wallet_amount']['path'], '/wallet-amount/{email}/')
+        self.assertEqual(report['endpoints']['leaderboard']['queries_per_request'], {'mean': 1.0, 'max': 1})
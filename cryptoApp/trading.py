@@ -0,0 +1,206 @@
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from decimal import Decimal
+from .models import Profile, Transaction, TokenBalance
+from .leaderboard import apply_trades_to_leaderboard
+from .lots import apply_trades_to_lots
+from .replica import pin_to_primary
+from .state import bump_state
+from .summaries import CENT, apply_trade_to_summary, apply_trades_to_summaries
+import threading
+
+
+# SQLite has a single writer. Trades from this process queue on a lock instead of in
+# SQLite's busy handler, which polls with sleeps of up to 100ms and starves unlucky writers.
+_write_lock = threading.RLock()
+
+
+@contextmanager
+def write_transaction():
+    if connection.vendor == 'sqlite' and settings.SQLITE_TUNING:
+        with _write_lock, transaction.atomic():
+            yield
+    else:
+        with transaction.atomic():
+            yield
+
+
+class TradeError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _credit_tokens(user_id, coin, quantity):
+    rows = TokenBalance.objects.filter(user_id=user_id, coin=coin)
+    if rows.update(quantity=F('quantity') + quantity, updated_at=timezone.now()):
+        return
+
+    try:
+        with transaction.atomic():
+            TokenBalance.objects.create(user_id=user_id, coin=coin, quantity=quantity)
+    except IntegrityError:
+        rows.update(quantity=F('quantity') + quantity, updated_at=timezone.now())
+
+
+def _debit_tokens(user_id, coin, quantity):
+    debited = TokenBalance.objects.filter(user_id=user_id, coin=coin, quantity__gte=quantity).update(
+        quantity=F('quantity') - quantity, updated_at=timezone.now()
+    )
+    if debited:
+        return
+
+    held = TokenBalance.objects.filter(user_id=user_id, coin=coin).values_list('quantity', flat=True).first()
+    if held is None:
+        raise TradeError(f'No {coin} balance found for this user.', status=404)
+    raise TradeError(f'Insufficient {coin} tokens to sell. You have {held}.')
+
+
+# Add amount to the user's wallet, only if that leaves at least minimum, and return the new
+# balance, or None when the condition fails. On PostgreSQL and SQLite 3.35+ the UPDATE returns
+# the balance itself, so a trade never reads the wallet back. SQLite gained RETURNING on every
+# statement at once, so the INSERT ... RETURNING feature flag tells whether UPDATE has it too.
+def _move_wallet(user_id, amount, minimum=None):
+    if connection.vendor not in ('sqlite', 'postgresql') or not connection.features.can_return_columns_from_insert:
+        rows = Profile.objects.filter(user_id=user_id)
+        if minimum is not None:
+            rows = rows.filter(wallet_amount__gte=minimum - amount)
+        if not rows.update(wallet_amount=F('wallet_amount') + amount):
+            return None
+        return Profile.objects.values_list('wallet_amount', flat=True).get(user_id=user_id)
+
+    field = Profile._meta.get_field('wallet_amount')
+    table, wallet = connection.ops.quote_name(Profile._meta.db_table), connection.ops.quote_name(field.column)
+    user = connection.ops.quote_name(Profile._meta.get_field('user').column)
+    sql = f"UPDATE {table} SET {wallet} = {wallet} + %s WHERE {user} = %s"
+    params = [field.get_db_prep_save(amount, connection), user_id]
+    if minimum is not None:
+        sql += f" AND {wallet} >= %s"
+        params.append(field.get_db_prep_save(minimum - amount, connection))
+    with connection.cursor() as cursor:
+        cursor.execute(f"{sql} RETURNING {wallet}", params)
+        row = cursor.fetchone()
+    return None if row is None else field.to_python(row[0]).quantize(CENT)
+
+
+# Buy quantity tokens at price_per_token. The wallet check and debit is one
+# conditional UPDATE, so concurrent trades can never overdraw the wallet.
+def execute_buy(user_id, coin, quantity, price_per_token):
+    total_cost = (Decimal(price_per_token) * quantity).quantize(CENT)
+
+    pin_to_primary(user_id)
+    with write_transaction():
+        wallet_amount = _move_wallet(user_id, -total_cost, minimum=Decimal('0.00'))
+        if wallet_amount is None:
+            raise TradeError('Insufficient wallet balance.')
+
+        _credit_tokens(user_id, coin, quantity)
+        trade = Transaction.objects.create(user_id=user_id, coin=coin, quantity=quantity, total_price=total_cost, type='buy')
+        trades = [(coin, 'buy', quantity, total_cost)]
+        apply_trades_to_lots(user_id, trades, trade.purchased_at)
+        apply_trade_to_summary(user_id, coin, 'buy', quantity, total_cost, total_cost)
+        apply_trades_to_leaderboard(user_id, trades)
+        bump_state(user_id)
+
+    return total_cost, wallet_amount
+
+
+def execute_sell(user_id, coin, quantity, price_per_token):
+    total_sale_value = (Decimal(price_per_token) * quantity).quantize(CENT)
+
+    pin_to_primary(user_id)
+    with write_transaction():
+        _debit_tokens(user_id, coin, quantity)
+        wallet_amount = _move_wallet(user_id, total_sale_value)
+        trades = [(coin, 'sell', quantity, total_sale_value)]
+        cost_basis, = apply_trades_to_lots(user_id, trades, timezone.now())
+        Transaction.objects.create(user_id=user_id, coin=coin, quantity=quantity, total_price=total_sale_value, type='sell',
+                                   cost_basis=cost_basis, realized_gain=total_sale_value - cost_basis)
+        apply_trade_to_summary(user_id, coin, 'sell', quantity, total_sale_value, cost_basis)
+        apply_trades_to_leaderboard(user_id, trades)
+        bump_state(user_id)
+
+    return total_sale_value, wallet_amount
+
+
+class BatchConflict(TradeError):
+    def __init__(self):
+        super().__init__('Balances changed while the batch was being applied. Please retry.', status=409)
+
+
+# Decide which legs can be filled, in order, against the user's current wallet
+# and balances. Each leg is a dict with coin, type, quantity and price.
+def plan_batch(user_id, legs):
+    wallet = Profile.objects.values_list('wallet_amount', flat=True).get(user_id=user_id)
+    holdings = dict(
+        TokenBalance.objects.filter(user_id=user_id, coin__in={leg['coin'] for leg in legs}).values_list('coin', 'quantity')
+    )
+
+    for leg in legs:
+        if leg.get('error'):
+            continue
+        leg['total'] = (leg['price'] * leg['quantity']).quantize(CENT)
+        if leg['type'] == 'buy':
+            if wallet < leg['total']:
+                leg['error'] = 'Insufficient wallet balance.'
+                continue
+            wallet -= leg['total']
+            holdings[leg['coin']] = holdings.get(leg['coin'], 0) + leg['quantity']
+        else:
+            held = holdings.get(leg['coin'], 0)
+            if held < leg['quantity']:
+                leg['error'] = f"Insufficient {leg['coin']} tokens to sell. You have {held}."
+                continue
+            wallet += leg['total']
+            holdings[leg['coin']] = held - leg['quantity']
+
+    return [leg for leg in legs if not leg.get('error')]
+
+
+# Apply every planned leg in one transaction with a constant number of statements
+def execute_batch(user_id, legs):
+    net_debit = sum(leg['total'] if leg['type'] == 'buy' else -leg['total'] for leg in legs)
+    deltas = {}
+    for leg in legs:
+        deltas[leg['coin']] = deltas.get(leg['coin'], 0) + (leg['quantity'] if leg['type'] == 'buy' else -leg['quantity'])
+
+    pin_to_primary(user_id)
+    with write_transaction():
+        # Take the wallet row first so the balances read below cannot change underneath us
+        wallet_amount = _move_wallet(user_id, -net_debit, minimum=Decimal('0.00') if net_debit > 0 else None)
+        if wallet_amount is None:
+            raise BatchConflict()
+
+        now = timezone.now()
+        held = dict(
+            TokenBalance.objects.select_for_update().filter(user_id=user_id, coin__in=deltas).values_list('coin', 'quantity')
+        )
+        balances = []
+        for coin, delta in deltas.items():
+            quantity = held.get(coin, 0) + delta
+            if quantity < 0:
+                raise BatchConflict()
+            balances.append(TokenBalance(user_id=user_id, coin=coin, quantity=quantity, updated_at=now))
+
+        TokenBalance.objects.bulk_create(
+            balances,
+            update_conflicts=True,
+            unique_fields=['user', 'coin'],
+            update_fields=['quantity', 'updated_at'],
+        )
+        trades = [(leg['coin'], leg['type'], leg['quantity'], leg['total']) for leg in legs]
+        bases = apply_trades_to_lots(user_id, trades, now)
+        Transaction.objects.bulk_create([
+            Transaction(user_id=user_id, coin=leg['coin'], quantity=leg['quantity'], total_price=leg['total'],
+                        type=leg['type'], purchased_at=now,
+                        **({'cost_basis': basis, 'realized_gain': leg['total'] - basis} if leg['type'] == 'sell' else {}))
+            for leg, basis in zip(legs, bases)
+        ])
+        apply_trades_to_summaries(user_id, [(*trade, basis) for trade, basis in zip(trades, bases)])
+        apply_trades_to_leaderboard(user_id, trades)
+        bump_state(user_id)
+
+    return wallet_amount
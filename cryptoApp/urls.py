@@ -1,8 +1,12 @@
 from django.urls import path
+from . import async_views
+from .exports import export_transactions
 from .views import (
     RegisterView, LoginView, ForgotPasswordView, ProfileView, PhotoUploadView,
     PhotoDeleteView, wallet_amount, get_live_prices, purchase_tokens, sell_tokens, user_transactions,
-    purchased_token_summary, token_balances, user_sell_transactions, profit_loss_summary
+    purchased_token_summary, token_balances, user_sell_transactions, profit_loss_summary,
+    price_provider_status, batch_orders, identity_cache_status, portfolio, portfolio_history, leaderboard,
+    leaderboard_rank
 )
 
 urlpatterns = [
@@ -14,12 +18,26 @@ urlpatterns = [
     path('photo-delete/<str:email>/', PhotoDeleteView.as_view(), name='photo_delete'),
     path('wallet-amount/<str:email>/', wallet_amount, name='wallet_amount'),
     path('live-prices/', get_live_prices, name='get_live_prices'),
+    path('price-provider/status/', price_provider_status, name='price_provider_status'),
+    path('identity-cache/status/', identity_cache_status, name='identity_cache_status'),
     path('purchase-tokens/', purchase_tokens, name='purchase_tokens'),
     path('sell-tokens/', sell_tokens, name='sell_tokens'),
+    path('orders/batch/', batch_orders, name='batch_orders'),
     path('transactions/<str:email>/', user_transactions, name='user_transactions'),
     path('purchased-token-summary/<str:email>/', purchased_token_summary, name='purchased_token_summary'),
     path('token-balances/<str:email>/', token_balances, name='token_balances'),
     path('sell-transactions/<str:email>/', user_sell_transactions, name='sell_transactions'),
     path('profit-loss-summary/<str:email>/', profit_loss_summary, name='profit_loss_summary'),
     path('profile-full/<str:email>/', ProfileView.as_view(), name='full_profile_view'),
+    path('portfolio/<str:email>/', portfolio, name='portfolio'),
+    path('portfolio-history/<str:email>/', portfolio_history, name='portfolio_history'),
+    path('export/<str:email>/', export_transactions, name='export_transactions'),
+    path('leaderboard/', leaderboard, name='leaderboard'),
+    path('leaderboard/<str:email>/', leaderboard_rank, name='leaderboard_rank'),
+
+    # Async versions of the price-bound endpoints, for ASGI deployments
+    path('async/live-prices/', async_views.get_live_prices, name='async_get_live_prices'),
+    path('async/purchase-tokens/', async_views.purchase_tokens, name='async_purchase_tokens'),
+    path('async/sell-tokens/', async_views.sell_tokens, name='async_sell_tokens'),
+    path('async/profit-loss-summary/<str:email>/', async_views.profit_loss_summary, name='async_profit_loss_summary'),
 ]
\ No newline at end of file
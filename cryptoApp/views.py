@@ -4,25 +4,26 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.decorators import api_view
 from rest_framework.parsers import MultiPartParser, FormParser
-from django.core.cache import cache
-from django.db.models import Sum
 from django.conf import settings
-from decimal import Decimal
-from .models import Register, Profile, Transaction, TokenBalance, ProfitLossSummary
-from .serializers import RegisterSerializer, LoginSerializer, TransactionSerializer
-import requests
+from django.contrib.auth.hashers import make_password
+from .models import Register, Profile, Transaction
+from .serializers import RegisterSerializer, LoginSerializer, TRANSACTION_FIELDS, transaction_rows
+from .prices import price_oracle, PriceUnavailable, StalePrice, CircuitOpen
+from .price_client import price_client
+from .authentication import issue_token, request_identity
+from .identity import ResolvedUser, identity_stats
+from .replica import reads_from_replica
+from .state import conditional_on_user_state
+from .photos import delete_photo_files, replace_photo, variant_urls, InvalidPhoto, PhotoQueueFull
+from .portfolio import (
+    wallet_section, balances_section, purchase_summary_section, profit_loss_section, latest_transactions_section
+)
+from .pagination import filter_transactions, keyset_page, paginated_data, parse_bound, InvalidPageRequest
+from .history import value_history, InvalidHistoryRequest
+from .leaderboard import top_entries, user_rank
+from .trading import execute_batch, execute_buy, execute_sell, plan_batch, TradeError
 import re
 
-# Utility function for fetching live prices
-def fetch_live_prices(ids, vs_currencies='usd'):
-    url = "https://api.coingecko.com/api/v3/simple/price"
-    params = {'ids': ids, 'vs_currencies': vs_currencies}
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        return {}
-
 # Register View
 class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterSerializer
@@ -40,11 +41,14 @@ class LoginView(APIView):
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
         if serializer.is_valid():
-            email = serializer.validated_data['user']
-            register_serializer = RegisterSerializer(email)
+            user = serializer.validated_data['user']
+            register_serializer = RegisterSerializer(user)
+            token, expires_at = issue_token(ResolvedUser(user.id, user.email, user.username, user.profile.id))
             return Response({
                 'message': 'Login successful.',
-                'register_details': register_serializer.data
+                'register_details': register_serializer.data,
+                'token': token,
+                'token_expires_at': expires_at,
             }, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -75,7 +79,7 @@ class ForgotPasswordView(APIView):
         if len(new_password) < 7 or not re.match(r'^(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&])', new_password):
             return Response({'message': 'Password must have 1 uppercase, 1 number, and 1 special character.'}, status=400)
 
-        user.password = new_password
+        user.password = make_password(new_password)
         user.save()
 
         return Response({'message': 'Password reset successful.'}, status=200)
@@ -84,9 +88,9 @@ class ForgotPasswordView(APIView):
 class ProfileView(APIView):
     def get(self, request, email):
         try:
-            user = Register.objects.get(email=email)
+            user = Register.objects.select_related('profile').get(id=request_identity(request, email).id)
             profile = user.profile
-        except Register.DoesNotExist:
+        except (Register.DoesNotExist, Profile.DoesNotExist):
             return Response({'error': 'User not found.'}, status=status.HTTP_404_NOT_FOUND)
 
         data = {
@@ -94,6 +98,7 @@ class ProfileView(APIView):
             'email': user.email,
             'dob': user.dob,
             'photo_url': request.build_absolute_uri(profile.photo_url.url) if profile.photo_url else '',
+            'photo_variants': variant_urls(request, profile),
             'created_at': user.created_at
         }
 
@@ -101,16 +106,16 @@ class ProfileView(APIView):
     
     def delete(self, request, email):
         try:
-            user = Register.objects.get(email=email)
+            user = Register.objects.get(id=request_identity(request, email).id)
             user.delete()
             return Response({'message': 'Account deleted successfully.'}, status=status.HTTP_200_OK)
-        except Register.DoesNotExist:
+        except (Register.DoesNotExist, Profile.DoesNotExist):
             return Response({'error': 'User not found.'}, status=status.HTTP_404_NOT_FOUND)
         
     def put(self, request, email):
         try:
-            user = Register.objects.get(email=email)
-        except Register.DoesNotExist:
+            user = Register.objects.get(id=request_identity(request, email).id)
+        except (Register.DoesNotExist, Profile.DoesNotExist):
             return Response({'error': 'User not found.'}, status=404)
 
         current_answer = request.data.get('current_security_answer')
@@ -129,7 +134,7 @@ class ProfileView(APIView):
         if len(new_password) < 7 or not re.match(r'^(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&])', new_password):
             return Response({'error': 'Password must have 1 uppercase, 1 number, and 1 special character.'}, status=400)
 
-        user.password = new_password
+        user.password = make_password(new_password)
         user.save()
 
         return Response({'message': 'Password updated successfully.'}, status=200)
@@ -140,17 +145,22 @@ class PhotoUploadView(APIView):
 
     def post(self, request, email):
         try:
-            user = Register.objects.get(email=email)
-        except Register.DoesNotExist:
+            user = Register.objects.select_related('profile').get(id=request_identity(request, email).id)
+        except (Register.DoesNotExist, Profile.DoesNotExist):
             return Response({'error': 'User not found.'}, status=404)
 
         photo = request.FILES.get('photo')
         if not photo:
             return Response({'error': 'No photo uploaded.'}, status=400)
 
-        user.profile.photo_url = photo
-        user.profile.save()
-        
+        try:
+            replace_photo(user.profile, photo)
+        except InvalidPhoto as exc:
+            return Response({'error': str(exc)}, status=400)
+        except PhotoQueueFull as exc:
+            return Response({'error': str(exc)}, status=503)
+
+        # Resized variants are rendered in the background and appear on the profile once ready
         photo_url = request.build_absolute_uri(user.profile.photo_url.url)
         return Response({'message': 'Photo uploaded successfully.', 'photo_url': photo_url}, status=200)
 
@@ -158,28 +168,30 @@ class PhotoUploadView(APIView):
 class PhotoDeleteView(APIView):
     def delete(self, request, email):
         try:
-            user = Register.objects.get(email=email)
-        except Register.DoesNotExist:
+            user = Register.objects.select_related('profile').get(id=request_identity(request, email).id)
+        except (Register.DoesNotExist, Profile.DoesNotExist):
             return Response({'error': 'User not found.'}, status=404)
 
         if user.profile.photo_url:
-            user.profile.photo_url.delete(save=False)
+            delete_photo_files(user.profile.photo_url.name, user.profile.photo_variants)
             user.profile.photo_url = None
-            user.profile.save()
+            user.profile.photo_variants = {}
+            user.profile.save(update_fields=['photo_url', 'photo_variants'])
             return Response({'message': 'Profile photo deleted successfully.'}, status=200)
         else:
             return Response({'error': 'No profile photo to delete.'}, status=400)
 
 # Wallet Amount
+@conditional_on_user_state()
 @api_view(['GET'])
 def wallet_amount(request, email):
     try:
-        user = Register.objects.get(email=email)
-        profile = user.profile
+        identity = request_identity(request, email)
+        wallet = wallet_section(identity.profile_id)
     except (Register.DoesNotExist, Profile.DoesNotExist):
         return Response({'error': 'User or profile not found.'}, status=404)
 
-    return Response({'wallet_amount': profile.wallet_amount}, status=200)
+    return Response({'wallet_amount': wallet}, status=200)
 
 # Get Live Prices
 @api_view(['GET'])
@@ -187,23 +199,32 @@ def get_live_prices(request):
     ids = request.GET.get('ids', 'bitcoin,ethereum,tether,dogecoin,solana,cardano')
     vs_currencies = request.GET.get('vs_currencies', 'usd')
 
-    cache_key = f"live_prices_{ids}_{vs_currencies}"
-    cached_data = cache.get(cache_key)
-
-    if cached_data:
-        return Response(cached_data)
+    try:
+        data = price_oracle.get_quotes(ids, vs_currencies)
+    except (StalePrice, CircuitOpen) as exc:
+        return Response({'error': str(exc)}, status=503)
+    except PriceUnavailable:
+        data = {}
 
-    data = fetch_live_prices(ids, vs_currencies)
     if data:
-        cache.set(cache_key, data, timeout=120)
         return Response(data)
     else:
         return Response({'error': 'Failed to fetch prices.'}, status=500)
 
+# Price Provider Status (circuit breaker and connection pool stats for monitoring)
+@api_view(['GET'])
+def price_provider_status(request):
+    return Response(price_client.stats(), status=200)
+
+# Identity Cache Status (hit/miss counters for monitoring)
+@api_view(['GET'])
+def identity_cache_status(request):
+    return Response(identity_stats(), status=200)
+
 # Purchase Tokens (For Purchase History Table)
 @api_view(['POST'])
 def purchase_tokens(request):
-    email = request.data.get('email')
+    email = request.data.get('email') or getattr(request.user, 'email', None)
     coin = request.data.get('coin')
     quantity = int(request.data.get('quantity'))
 
@@ -211,85 +232,66 @@ def purchase_tokens(request):
         return Response({'error': 'Invalid request.'}, status=400)
 
     try:
-        user = Register.objects.get(email=email)
-        profile = user.profile
+        user_id = request_identity(request, email).id
     except (Register.DoesNotExist, Profile.DoesNotExist):
         return Response({'error': 'User or profile not found.'}, status=404)
 
-    response = requests.get(
-        "https://api.coingecko.com/api/v3/simple/price",
-        params={'ids': coin.lower(), 'vs_currencies': 'usd'}
-    )
-    if response.status_code != 200:
+    try:
+        price_per_token = price_oracle.get_price(coin, 'usd')
+    except (StalePrice, CircuitOpen) as exc:
+        return Response({'error': str(exc)}, status=503)
+    except PriceUnavailable:
         return Response({'error': 'Failed to fetch coin price.'}, status=500)
 
-    price_data = response.json()
-    if coin.lower() not in price_data:
+    if price_per_token is None:
         return Response({'error': 'Invalid coin selected.'}, status=400)
 
-    price_per_token = Decimal(price_data[coin.lower()]['usd'])
-    total_cost = price_per_token * quantity
-
-    if profile.wallet_amount < total_cost:
-        return Response({'error': 'Insufficient wallet balance.'}, status=400)
-
-    profile.wallet_amount -= total_cost
-    profile.save()
-
-    # Update token balance
-    balance, _ = TokenBalance.objects.get_or_create(user=user, coin=coin)
-    balance.quantity += quantity
-    balance.save()
-
-    Transaction.objects.create(
-        user=user,
-        coin=coin,
-        quantity=quantity,
-        total_price=total_cost,
-        type='buy'
-    )
+    try:
+        total_cost, wallet = execute_buy(user_id, coin, quantity, price_per_token)
+    except TradeError as exc:
+        return Response({'error': str(exc)}, status=exc.status)
 
     return Response({
         'message': f'Purchased {quantity} {coin} token(s) for ${total_cost:.2f}',
-        'wallet_amount': profile.wallet_amount
+        'wallet_amount': wallet
     }, status=200)
 
 # Transaction 
+@conditional_on_user_state()
 @api_view(['GET'])
 def user_transactions(request, email):
     try:
-        user = Register.objects.get(email=email)
-    except Register.DoesNotExist:
+        user_id = request_identity(request, email).id
+    except (Register.DoesNotExist, Profile.DoesNotExist):
         return Response({'error': 'User not found.'}, status=404)
 
-    transactions = user.transactions.all().order_by('-purchased_at')
-    serializer = TransactionSerializer(transactions, many=True)
-    return Response(serializer.data, status=200)
+    try:
+        transactions = filter_transactions(Transaction.objects.filter(user_id=user_id), request.GET)
+        with reads_from_replica(user_id):
+            page, next_cursor = keyset_page(transactions.values(*TRANSACTION_FIELDS), request.GET)
+    except InvalidPageRequest as exc:
+        return Response({'error': str(exc)}, status=400)
+
+    return Response(paginated_data(request, transaction_rows(page), next_cursor), status=200)
 
 # Purchase Token Summary (For Total Purchased Tokens Table)
+@conditional_on_user_state()
 @api_view(['GET'])
 def purchased_token_summary(request, email):
     try:
-        user = Register.objects.get(email=email)
-    except Register.DoesNotExist:
+        user_id = request_identity(request, email).id
+    except (Register.DoesNotExist, Profile.DoesNotExist):
         return Response({'error': 'User not found.'}, status=404)
 
-    transactions = Transaction.objects.filter(user=user, type='buy')
-
-    summary = transactions.values('coin').annotate(
-        total_tokens=Sum('quantity'),
-        total_value=Sum('total_price')
-    ).filter(total_tokens__gt=0).order_by('coin')
-
-    for item in summary:
-        item['total_value'] = round(item['total_value'], 2)
+    with reads_from_replica(user_id):
+        summary = purchase_summary_section(user_id)
 
     return Response(summary)
 
 # Sell Token 
 @api_view(['POST'])
 def sell_tokens(request):
-    email = request.data.get('email')
+    email = request.data.get('email') or getattr(request.user, 'email', None)
     coin = request.data.get('coin')
     quantity = int(request.data.get('quantity'))
 
@@ -297,173 +299,235 @@ def sell_tokens(request):
         return Response({'error': 'Invalid request.'}, status=400)
 
     try:
-        user = Register.objects.get(email=email)
-        profile = user.profile
+        user_id = request_identity(request, email).id
     except (Register.DoesNotExist, Profile.DoesNotExist):
         return Response({'error': 'User or profile not found.'}, status=404)
 
     try:
-        balance = TokenBalance.objects.get(user=user, coin=coin)
-    except TokenBalance.DoesNotExist:
-        return Response({'error': f'No {coin} balance found for this user.'}, status=404)
-
-    if balance.quantity < quantity:
-        return Response({'error': f'Insufficient {coin} tokens to sell. You have {balance.quantity}.'}, status=400)
-
-    response = requests.get(
-        "https://api.coingecko.com/api/v3/simple/price",
-        params={'ids': coin.lower(), 'vs_currencies': 'usd'}
-    )
-    if response.status_code != 200:
+        price_per_token = price_oracle.get_price(coin, 'usd')
+    except (StalePrice, CircuitOpen) as exc:
+        return Response({'error': str(exc)}, status=503)
+    except PriceUnavailable:
         return Response({'error': 'Failed to fetch coin price.'}, status=500)
 
-    price_data = response.json()
-    if coin.lower() not in price_data:
+    if price_per_token is None:
         return Response({'error': 'Invalid coin selected.'}, status=400)
 
-    price_per_token = Decimal(price_data[coin.lower()]['usd'])
-    total_sale_value = price_per_token * quantity
-
-    profile.wallet_amount += total_sale_value
-    profile.save()
-
-    balance.quantity -= quantity
-    balance.save()
-
-    Transaction.objects.create(
-        user=user,
-        coin=coin,
-        quantity=quantity,
-        total_price=total_sale_value,
-        type='sell'
-    )
+    try:
+        total_sale_value, wallet = execute_sell(user_id, coin, quantity, price_per_token)
+    except TradeError as exc:
+        return Response({'error': str(exc)}, status=exc.status)
 
     return Response({
         'message': f'Sold {quantity} {coin} token(s) for ${total_sale_value:.2f}',
-        'wallet_amount': profile.wallet_amount
+        'wallet_amount': wallet
     }, status=200)
 
-# Token Balance
-@api_view(['GET'])
-def token_balances(request, email):
+# Batch Orders (many buys/sells priced and applied together)
+@api_view(['POST'])
+def batch_orders(request):
+    email = request.data.get('email') or getattr(request.user, 'email', None)
+    orders = request.data.get('orders')
+    all_or_nothing = str(request.data.get('all_or_nothing', False)).lower() in ('true', '1')
+
+    if not email or not isinstance(orders, list) or not orders:
+        return Response({'error': 'Invalid request.'}, status=400)
+
+    if len(orders) > settings.BATCH_ORDER_MAX_LEGS:
+        return Response({'error': f'A batch can hold at most {settings.BATCH_ORDER_MAX_LEGS} orders.'}, status=400)
+
     try:
-        user = Register.objects.get(email=email)
-    except Register.DoesNotExist:
-        return Response({'error': 'User not found.'}, status=404)
+        user_id = request_identity(request, email).id
+    except (Register.DoesNotExist, Profile.DoesNotExist):
+        return Response({'error': 'User or profile not found.'}, status=404)
 
-    balances = TokenBalance.objects.filter(user=user).order_by('coin')
-    
-    data = [
+    legs = []
+    for index, order in enumerate(orders):
+        order = order if isinstance(order, dict) else {}
+        try:
+            quantity = int(order.get('quantity'))
+        except (TypeError, ValueError):
+            quantity = 0
+        leg = {'index': index, 'type': order.get('type'), 'coin': order.get('coin'), 'quantity': quantity}
+        if not isinstance(leg['coin'], str) or not leg['coin'] or leg['type'] not in ('buy', 'sell') or quantity < 1:
+            leg['error'] = 'Invalid order.'
+        legs.append(leg)
+
+    coins = {leg['coin'].lower() for leg in legs if not leg.get('error')}
+    try:
+        quotes = price_oracle.get_quotes(coins, 'usd') if coins else {}
+    except (StalePrice, CircuitOpen) as exc:
+        return Response({'error': str(exc)}, status=503)
+    except PriceUnavailable:
+        return Response({'error': 'Failed to fetch coin price.'}, status=500)
+
+    for leg in legs:
+        if not leg.get('error'):
+            leg['price'] = quotes.get(leg['coin'].lower(), {}).get('usd')
+            if leg['price'] is None:
+                leg['error'] = 'Invalid coin selected.'
+
+    filled = []
+    if not (all_or_nothing and any(leg.get('error') for leg in legs)):
+        filled = plan_batch(user_id, legs)
+    if all_or_nothing and len(filled) < len(legs):
+        filled = []
+
+    response_data = {}
+    if filled:
+        try:
+            response_data['wallet_amount'] = execute_batch(user_id, filled)
+        except TradeError as exc:
+            return Response({'error': str(exc)}, status=exc.status)
+
+    filled_indexes = {leg['index'] for leg in filled}
+    response_data['results'] = [
         {
-            'coin': balance.coin,
-            'quantity': balance.quantity
+            'index': leg['index'],
+            'type': leg['type'],
+            'coin': leg['coin'],
+            'quantity': leg['quantity'],
+            'status': 'filled' if leg['index'] in filled_indexes else 'rejected',
+            'price_per_token': leg.get('price'),
+            'total': leg.get('total'),
+            'error': leg.get('error') or (None if leg['index'] in filled_indexes else 'Batch was not applied.'),
         }
-        for balance in balances
+        for leg in legs
     ]
+    response_data['filled'] = len(filled)
 
-    total_quantity = sum(item['quantity'] for item in data)
+    return Response(response_data, status=200 if filled else 400)
+
+# Token Balance
+@conditional_on_user_state()
+@api_view(['GET'])
+def token_balances(request, email):
+    try:
+        user_id = request_identity(request, email).id
+    except (Register.DoesNotExist, Profile.DoesNotExist):
+        return Response({'error': 'User not found.'}, status=404)
 
-    response_data = {
-        'balances': data,
-        'total_quantity': total_quantity
-    }
+    with reads_from_replica(user_id):
+        response_data = balances_section(user_id)
 
     return Response(response_data, status=200)
 
 # User Sell Transaction
+@conditional_on_user_state()
 @api_view(['GET'])
 def user_sell_transactions(request, email):
     try:
-        user = Register.objects.get(email=email)
-    except Register.DoesNotExist:
+        user_id = request_identity(request, email).id
+    except (Register.DoesNotExist, Profile.DoesNotExist):
         return Response({'error': 'User not found.'}, status=404)
 
-    transactions = user.transactions.filter(type='sell').order_by('-purchased_at')
-    serializer = TransactionSerializer(transactions, many=True)
-    return Response(serializer.data, status=200)
+    try:
+        transactions = filter_transactions(Transaction.objects.filter(user_id=user_id, type='sell'), request.GET, allow_type=False)
+        with reads_from_replica(user_id):
+            page, next_cursor = keyset_page(transactions.values(*TRANSACTION_FIELDS), request.GET)
+    except InvalidPageRequest as exc:
+        return Response({'error': str(exc)}, status=400)
+
+    return Response(paginated_data(request, transaction_rows(page), next_cursor), status=200)
 
 # Profit-Loss Summary
+@conditional_on_user_state(prices=True)
 @api_view(['GET'])
 def profit_loss_summary(request, email):
     try:
-        user = Register.objects.get(email=email)
-    except Register.DoesNotExist:
+        user_id = request_identity(request, email).id
+    except (Register.DoesNotExist, Profile.DoesNotExist):
         return Response({'error': 'User not found.'}, status=404)
 
-    COIN_GECKO_IDS = {
-        'bitcoin': 'bitcoin',
-        'ethereum': 'ethereum',
-        'tether': 'tether',
-        'dogecoin': 'dogecoin',
-        'solana': 'solana',
-        'cardano': 'cardano',
-    }
-
-    coins = Transaction.objects.filter(user=user).values_list('coin', flat=True).distinct()
-
-    if not coins:
-        return Response([])
-
-    coin_ids = ','.join(
-        COIN_GECKO_IDS.get(coin.lower())
-        for coin in coins
-        if COIN_GECKO_IDS.get(coin.lower())
-    )
-
-    price_data = {}
-    if coin_ids:
-        price_data = fetch_live_prices(coin_ids, 'usd')
-
-    summary = []
-
-    for coin in coins:
-        purchases = Transaction.objects.filter(user=user, coin=coin, type='buy')
-        total_purchased_quantity = purchases.aggregate(Sum('quantity'))['quantity__sum'] or 0
-        total_invested = purchases.aggregate(Sum('total_price'))['total_price__sum'] or Decimal('0.00')
-
-        sells = Transaction.objects.filter(user=user, coin=coin, type='sell')
-        total_sold_quantity = sells.aggregate(Sum('quantity'))['quantity__sum'] or 0
-        total_earned = sells.aggregate(Sum('total_price'))['total_price__sum'] or Decimal('0.00')
-
-        holding_quantity = total_purchased_quantity - total_sold_quantity
-
-        coin_id = COIN_GECKO_IDS.get(coin.lower())
-        current_price = Decimal(price_data.get(coin_id, {}).get('usd', 0)) if coin_id else Decimal('0')
-
-        holding_amount = holding_quantity * current_price
-
-        profit_loss = (total_earned + holding_amount) - total_invested
-        profit_loss = profit_loss.quantize(Decimal('0.01'))
-        if abs(profit_loss) < Decimal('0.01'):
-            profit_loss = Decimal('0.00')
-
-        ProfitLossSummary.objects.update_or_create(
-            user=user,
-            coin=coin,
-            defaults={
-                'total_purchased_quantity': total_purchased_quantity,
-                'total_invested': total_invested,
-                'total_sold_quantity': total_sold_quantity,
-                'total_earned': total_earned,
-                'holding_quantity': holding_quantity,
-                'current_price': current_price,
-                'holding_amount': holding_amount,
-                'net_profit_loss': profit_loss
-            }
-        )
-
-        summary.append({
-            'coin': coin,
-            'total_purchased_quantity': total_purchased_quantity,
-            'total_invested': round(total_invested, 2),
-            'total_sold_quantity': total_sold_quantity,
-            'total_earned': round(total_earned, 2),
-            'holding_quantity': holding_quantity,
-            'current_price': round(current_price, 2),
-            'holding_amount': round(holding_amount, 2),
-            'net_profit_loss': profit_loss,
-        })
-
-        summary.sort(key=lambda x: x['coin'].lower())
+    try:
+        with reads_from_replica(user_id):
+            summary = profit_loss_section(user_id)
+    except (StalePrice, CircuitOpen) as exc:
+        return Response({'error': str(exc)}, status=503)
 
     return Response(summary)
+
+PORTFOLIO_SECTIONS = ('wallet', 'balances', 'profit_loss', 'purchase_summary', 'transactions')
+
+# Portfolio Dashboard (wallet, balances, P&L, purchase summary and latest transactions in one call)
+@conditional_on_user_state(prices=True)
+@api_view(['GET'])
+def portfolio(request, email):
+    include = request.GET.get('include')
+    sections = [name.strip() for name in include.split(',')] if include else list(PORTFOLIO_SECTIONS)
+    unknown = [name for name in sections if name not in PORTFOLIO_SECTIONS]
+    if unknown:
+        return Response({'error': f"Unknown section(s): {', '.join(unknown)}."}, status=400)
+
+    try:
+        limit = int(request.GET.get('transactions_limit', settings.PORTFOLIO_TRANSACTIONS_LIMIT))
+    except ValueError:
+        return Response({'error': 'Invalid transactions_limit.'}, status=400)
+    limit = max(1, min(limit, settings.TRANSACTION_MAX_PAGE_SIZE))
+
+    try:
+        identity = request_identity(request, email)
+    except (Register.DoesNotExist, Profile.DoesNotExist):
+        return Response({'error': 'User not found.'}, status=404)
+
+    data = {}
+    with reads_from_replica(identity.id):
+        if 'wallet' in sections:
+            data['wallet_amount'] = wallet_section(identity.profile_id)
+        if 'balances' in sections:
+            data['balances'] = balances_section(identity.id)
+        if 'profit_loss' in sections:
+            try:
+                data['profit_loss'] = profit_loss_section(identity.id)
+            except (StalePrice, CircuitOpen) as exc:
+                return Response({'error': str(exc)}, status=503)
+        if 'purchase_summary' in sections:
+            data['purchase_summary'] = purchase_summary_section(identity.id)
+        if 'transactions' in sections:
+            data['transactions'] = latest_transactions_section(identity.id, limit)
+
+    return Response(data, status=200)
+
+# Portfolio History (holdings, wallet and total value per hour/day/week bucket, for charts)
+@conditional_on_user_state(prices=True)
+@api_view(['GET'])
+def portfolio_history(request, email):
+    try:
+        user_id = request_identity(request, email).id
+    except (Register.DoesNotExist, Profile.DoesNotExist):
+        return Response({'error': 'User not found.'}, status=404)
+
+    try:
+        start = parse_bound(request.GET['from']) if request.GET.get('from') else None
+        end = parse_bound(request.GET['to'], end_of_day=True) if request.GET.get('to') else None
+        with reads_from_replica(user_id):
+            history = value_history(user_id, request.GET.get('bucket', 'day'), start, end)
+    except (InvalidPageRequest, InvalidHistoryRequest) as exc:
+        return Response({'error': str(exc)}, status=400)
+
+    return Response(history, status=200)
+
+# Leaderboard (top users by net profit/loss, as of the last price snapshot)
+@api_view(['GET'])
+def leaderboard(request):
+    try:
+        limit = int(request.GET.get('limit', settings.LEADERBOARD_SIZE))
+    except ValueError:
+        return Response({'error': 'Invalid limit.'}, status=400)
+    limit = max(1, min(limit, settings.LEADERBOARD_MAX_SIZE))
+
+    return Response({'results': top_entries(limit)}, status=200)
+
+# Leaderboard Rank (one user's place on the leaderboard)
+@api_view(['GET'])
+def leaderboard_rank(request, email):
+    try:
+        user_id = request_identity(request, email).id
+    except (Register.DoesNotExist, Profile.DoesNotExist):
+        return Response({'error': 'User not found.'}, status=404)
+
+    with reads_from_replica(user_id):
+        rank = user_rank(user_id)
+    if rank is None:
+        return Response({'error': 'User has no trades yet.'}, status=404)
+    return Response(rank, status=200)